@@ -6,7 +6,20 @@ from pathlib import Path
 
 TOKEN = os.environ.get("GITHUB_TOKEN", "")
 
+# A pool of tokens (separated by commas or whitespace) that reporule rotates
+# through to spread requests across several rate limits. Defaults to TOKEN.
+TOKENS = os.environ.get("GITHUB_TOKENS", "").replace(",", " ").split() or [TOKEN]
+
 if find_spec("reporule") is not None:
     REPORULE_PATH = Path(find_spec("reporule").origin).parent  # type: ignore
 else:
     REPORULE_PATH = Path(__file__).parent.parent
+
+
+def __getattr__(name: str):
+    # import the client on first use, so the CLI doesn't pay for it
+    if name == "Client":
+        from reporule.client import Client
+
+        return Client
+    raise AttributeError(f"module 'reporule' has no attribute {name!r}")
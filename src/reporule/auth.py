@@ -0,0 +1,321 @@
+"""Credentials for authenticating GitHub API requests."""
+
+import functools
+import os
+import threading
+import time
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+
+import requests
+import structlog
+from requests.auth import AuthBase
+
+from reporule.retry import CONNECT_TIMEOUT, MAX_RETRY_WAIT, READ_TIMEOUT, _clip_to_deadline
+
+logger = structlog.get_logger()
+
+# GitHub's hourly rate limit for requests made with a personal access token.
+# Used as the budget of a credential that hasn't made a request yet.
+DEFAULT_RATE_LIMIT = 5000
+
+
+class StaticToken:
+    """
+    A GitHub personal access token.
+
+    Parameters:
+    ------------
+    token : str
+        The token
+    """
+
+    def __init__(self, token: str):
+        self._token = token
+
+    def __repr__(self) -> str:
+        return f"StaticToken(...{self._token[-4:]})"
+
+    def get_token(self) -> str:
+        """Return the token."""
+        return self._token
+
+
+class AppInstallationToken:
+    """
+    An installation access token for a GitHub App, refreshed before it expires.
+
+    The app's private key signs a short-lived JWT, which is exchanged for an
+    installation token. The token is cached until shortly before it expires,
+    and a fresh token is requested in a background thread ahead of time, so
+    long runs don't stall while re-authenticating.
+
+    Requires the PyJWT package (pip install "reporule[app]").
+
+    Parameters:
+    ------------
+    app_id : str
+        The GitHub App's id (or client id)
+    private_key : str
+        The GitHub App's private key, in PEM format
+    installation_id : str
+        The id of the app's installation on an organization or user
+    api_url : str
+        The base URL of the GitHub API. Change this to use a GitHub
+        Enterprise Server or a local stub of the token endpoint.
+    refresh_margin : float
+        Seconds before expiry when the token is refreshed in the background.
+        Tokens that expire within a fifth of this margin are refreshed before use.
+    jwt_encoder : Callable
+        An optional function that returns a signed JWT for the app, used
+        instead of PyJWT
+    session : requests.Session
+        An optional requests session used to request installation tokens
+    """
+
+    def __init__(
+        self,
+        app_id: str,
+        private_key: str,
+        installation_id: str,
+        api_url: str = "https://api.github.com",
+        refresh_margin: float = 600,
+        jwt_encoder: Callable[[], str] | None = None,
+        session: requests.Session | None = None,
+    ):
+        self.app_id = app_id
+        self.installation_id = installation_id
+        self.api_url = api_url.rstrip("/")
+        self.refresh_margin = refresh_margin
+        self._private_key = private_key
+        self._jwt_encoder = jwt_encoder or self._encode_jwt
+        self._session = session or requests.Session()
+        self._token: str | None = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_thread: threading.Thread | None = None
+
+    def __repr__(self) -> str:
+        return f"AppInstallationToken(app_id={self.app_id}, installation_id={self.installation_id})"
+
+    def get_token(self) -> str:
+        """Return a valid installation token, requesting a new one if needed."""
+        remaining = self._expires_at - time.time()
+        if self._token is None or remaining < self.refresh_margin / 5:
+            with self._lock:
+                # another thread may have refreshed the token while this one waited
+                if self._token is None or self._expires_at - time.time() < self.refresh_margin / 5:
+                    self._refresh()
+        elif remaining < self.refresh_margin and self._refresh_thread is None:
+            with self._lock:
+                if self._refresh_thread is None:
+                    self._refresh_thread = threading.Thread(target=self._refresh_in_background, daemon=True)
+                    self._refresh_thread.start()
+        return self._token  # type: ignore
+
+    def _encode_jwt(self) -> str:
+        """Return a JWT that authenticates as the GitHub App."""
+        try:
+            import jwt
+        except ImportError:
+            raise ImportError(
+                'GitHub App authentication requires PyJWT. Install it with: pip install "reporule[app]"'
+            ) from None
+        now = int(time.time())
+        # backdate the token to allow for clock drift, as recommended by GitHub
+        payload = {"iat": now - 60, "exp": now + 540, "iss": str(self.app_id)}
+        return jwt.encode(payload, self._private_key, algorithm="RS256")
+
+    def _refresh(self):
+        """Exchange a new JWT for an installation token."""
+        response = self._session.post(
+            f"{self.api_url}/app/installations/{self.installation_id}/access_tokens",
+            headers={
+                "Authorization": f"Bearer {self._jwt_encoder()}",
+                "Accept": "application/vnd.github+json",
+                "X-GitHub-Api-Version": "2022-11-28",
+            },
+            # this session doesn't go through GitHubAdapter, so set its timeouts here
+            timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+        )
+        response.raise_for_status()
+        token_info = response.json()
+        self._token = token_info["token"]
+        self._expires_at = datetime.fromisoformat(token_info["expires_at"].replace("Z", "+00:00")).timestamp()
+        logger.debug("Installation token refreshed", credential=repr(self), expires_at=token_info["expires_at"])
+
+    def _refresh_in_background(self):
+        try:
+            with self._lock:
+                self._refresh()
+        except Exception as e:
+            # the current token is still valid, so the next get_token call can try again
+            logger.warning("Background token refresh failed", credential=repr(self), error=str(e))
+        finally:
+            self._refresh_thread = None
+
+
+def _get_app_credentials() -> list[AppInstallationToken]:
+    """
+    Return GitHub App installation credentials configured in environment variables.
+
+    GITHUB_APP_ID and GITHUB_APP_INSTALLATION_ID (which can list several
+    installations, separated by commas) are required, along with either
+    GITHUB_APP_PRIVATE_KEY (the key itself) or GITHUB_APP_PRIVATE_KEY_PATH.
+    GITHUB_API_URL optionally changes the API's base URL.
+
+    The credentials are created once per process for each configuration, so
+    every session shares their cached installation tokens.
+    """
+    settings = [
+        "GITHUB_APP_ID",
+        "GITHUB_APP_INSTALLATION_ID",
+        "GITHUB_APP_PRIVATE_KEY",
+        "GITHUB_APP_PRIVATE_KEY_PATH",
+        "GITHUB_API_URL",
+    ]
+    return list(_load_app_credentials(*(os.environ.get(name) for name in settings)))
+
+
+@functools.lru_cache
+def _load_app_credentials(
+    app_id: str | None,
+    installation_id: str | None,
+    private_key: str | None,
+    key_path: str | None,
+    api_url: str | None,
+) -> tuple["AppInstallationToken", ...]:
+    """Create the GitHub App installation credentials for one configuration."""
+    installation_ids = (installation_id or "").replace(",", " ").split()
+    if not app_id or not installation_ids:
+        return ()
+
+    if not private_key:
+        if not key_path:
+            raise ValueError(
+                "Set GITHUB_APP_PRIVATE_KEY or GITHUB_APP_PRIVATE_KEY_PATH to use GitHub App authentication."
+            )
+        private_key = Path(key_path).read_text()
+
+    api_url = api_url or "https://api.github.com"
+    return tuple(AppInstallationToken(app_id, private_key, i, api_url=api_url) for i in installation_ids)
+
+
+class TokenPool(AuthBase):
+    """
+    Authenticate each request with the credential that has the most rate limit budget left.
+
+    The pool reads the x-ratelimit-* headers of every response to track each
+    credential's remaining budget. A credential that exhausts its rate limit is
+    taken out of rotation until its reset time, and the rate-limited request is
+    re-sent with another credential.
+
+    Parameters:
+    ------------
+    credentials : list
+        The credentials in the pool. Each credential has a get_token()
+        method that returns a token.
+    """
+
+    def __init__(self, credentials: list):
+        if not credentials:
+            raise ValueError("A token pool needs at least one credential.")
+        self.credentials = credentials
+        self._remaining = [DEFAULT_RATE_LIMIT] * len(credentials)
+        self._reset = [0.0] * len(credentials)
+        self._lock = threading.Lock()
+
+    def __call__(self, request: requests.PreparedRequest) -> requests.PreparedRequest:
+        index = self._acquire()
+        request.headers["Authorization"] = f"Bearer {self.credentials[index].get_token()}"
+        request._reporule_credential = index  # type: ignore
+        request.register_hook("response", self._handle_response)
+        return request
+
+    def _acquire(self, exclude: int | None = None) -> int:
+        """Return the index of the available credential with the most remaining budget."""
+        with self._lock:
+            now = time.time()
+            for i, reset in enumerate(self._reset):
+                if self._remaining[i] <= 0 and reset <= now:
+                    # the credential's rate limit has been reset
+                    self._remaining[i] = DEFAULT_RATE_LIMIT
+            candidates = [i for i in range(len(self.credentials)) if i != exclude] or [exclude]
+            available = [i for i in candidates if self._remaining[i] > 0]  # type: ignore
+            if available:
+                index = max(available, key=lambda i: self._remaining[i])
+            else:
+                index = min(candidates, key=lambda i: self._reset[i])  # type: ignore
+            # count the request against the budget right away, so concurrent
+            # requests spread across the pool before their responses arrive
+            self._remaining[index] -= 1  # type: ignore
+            return index  # type: ignore
+
+    def _record(self, index: int, response: requests.Response) -> bool:
+        """Update a credential's budget from a response. Returns True if the credential is rate limited."""
+        remaining = response.headers.get("x-ratelimit-remaining")
+        reset = response.headers.get("x-ratelimit-reset")
+        if response.headers.get("x-ratelimit-resource", "core") != "core" or remaining is None:
+            return False
+        # a response shared from the cache carries the budget from when it was sent
+        if not getattr(response, "_reporule_cached", False):
+            with self._lock:
+                self._remaining[index] = int(remaining)
+                if reset is not None:
+                    self._reset[index] = float(reset)
+        rate_limited = response.status_code in (403, 429) and remaining == "0"
+        if rate_limited:
+            logger.info("Credential is rate limited", credential=repr(self.credentials[index]), reset=reset)
+        return rate_limited
+
+    def _handle_response(self, response: requests.Response, **kwargs) -> requests.Response:
+        """Response hook that re-sends a rate-limited request with another credential."""
+        index = getattr(response.request, "_reporule_credential", None)
+        if index is None or not self._record(index, response):
+            return response
+
+        next_index = self._acquire(exclude=index)
+        if self._remaining[next_index] < 0:
+            # every credential is rate limited, so wait for the earliest reset
+            time.sleep(_clip_to_deadline(min(max(0.0, self._reset[next_index] - time.time()), MAX_RETRY_WAIT)))
+
+        # re-send the request with the new credential (this follows the
+        # approach used by requests' HTTPDigestAuth)
+        response.content
+        response.close()
+        prepared = response.request.copy()
+        prepared.headers["Authorization"] = f"Bearer {self.credentials[next_index].get_token()}"
+        prepared._reporule_credential = next_index  # type: ignore
+        new_response = response.connection.send(prepared, **kwargs)
+        new_response.history.append(response)
+        new_response.request = prepared
+        self._record(next_index, new_response)
+        return new_response
+
+    def credential_auth(self, index: int) -> AuthBase:
+        """Return an auth that sends requests with one of the pool's credentials, without rotating."""
+        return _PoolCredential(self, index)
+
+    def record_rate_limit(self, index: int, remaining: int, reset: float):
+        """Set a credential's remaining budget and reset time from a measured rate limit."""
+        with self._lock:
+            self._remaining[index] = remaining
+            self._reset[index] = reset
+
+    def budget(self) -> list[tuple[str, int, float]]:
+        """Return the remaining budget and reset time of each credential."""
+        with self._lock:
+            return [(repr(c), r, t) for c, r, t in zip(self.credentials, self._remaining, self._reset)]
+
+
+class _PoolCredential(AuthBase):
+    """Authenticate requests with one credential of a token pool (see TokenPool.credential_auth)."""
+
+    def __init__(self, pool: TokenPool, index: int):
+        self.pool = pool
+        self.index = index
+
+    def __call__(self, request: requests.PreparedRequest) -> requests.PreparedRequest:
+        request.headers["Authorization"] = f"Bearer {self.pool.credentials[self.index].get_token()}"
+        return request
@@ -0,0 +1,178 @@
+"""Record GitHub API responses to a file, and replay them without the network."""
+
+import base64
+import gzip
+import hashlib
+import json
+import threading
+from pathlib import Path
+
+import requests
+import structlog
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+logger = structlog.get_logger()
+
+# The cassette used by new sessions, if a recording or replay is in progress
+CASSETTE: "Cassette | None" = None
+
+
+class CassetteMissError(requests.ConnectionError):
+    """Raised when a replayed request wasn't recorded in the cassette."""
+
+
+def _request_key(request: requests.PreparedRequest) -> str:
+    """Return the key that identifies a request in a cassette. Credentials are not part of the key."""
+    body = request.body or b""
+    if isinstance(body, str):
+        body = body.encode()
+    return f"{request.method} {request.url} {hashlib.sha256(body).hexdigest()[:16]}"
+
+
+class Cassette:
+    """
+    A set of recorded requests and responses, stored as an indexed, gzipped JSON file.
+
+    The file holds a list of responses and an index that maps each request
+    (method, URL and a hash of the body) to the positions of its responses.
+    When the same request was recorded more than once, its responses are
+    replayed in the order they were recorded.
+
+    Parameters:
+    ------------
+    path : Path
+        The cassette file
+    mode : str
+        "record" or "replay"
+    """
+
+    def __init__(self, path: Path, mode: str):
+        self.path = path
+        self.mode = mode
+        self._index: dict[str, list[int]] = {}
+        self._responses: list[dict] = []
+        self._positions: dict[str, int] = {}
+        self._lock = threading.Lock()
+        if mode == "replay":
+            try:
+                with gzip.open(path, "rt") as file:
+                    data = json.load(file)
+            except (OSError, json.JSONDecodeError):
+                raise ValueError(f"Unable to read cassette {path}.") from None
+            self._index = data["index"]
+            self._responses = data["responses"]
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    def record(self, request: requests.PreparedRequest, response: requests.Response):
+        """Add a response to the cassette."""
+        entry = {
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": dict(response.headers),
+            "body": base64.b64encode(response.content).decode(),
+            "elapsed_ms": round(response.elapsed.total_seconds() * 1000, 1),
+        }
+        with self._lock:
+            self._index.setdefault(_request_key(request), []).append(len(self._responses))
+            self._responses.append(entry)
+
+    def play(self, request: requests.PreparedRequest) -> requests.Response:
+        """Return the recorded response to a request."""
+        key = _request_key(request)
+        with self._lock:
+            positions = self._index.get(key)
+            if not positions:
+                raise CassetteMissError(f"No recorded response for {request.method} {request.url}")
+            # repeat the last recorded response once the recorded ones are used up
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            entry = self._responses[positions[min(position, len(positions) - 1)]]
+
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.reason = entry["reason"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response._content = base64.b64decode(entry["body"])
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.url = request.url  # type: ignore
+        response.request = request
+        return response
+
+    def save(self):
+        """Write the cassette file."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(self.path, "wt") as file:
+            json.dump({"version": 1, "index": self._index, "responses": self._responses}, file, separators=(",", ":"))
+        logger.info("Cassette saved", path=str(self.path), responses=len(self._responses))
+
+
+class RecordingAdapter(BaseAdapter):
+    """
+    A requests transport adapter that records every response it receives from another adapter.
+
+    Parameters:
+    ------------
+    adapter : requests.adapters.BaseAdapter
+        The adapter that sends the requests
+    cassette : Cassette
+        The cassette that stores the responses
+    """
+
+    def __init__(self, adapter: BaseAdapter, cassette: Cassette):
+        super().__init__()
+        self.adapter = adapter
+        self.cassette = cassette
+
+    def send(self, request, *args, **kwargs):
+        response = self.adapter.send(request, *args, **kwargs)
+        self.cassette.record(request, response)
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    A requests transport adapter that answers requests from a cassette, without using the network.
+
+    Parameters:
+    ------------
+    cassette : Cassette
+        The cassette that stores the responses
+    """
+
+    def __init__(self, cassette: Cassette):
+        super().__init__()
+        self.cassette = cassette
+
+    def send(self, request, *args, **kwargs):
+        response = self.cassette.play(request)
+        response.connection = self
+        return response
+
+    def close(self):
+        pass
+
+
+def start(path: Path, mode: str) -> Cassette:
+    """
+    Start recording responses to, or replaying responses from, a cassette file.
+
+    Sessions created by reporule.util._get_session after this call use the cassette.
+    """
+    global CASSETTE
+    CASSETTE = Cassette(path, mode)
+    logger.info(f"Cassette {mode} started", path=str(path), responses=len(CASSETTE))
+    return CASSETTE
+
+
+def stop():
+    """Stop using the cassette, saving it first if responses were being recorded."""
+    global CASSETTE
+    if CASSETTE is not None and CASSETTE.mode == "record":
+        CASSETTE.save()
+    CASSETTE = None
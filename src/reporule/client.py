@@ -0,0 +1,227 @@
+"""A client for using reporule from other Python programs."""
+
+import threading
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+import structlog
+
+import reporule
+from reporule import executor
+from reporule.core import get_rulesets_repo_status
+from reporule.executor import MAX_WORKERS, WRITE_REQUESTS_PER_SECOND, RateLimiter
+from reporule.util import _create_branch_ruleset, _get_repo, _get_repo_rulesets, _get_session, _run_cache_scope
+
+logger = structlog.get_logger()
+
+
+class Client:
+    """
+    A reporule client that shares one GitHub API session and cache across calls.
+
+    The batch methods return immediately with a concurrent.futures.Future for
+    each org or repo. Use future.result() to wait for a result, or
+    asyncio.wrap_future() to await it. Repo lists and rulesets are cached for
+    the life of the client, and concurrent requests for the same org or repo
+    share a single API request. Each client has its own cancellation and
+    caches, so clients (and CLI runs in the same process) don't affect each
+    other.
+
+    Parameters:
+    ------------
+    token : str | list[str]
+        An optional GitHub token, or list of tokens to rotate through.
+        Defaults to the GITHUB_TOKEN or GITHUB_TOKENS environment variable.
+    max_workers : int
+        The maximum number of concurrent API requests made by list_repos,
+        get_rulesets, and apply_rulesets. get_ruleset_status scans each org's
+        repos with its own pool of worker threads.
+
+    Example:
+    ---------
+    with reporule.Client() as client:
+        repos = client.list_repos(["reichlab", "hubverse-org"])
+        rulesets = client.get_rulesets(r["full_name"] for r in repos["reichlab"].result())
+    """
+
+    def __init__(self, token: str | list[str] | None = None, max_workers: int = MAX_WORKERS):
+        self.session = _get_session(token or reporule.TOKENS)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="reporule-client")
+        self._write_rate_limiter = RateLimiter(WRITE_REQUESTS_PER_SECOND)
+        self._repos: dict[str, Future] = {}
+        self._rulesets: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._run_cache: dict = {}
+        self._status_calls = 0
+
+    def __enter__(self) -> "Client":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Wait for pending requests, then release the thread pool and connections."""
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    def cancel(self):
+        """Stop starting new API requests for the ruleset status calls in progress."""
+        self._cancelled.set()
+
+    def _cached(self, cache: dict[str, Future], key: str, func, *args) -> Future:
+        with self._lock:
+            future = cache.get(key)
+            if future is None or (future.done() and future.exception() is not None):
+                future = self._executor.submit(func, *args)
+                cache[key] = future
+            return future
+
+    def list_repos(self, orgs: Iterable[str]) -> dict[str, Future]:
+        """
+        List the repositories of several GitHub organizations or users.
+
+        Parameters:
+        ------------
+        orgs : Iterable[str]
+            The GitHub organization or user names
+
+        Returns:
+        ---------
+        dict[str, Future]
+            A dictionary mapping each org to a future list of repository
+            dictionaries, as returned by GitHub's API
+        """
+        return {org: self._cached(self._repos, org, _get_repo, org, None, self.session) for org in orgs}
+
+    def get_rulesets(self, repos: Iterable[str]) -> dict[str, Future]:
+        """
+        Fetch the existing rulesets of several repositories.
+
+        Parameters:
+        ------------
+        repos : Iterable[str]
+            The repository names, in the format "org/repo"
+
+        Returns:
+        ---------
+        dict[str, Future]
+            A dictionary mapping each repo to a future list of ruleset
+            dictionaries, as returned by GitHub's API
+        """
+        return {repo: self._cached(self._rulesets, repo, _get_repo_rulesets, repo, self.session) for repo in repos}
+
+    def get_ruleset_status(self, org: str, rulesets: list[dict]) -> Future:
+        """
+        Determine which of an org's repositories are eligible for each of several rulesets.
+
+        Parameters:
+        ------------
+        org : str
+            The GitHub organization or user name
+        rulesets : list[dict]
+            The rulesets to check against the org's repositories
+
+        Returns:
+        ---------
+        Future
+            A future dictionary mapping ruleset names to the repository status
+            for that ruleset (in the format returned by
+            reporule.core.get_rulesets_repo_status). Rulesets already fetched
+            by the client aren't fetched again, and the rulesets this call
+            fetches are cached for later calls.
+        """
+        # a cancelled earlier call shouldn't stop this one, and edits to the
+        # exceptions file since then should be picked up, but only once no
+        # other call is in flight, since that would un-cancel it
+        with self._lock:
+            if self._status_calls == 0:
+                self._cancelled.clear()
+                self._run_cache.clear()
+            self._status_calls += 1
+        status: Future = Future()
+
+        def _finish(result: dict | None = None, error: BaseException | None = None):
+            # the call is no longer in flight by the time anyone sees its result
+            with self._lock:
+                self._status_calls -= 1
+            if error is not None:
+                status.set_exception(error)
+            else:
+                status.set_result(result)
+
+        def _get_status(repos: list[dict]):
+            try:
+                with executor.cancellation_scope(self._cancelled), _run_cache_scope(self._run_cache):
+                    result = get_rulesets_repo_status(
+                        org, repos, rulesets, self.session, get_rulesets=self._scan_rulesets
+                    )
+            except Exception as e:
+                _finish(error=e)
+            else:
+                _finish(result)
+
+        def _on_repos_listed(repos: Future):
+            # start once the repos are listed, rather than blocking a worker until they are
+            if repos.exception() is not None:
+                _finish(error=repos.exception())
+                return
+            try:
+                self._executor.submit(_get_status, repos.result())
+            except RuntimeError as e:
+                # the client was closed
+                _finish(error=e)
+
+        self.list_repos([org])[org].add_done_callback(_on_repos_listed)
+        return status
+
+    def _scan_rulesets(self, repo: str) -> list[dict]:
+        """Return a repo's cached rulesets, or fetch them in the calling thread and cache them."""
+        with self._lock:
+            future = self._rulesets.get(repo)
+        if future is not None and future.done() and future.exception() is None:
+            return future.result()
+        # a fetch still waiting in the client's pool could be queued behind
+        # this call, so don't wait for it (identical requests in flight are
+        # merged by the session anyway)
+        rulesets = _get_repo_rulesets(repo, self.session)
+        with self._lock:
+            current = self._rulesets.get(repo)
+            if current is None or (current.done() and current.exception() is not None):
+                future = Future()
+                future.set_result(rulesets)
+                self._rulesets[repo] = future
+        return rulesets
+
+    def apply_rulesets(self, ruleset_repos: list[tuple[dict, list[str]]]) -> dict[tuple[str, str], Future]:
+        """
+        Create rulesets on repositories, within GitHub's limits on content-creating requests.
+
+        Parameters:
+        ------------
+        ruleset_repos : list
+            A list of (ruleset, repo_list) tuples. Each GitHub ruleset will be
+            created on the repositories in its repo list (in the format "org/repo").
+
+        Returns:
+        ---------
+        dict[tuple[str, str], Future]
+            A dictionary mapping each (repo, ruleset name) to the future
+            requests.Response of the request that created the ruleset
+        """
+        futures = {}
+        for ruleset, repo_list in ruleset_repos:
+            for repo in repo_list:
+                futures[(repo, ruleset["name"])] = self._executor.submit(self._create_ruleset, repo, ruleset)
+        return futures
+
+    def _create_ruleset(self, repo: str, ruleset: dict) -> requests.Response:
+        self._write_rate_limiter.acquire()
+        response = _create_branch_ruleset(repo, ruleset, self.session)
+        # the repo's cached rulesets are out of date
+        with self._lock:
+            self._rulesets.pop(repo, None)
+        logger.debug("Ruleset created", repo=repo, ruleset=ruleset["name"], status=response.status_code)
+        return response
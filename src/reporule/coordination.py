@@ -0,0 +1,221 @@
+"""Coordination between reporule runs that target the same GitHub organization."""
+
+import json
+import os
+import socket
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import structlog
+
+logger = structlog.get_logger()
+
+# The default directory for the local coordination backend's files
+COORDINATION_DIR = Path(".reporule") / "coordination"
+
+# Locks and claims of runs on other hosts (whose processes can't be checked)
+# are considered abandoned after this many seconds
+LOCK_TTL = 2 * 60 * 60
+
+# The number of seconds a finished run's inventory and results can be reused
+RESULTS_MAX_AGE = 15 * 60
+
+# The number of seconds to wait for another run to finish, and between checks
+WAIT_TIMEOUT = 60 * 60
+WAIT_INTERVAL = 2.0
+
+# Runs hold the claims file's lock for milliseconds, so a lock file older
+# than this was left by a run that crashed (or failed to write the lock)
+MUTEX_STALE_AGE = 30.0
+
+# The number of seconds to wait for the claims file's lock before giving up
+MUTEX_TIMEOUT = 2 * MUTEX_STALE_AGE
+
+
+class CoordinationBackend(ABC):
+    """
+    Coordinate concurrent reporule runs on the same organization.
+
+    A run can take the organization's lock, claim the ruleset writes it is
+    about to make, and share its results with runs that start soon after.
+    Subclasses implement the storage; FileCoordinationBackend stores
+    everything in local files.
+    """
+
+    @abstractmethod
+    def acquire(self, org: str, run_id: str, wait: bool, timeout: float = WAIT_TIMEOUT) -> bool:
+        """Take the organization's lock, optionally waiting for it. Return True if the lock was taken."""
+
+    @abstractmethod
+    def release(self, org: str, run_id: str):
+        """Release the organization's lock, if held by the run, and the run's claims."""
+
+    @abstractmethod
+    def claim(self, org: str, run_id: str, items: list[str]) -> set[str]:
+        """Claim work items for a run. Return the items that aren't claimed by another active run."""
+
+    @abstractmethod
+    def load_results(self, org: str) -> dict | None:
+        """Return the results saved by the last run, or None if there are none."""
+
+    @abstractmethod
+    def save_results(self, org: str, results: dict):
+        """Save a run's results for later runs to reuse."""
+
+
+class FileCoordinationBackend(CoordinationBackend):
+    """
+    A coordination backend for runs on one machine (or sharing a file system).
+
+    The lock is a file created exclusively, so only one run can hold it.
+    Locks and claims left behind by runs that exited without releasing them
+    are ignored.
+
+    Parameters:
+    ------------
+    directory : Path
+        The directory that holds the lock, claims, and results files
+    """
+
+    def __init__(self, directory: Path = COORDINATION_DIR):
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, org: str, suffix: str) -> Path:
+        return self.directory / f"{org}.{suffix}"
+
+    def acquire(self, org: str, run_id: str, wait: bool, timeout: float = WAIT_TIMEOUT) -> bool:
+        give_up_at = time.monotonic() + timeout
+        while True:
+            if _create_lock_file(self._path(org, "lock"), run_id):
+                logger.debug("Coordination lock acquired", org=org, run_id=run_id)
+                return True
+            if not wait or time.monotonic() >= give_up_at:
+                return False
+            time.sleep(WAIT_INTERVAL)
+
+    def release(self, org: str, run_id: str):
+        try:
+            with _Mutex(self._path(org, "claims.lock")):
+                claims_file = self._path(org, "claims.json")
+                claims = {k: v for k, v in _read_json(claims_file, {}).items() if v["run_id"] != run_id}
+                _write_json(claims_file, claims)
+        except TimeoutError as e:
+            # the claims of a run that has exited are ignored, so the lock can still be released
+            logger.warning("Unable to release claims", org=org, run_id=run_id, error=str(e))
+        lock_file = self._path(org, "lock")
+        if _read_json(lock_file, {}).get("run_id") == run_id:
+            lock_file.unlink(missing_ok=True)
+            logger.debug("Coordination lock released", org=org, run_id=run_id)
+
+    def claim(self, org: str, run_id: str, items: list[str]) -> set[str]:
+        owner = _owner(run_id)
+        with _Mutex(self._path(org, "claims.lock")):
+            claims_file = self._path(org, "claims.json")
+            claims = {k: v for k, v in _read_json(claims_file, {}).items() if _is_active(v)}
+            claimed = set()
+            for item in items:
+                if item not in claims or claims[item]["run_id"] == run_id:
+                    claims[item] = owner
+                    claimed.add(item)
+            _write_json(claims_file, claims)
+        logger.debug("Work claimed", org=org, run_id=run_id, claimed=len(claimed), requested=len(items))
+        return claimed
+
+    def load_results(self, org: str) -> dict | None:
+        return _read_json(self._path(org, "results.json"), None)
+
+    def save_results(self, org: str, results: dict):
+        _write_json(self._path(org, "results.json"), results)
+
+
+class _Mutex:
+    """
+    A short-lived lock file, for updating the claims file.
+
+    A lock file older than MUTEX_STALE_AGE is removed. Raises TimeoutError if
+    the lock can't be taken within MUTEX_TIMEOUT seconds.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.run_id = f"mutex-{os.getpid()}-{time.monotonic_ns()}"
+
+    def __enter__(self):
+        give_up_at = time.monotonic() + MUTEX_TIMEOUT
+        while not _create_lock_file(self.path, self.run_id):
+            if _age(self.path) > MUTEX_STALE_AGE:
+                logger.info("Removing stale lock", path=str(self.path))
+                self.path.unlink(missing_ok=True)
+                continue
+            if time.monotonic() >= give_up_at:
+                raise TimeoutError(
+                    f"Timed out waiting for the coordination lock {self.path}. "
+                    "If no other reporule run is using it, delete the file."
+                )
+            time.sleep(0.01)
+
+    def __exit__(self, *args):
+        self.path.unlink(missing_ok=True)
+
+
+def _read_json(path: Path, default):
+    """Return the contents of a JSON file, or a default if it doesn't exist or is incomplete."""
+    try:
+        with open(path, "r") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def _write_json(path: Path, data):
+    """Replace a JSON file, so readers never see a partly written file."""
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(data))
+    os.replace(tmp_path, path)
+
+
+def _age(path: Path) -> float:
+    """Return the number of seconds since a file was last modified, or 0 if it doesn't exist."""
+    try:
+        return time.time() - path.stat().st_mtime
+    except FileNotFoundError:
+        return 0.0
+
+
+def _owner(run_id: str) -> dict:
+    return {"run_id": run_id, "pid": os.getpid(), "host": socket.gethostname(), "created_at": time.time()}
+
+
+def _is_active(owner: dict) -> bool:
+    """Return True if the run that owns a lock or claim may still be running."""
+    if owner.get("host") == socket.gethostname() and os.name == "posix":
+        try:
+            os.kill(owner["pid"], 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+    return time.time() - owner.get("created_at", 0) < LOCK_TTL
+
+
+def _create_lock_file(path: Path, run_id: str) -> bool:
+    """Create a lock file, replacing one left by a run that is no longer active. Return True if created."""
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            owner = _read_json(path, None)
+            # a lock file without an owner is being written, unless it's old
+            # enough to have been left by a run that failed while writing it
+            if (owner is None and _age(path) <= MUTEX_STALE_AGE) or (owner is not None and _is_active(owner)):
+                return False
+            logger.info("Removing abandoned lock", path=str(path), owner=owner)
+            path.unlink(missing_ok=True)
+            continue
+        with os.fdopen(fd, "w") as file:
+            json.dump(_owner(run_id), file)
+        return True
+    return False
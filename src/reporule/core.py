@@ -1,7 +1,13 @@
 """Core functions for reporule operations."""
 
+import json
+import threading
+import time
+from collections.abc import Callable, Iterable
+from datetime import datetime, timezone
 from itertools import zip_longest
 from typing import NamedTuple
+from urllib.parse import quote
 
 import requests
 import structlog
@@ -11,10 +17,79 @@ from rich.style import Style
 from rich.table import Table
 
 import reporule
-from reporule.util import _get_branch_rulesets, _get_repo_exceptions, _get_session
+from reporule import progress
+from reporule.executor import (
+    MAX_WORKERS,
+    WRITE_REQUESTS_PER_SECOND,
+    FailFast,
+    RateLimiter,
+    run_concurrently,
+    run_pipeline,
+)
+from reporule.logging import LazyField
+from reporule.profiling import profiled
+from reporule.refnames import RefNameMatcher
+from reporule.util import (
+    REPOS_PER_PAGE,
+    _create_branch_ruleset,
+    _get_branch_page,
+    _get_branch_rulesets,
+    _get_json_if_changed,
+    _get_repo,
+    _get_repo_exceptions,
+    _get_repo_rulesets,
+    _get_repo_rulesets_if_changed,
+    _get_repo_rulesets_url,
+    _get_session,
+)
 
 logger = structlog.get_logger()
 
+# Audit log actions that add a repository to the set of org repos that should
+# carry rulesets
+AUDIT_LOG_REPO_ACTIONS = {"repo.create", "repo.unarchived", "repo.transfer", "repo.transfer_incoming"}
+
+# The number of seconds a repo's saved branch names are reused by ruleset simulations
+BRANCH_CACHE_MAX_AGE = 24 * 60 * 60
+
+# Optional columns of the repo listing, and whether each needs an API request per repo
+DETAIL_COLUMNS = {"rulesets": True, "default-branch": True, "visibility": False}
+
+
+class SystematicWriteError(RuntimeError):
+    """
+    Raised when applying rulesets stops because the first writes all failed in the same way.
+
+    Parameters:
+    ------------
+    signature : str
+        The error shared by the failed writes
+    applied : dict[str, int]
+        The number of repositories each ruleset was applied to before stopping
+    """
+
+    def __init__(self, signature: str, applied: dict[str, int]):
+        super().__init__(f"Stopped applying rulesets after repeated identical failures: {signature}")
+        self.signature = signature
+        self.applied = applied
+
+
+class PipelineResult(NamedTuple):
+    """The outcome of apply_branch_rulesets_pipelined."""
+
+    # the repo status for each ruleset, in the format returned by get_rulesets_repo_status
+    status: dict[str, dict[str, set[str]]]
+    # the (ruleset, repo_list) writes that were scheduled
+    ruleset_repos: list[tuple[dict, list[str]]]
+    # the number of repositories each ruleset was applied to
+    applied: dict[str, int]
+    # the scheduled writes of each ruleset that weren't attempted
+    deferred: dict[str, list[str]]
+    # the error shared by the first failed writes, if they stopped the run
+    stopped_on_error: str | None
+    # the error that stopped listing the org's repos, if any
+    list_error: str | None = None
+
 
 class OutputColumns(NamedTuple):
     name: str
@@ -24,7 +99,100 @@ class OutputColumns(NamedTuple):
     gh_id: str
 
 
-def list_repos(org_name: str, repo_list: list[dict]) -> Table:
+@profiled
+def get_repo_details(
+    repo_list: list[dict], columns: list[str], cache: dict | None = None, session: requests.Session | None = None
+) -> dict[str, dict[str, str]]:
+    """
+    Get the optional listing columns of every repository.
+
+    Columns that need an API request per repo are fetched concurrently.
+    Requests are conditional, using the ETags saved in the cache, so repos
+    whose details haven't changed since the cache was saved cost no rate limit.
+
+    Parameters:
+    ------------
+    repo_list : list
+        A list of dictionaries that represent repository objects as returned by
+        GitHub's API.
+    columns : list
+        The columns to get (keys of DETAIL_COLUMNS)
+    cache : dict
+        Optional details saved by a previous listing. It is updated with the
+        details fetched by this one.
+    session: requests.Session
+        An optional requests session for using the GitHub API. If not
+        passed, a new session will be created.
+
+    Returns:
+    ---------
+    dict
+        A dictionary mapping each repository name (in the format "org/repo")
+        to the value of each column. Values that couldn't be fetched are "?".
+    """
+    if session is None:
+        session = _get_session(reporule.TOKENS)
+    if cache is None:
+        cache = {}
+
+    details: dict[str, dict[str, str]] = {r["full_name"]: {} for r in repo_list}
+    items = []
+    for repo in repo_list:
+        for column in columns:
+            if column == "visibility":
+                details[repo["full_name"]][column] = repo.get("visibility") or (
+                    "private" if repo.get("private") else "public"
+                )
+            elif column == "default-branch" and not repo.get("default_branch"):
+                details[repo["full_name"]][column] = "-"
+            elif DETAIL_COLUMNS[column]:
+                items.append((repo["full_name"], column, repo.get("default_branch")))
+
+    def _fetch(item):
+        repo, column, branch = item
+        if column == "rulesets":
+            url = _get_repo_rulesets_url(repo)
+        else:
+            url = f"https://api.github.com/repos/{repo}/rules/branches/{quote(branch, safe='')}"
+        # an ETag is only valid for the URL it was returned for (the default branch may have been renamed)
+        cached = cache.get(repo, {}).get(column, {})
+        etag = cached.get("etag") if cached.get("url") == url else None
+        if column == "rulesets":
+            # the repo's rulesets, including inherited ones, as ruleset apply and audit see them
+            payload, etag = _get_repo_rulesets_if_changed(repo, etag, session)
+        else:
+            payload, etag = _get_json_if_changed(url, etag, session)
+        if payload is None:
+            return cached
+        if column == "rulesets":
+            value = ", ".join(sorted(r.get("name") for r in payload)) or "-"
+        else:
+            # the rules of every ruleset that targets the branch (classic branch protection isn't included)
+            rule_types = {r.get("type") for r in payload}
+            value = f"{branch} ({len(rule_types)} rules)" if rule_types else f"{branch} (no rulesets)"
+        return {"url": url, "etag": etag, "value": value}
+
+    results = run_concurrently(_fetch, items)
+    refetched = 0
+    for (repo, column, _), result in results.items():
+        if isinstance(result, Exception):
+            logger.error("Failed to get repo details", repo=repo, column=column, error=str(result))
+            details[repo][column] = "?"
+            continue
+        if cache.get(repo, {}).get(column) is not result:
+            refetched += 1
+        cache.setdefault(repo, {})[column] = result
+        details[repo][column] = result["value"]
+    # calls skipped by a cancellation
+    for repo, column, _ in set(items) - set(results):
+        details[repo][column] = "?"
+
+    logger.info("Repo details fetched", repos=len(repo_list), requests=len(items), refetched=refetched)
+    return details
+
+
+@profiled
+def list_repos(org_name: str, repo_list: list[dict], details: dict[str, dict[str, str]] | None = None) -> Table:
     """
     Display a rich-formatted table of GitHub repositories.
 
@@ -35,6 +203,9 @@ def list_repos(org_name: str, repo_list: list[dict]) -> Table:
     repo_list : list
         A list of dictionaries that represent repository objects as returned by
         GitHub's API.
+    details : dict
+        Optional extra columns for each repository, in the format returned by
+        get_repo_details
     """
 
     # Settings for the output columns when listing repo information
@@ -56,6 +227,9 @@ def list_repos(org_name: str, repo_list: list[dict]) -> Table:
 
         style = Style(color=color, **style_kwargs)  # type: ignore
         table.add_column(col, style=style, **col_kwargs)  # type: ignore
+    detail_columns = [c for c in DETAIL_COLUMNS if details and any(c in d for d in details.values())]
+    for col in detail_columns:
+        table.add_column(col, style=Style(color="cyan"))
 
     repos = repo_list
     repo_count = len(repos)
@@ -69,7 +243,8 @@ def list_repos(org_name: str, repo_list: list[dict]) -> Table:
             fork=str(repo.get("fork", "")),
             gh_id=str(repo.get("id", "")),
         )
-        repo_dict[repo["name"]] = r
+        extra = (details or {}).get(repo.get("full_name", ""), {})
+        repo_dict[repo["name"]] = (*r, *(extra.get(c, "") for c in detail_columns))
     sorted_repo_names = sorted(repo_dict)
 
     # use sorted repo names to add repo data to the
@@ -79,7 +254,7 @@ def list_repos(org_name: str, repo_list: list[dict]) -> Table:
             r = repo_dict[repo_name]
             table.add_row(*r)
     except Exception as e:
-        logger.error(f"Error adding row for repo {r.name}: {e}")
+        logger.error(f"Error adding row for repo {r[0]}: {e}")
 
     logger.info("Repository report complete", count=repo_count)
 
@@ -106,28 +281,262 @@ def apply_branch_ruleset(repo_list: list[str], ruleset: dict, session: requests.
     ---------
     int
         The number of repositories that were updated with the ruleset
+
+    Raises:
+    -------
+    SystematicWriteError
+        If the first writes all failed with the same error
+    """
+    return apply_branch_rulesets([(ruleset, repo_list)], session)[ruleset.get("name")]  # type: ignore
+
+
+@profiled
+def apply_branch_rulesets(
+    ruleset_repos: list[tuple[dict, list[str]]],
+    session: requests.Session | None = None,
+    deadline: float | None = None,
+) -> dict[str, int]:
+    """
+    Apply several branch rulesets, each to its own list of repositories, in a single pass
+
+    Parameters:
+    ------------
+    ruleset_repos: list
+        A list of (ruleset, repo_list) tuples. Each GitHub ruleset will be
+        applied to the repositories in its repo list (in the format "org/repo").
+    session: requests.Session
+        An optional requests session for using the GitHub API. If not
+        passed, a new session will be created.
+    deadline: float
+        An optional time.monotonic() value after which no more rulesets
+        are applied
+
+    Returns:
+    ---------
+    dict[str, int]
+        A dictionary mapping ruleset names to the number of repositories
+        that were updated with the ruleset
+
+    Raises:
+    -------
+    SystematicWriteError
+        If the first writes all failed with the same error (for example,
+        because GitHub rejects the ruleset), so the rest weren't attempted
     """
     if session is None:
-        session = _get_session(reporule.TOKEN)
+        session = _get_session(reporule.TOKENS)
 
-    update_count = 0
-    ruleset_name = ruleset.get("name")
-    print("Applying ruleset:", ruleset_name)
-    for repo in repo_list:
-        branch_protection_url = f"https://api.github.com/repos/{repo}/rulesets"
+    rulesets = {}
+    items = []
+    for ruleset, repo_list in ruleset_repos:
+        ruleset_name = ruleset.get("name")
+        print("Applying ruleset:", ruleset_name)
+        rulesets[ruleset_name] = ruleset
+        items.extend((repo, ruleset_name) for repo in repo_list)
 
-        # Apply the branch ruleset
-        response = session.post(branch_protection_url, json=ruleset)
-        if response.ok:
-            print(f"  • {repo}: applied ruleset")
-            update_count += 1
-        else:
-            logger.error("Failed to apply branch ruleset", repo=repo, ruleset=ruleset_name, response=response.json())
+    # stop early if GitHub rejects the first writes in the same way
+    fail_fast = FailFast()
+
+    def _post(item):
+        repo, ruleset_name = item
+        try:
+            response = _create_branch_ruleset(repo, rulesets[ruleset_name], session)
+        except Exception as e:
+            fail_fast.record(type(e).__name__)
+            raise
+        fail_fast.record(_get_error_signature(response))
+        return response
+
+    progress.start_phase("applying", len(items))
+    results = run_concurrently(
+        _post,
+        items,
+        rate_limiter=RateLimiter(WRITE_REQUESTS_PER_SECOND),
+        deadline=deadline,
+        phase="applying",
+        fail_fast=fail_fast,
+    )
+    progress.finish_phase("applying")
+    applied = _count_write_results(results, "apply", "applied")
+    not_started = [item for item in items if item not in results]
+    if not_started:
+        logger.warning("Run stopped before all rulesets were applied", not_started=sorted(not_started))
+
+    applied_counts = {ruleset_name: sum(1 for _, name in applied if name == ruleset_name) for ruleset_name in rulesets}
+    if fail_fast.tripped():
+        raise SystematicWriteError(fail_fast.signature, applied_counts)  # type: ignore
+    return applied_counts
+
+
+@profiled
+def apply_branch_rulesets_pipelined(
+    org: str,
+    repo_pages: Iterable[list[dict]],
+    rulesets: list[dict],
+    session: requests.Session | None = None,
+    deadline: float | None = None,
+    dryrun: bool = False,
+) -> PipelineResult:
+    """
+    List an org's repositories, check their existing rulesets, and apply rulesets, all at the same time.
+
+    Unlike calling get_rulesets_repo_status and then apply_branch_rulesets,
+    repos flow from each step to the next through bounded queues: a repo's
+    rulesets are fetched as soon as its page of the repo list arrives, and
+    missing rulesets are applied as soon as they're found. Reads and
+    rate-limited writes overlap, so the run takes about as long as its
+    slowest step, rather than the sum of all three.
+
+    Parameters:
+    ------------
+    org : str
+        The GitHub organization or user name.
+    repo_pages : Iterable
+        Pages of repository dictionaries as returned by GitHub's API (for
+        example, from reporule.util._iter_repo_pages)
+    rulesets : list
+        The rulesets to apply
+    session: requests.Session
+        An optional requests session for using the GitHub API. If not
+        passed, a new session will be created.
+    deadline: float
+        An optional time.monotonic() value after which no more requests
+        are started
+    dryrun: bool
+        If True, find the repositories that need each ruleset without
+        applying any
+
+    Returns:
+    ---------
+    PipelineResult
+        The repo status for each ruleset, the scheduled and deferred writes,
+        the number of repositories each ruleset was applied to, and the errors
+        that stopped the run or the repo list, if any. Besides the keys
+        returned by get_rulesets_repo_status, each status includes "failed"
+        (repos whose rulesets couldn't be fetched).
+    """
+    if session is None:
+        session = _get_session(reporule.TOKENS)
+
+    rulesets_by_name = {ruleset["name"]: ruleset for ruleset in rulesets}
+    exceptions = _get_repo_exceptions(org)
+    archived_repos: set[str] = set()
+    # the listed repos on the exception list
+    excepted: set[str] = set()
+    no_admin: set[str] = set()
+    listed: set[str] = set()
+    # repos whose rulesets couldn't be fetched, and why
+    failed: dict[str, str] = {}
+    list_errors: list[str] = []
+    existing_rulesets: dict[str, list[str]] = {}
+    scheduled: dict[str, list[str]] = {name: [] for name in rulesets_by_name}
+    write_results: dict[tuple[str, str], requests.Response | Exception] = {}
+    fail_fast = FailFast()
+    lock = threading.Lock()
+
+    def _list():
+        try:
+            for page in repo_pages:
+                page_no_admin = _get_no_admin_repos(page)
+                for repo in page:
+                    repo_name = repo["full_name"]
+                    if repo.get("archived"):
+                        archived_repos.add(repo_name)
+                    elif repo_name in exceptions:
+                        excepted.add(repo_name)
+                    elif repo_name in page_no_admin:
+                        no_admin.add(repo_name)
+                    else:
+                        listed.add(repo_name)
+                        yield repo_name
+        except Exception as e:
+            # finish the repos already listed, so their writes are still reported
+            logger.error("Failed to list repositories", org=org, error=str(e))
+            list_errors.append(str(e))
+
+    def _scan(repo_name):
+        try:
+            names = _get_branch_rulesets(repo_name, session)
+        except Exception as e:
+            logger.error("Failed to get rulesets", repo=repo_name, error=str(e))
+            with lock:
+                failed[repo_name] = str(e)
+            progress.advance("scanning")
+            return []
+        missing = [(repo_name, name) for name in rulesets_by_name if name not in names]
+        with lock:
+            existing_rulesets[repo_name] = names
+            for _, name in missing:
+                scheduled[name].append(repo_name)
+        progress.advance("scanning")
+        return [] if dryrun else missing
+
+    def _post(item):
+        repo_name, ruleset_name = item
+        try:
+            response = _create_branch_ruleset(repo_name, rulesets_by_name[ruleset_name], session)
+            fail_fast.record(_get_error_signature(response))
+        except Exception as e:
+            fail_fast.record(type(e).__name__)
+            response = e
+        with lock:
+            write_results[item] = response
+        progress.advance("applying")
+        return []
+
+    stages = [(_scan, MAX_WORKERS, None)]
+    progress.start_phase("scanning")
+    if not dryrun:
+        stages.append((_post, MAX_WORKERS, RateLimiter(WRITE_REQUESTS_PER_SECOND)))
+        progress.start_phase("applying")
+    run_pipeline(_list(), stages, deadline=deadline, fail_fast=fail_fast)  # type: ignore
+    progress.finish_phase("scanning")
+    progress.finish_phase("applying")
+
+    eligible_repos = set(existing_rulesets)
+    if failed:
+        logger.warning(
+            "Failed to get the rulesets of some repos", failed=len(failed), error=next(iter(failed.values()))
+        )
+    unscanned = listed - eligible_repos - set(failed)
+    if unscanned:
+        logger.warning("Run stopped before every repo was scanned", unscanned=len(unscanned))
+    no_rulesets = {repo for repo in eligible_repos if not existing_rulesets[repo]}
+    status = {}
+    for ruleset_name in rulesets_by_name:
+        existing_ruleset = {repo for repo in eligible_repos if ruleset_name in existing_rulesets[repo]}
+        status[ruleset_name] = {
+            "archived": archived_repos,
+            "exceptions": excepted,
+            "existing_ruleset": existing_ruleset,
+            "eligible_repos": eligible_repos - existing_ruleset,
+            "no_rulesets": no_rulesets,
+            "unscanned": unscanned,
+            "failed": set(failed),
+            "no_admin": no_admin,
+        }
+
+    applied = _count_write_results(write_results, "apply", "applied") if not dryrun else set()
+    deferred = {
+        name: sorted(repo for repo in repo_list if (repo, name) not in write_results) if not dryrun else []
+        for name, repo_list in scheduled.items()
+    }
+    if any(deferred.values()):
+        logger.warning("Run stopped before all rulesets were applied", not_started=sum(map(len, deferred.values())))
 
-    return update_count
+    return PipelineResult(
+        status=status,
+        ruleset_repos=[(rulesets_by_name[name], sorted(repo_list)) for name, repo_list in scheduled.items()],
+        applied={name: sum(1 for _, applied_name in applied if applied_name == name) for name in rulesets_by_name},
+        deferred=deferred,
+        stopped_on_error=fail_fast.signature,
+        list_error=list_errors[0] if list_errors else None,
+    )
 
 
-def get_ruleset_repo_status(org: str, repo_list: list[dict], ruleset: dict) -> dict[str, set[str]]:
+def get_ruleset_repo_status(
+    org: str, repo_list: list[dict], ruleset: dict, session: requests.Session | None = None
+) -> dict[str, set[str]]:
     """
     Determine the ruleset eligibiility status for GitHub repository on the incoming repos list.
 
@@ -140,26 +549,719 @@ def get_ruleset_repo_status(org: str, repo_list: list[dict], ruleset: dict) -> d
         GitHub's API.
     ruleset : dict
         The ruleset to check against the repositories
+    session: requests.Session
+        An optional requests session for using the GitHub API. If not
+        passed, a new session will be created.
 
     Returns:
     ---------
     dict[str, str]
         A dictionary mapping repository names to their ruleset status.
     """
-    repo_status = {}
-    ruleset_name = ruleset["name"]
+    return get_rulesets_repo_status(org, repo_list, [ruleset], session)[ruleset["name"]]
+
+
+@profiled
+def get_rulesets_repo_status(
+    org: str,
+    repo_list: list[dict],
+    rulesets: list[dict],
+    session: requests.Session | None = None,
+    max_scans: int | None = None,
+    known_rulesets: dict[str, list[str]] | None = None,
+    deadline: float | None = None,
+    get_rulesets: Callable[[str], list[dict]] | None = None,
+) -> dict[str, dict[str, set[str]]]:
+    """
+    Determine the eligibility status of GitHub repositories for several rulesets at once.
+
+    Each repository's existing rulesets are fetched once, and the eligibility
+    for every ruleset is computed from that single snapshot. Besides the keys
+    returned by get_ruleset_repo_status, each status includes "no_rulesets"
+    (eligible repos that have no rulesets at all), "unscanned" (repos left
+    out because of max_scans or the deadline), and "no_admin" (repos the
+    token can't create rulesets on, according to the permissions in the repo
+    list).
+
+    Parameters:
+    ------------
+    org : str
+        The GitHub organization or user name.
+    repo_list : list
+        A list of dictionaries that represent repository objects as returned by
+        GitHub's API.
+    rulesets : list
+        The rulesets to check against the repositories
+    session: requests.Session
+        An optional requests session for using the GitHub API. If not
+        passed, a new session will be created.
+    max_scans: int
+        An optional limit on the number of repositories whose rulesets are
+        fetched. The most recently created repositories are fetched first.
+    known_rulesets: dict
+        An optional mapping of repository names to the names of their
+        rulesets, already known from an earlier run. These repositories'
+        rulesets aren't fetched again.
+    deadline: float
+        An optional time.monotonic() deadline. Repositories whose scans
+        haven't started by then are reported as unscanned.
+    get_rulesets: Callable
+        An optional function that returns a repository's rulesets (as
+        returned by GitHub's API), used to scan the repositories instead of
+        fetching their rulesets with the session
+
+    Returns:
+    ---------
+    dict[str, dict[str, set[str]]]
+        A dictionary mapping ruleset names to the status of the repositories
+        for that ruleset (in the format returned by get_ruleset_repo_status).
+    """
+    if session is None:
+        session = _get_session(reporule.TOKENS)
 
     all_repos = {r["full_name"] for r in repo_list}
     archived_repos = {r["full_name"] for r in repo_list if r.get("archived")}
-    exceptions = _get_repo_exceptions(org)
-    eligible_repos = all_repos - archived_repos - exceptions
-    existing_ruleset = {repo for repo in eligible_repos if ruleset_name in _get_branch_rulesets(repo)}
+    # only the listed repos on the exception list (a shard's results shouldn't count the others)
+    exceptions = _get_repo_exceptions(org) & all_repos
+    # creating a ruleset needs admin access, so don't spend requests scanning or writing these repos
+    no_admin = _get_no_admin_repos(repo_list) - archived_repos - exceptions
+    eligible_repos = all_repos - archived_repos - exceptions - no_admin
 
-    repo_status["archived"] = archived_repos
-    repo_status["exceptions"] = exceptions
-    repo_status["existing_ruleset"] = existing_ruleset
-    repo_status["eligible_repos"] = eligible_repos - existing_ruleset
+    known_rulesets = {repo: names for repo, names in (known_rulesets or {}).items() if repo in eligible_repos}
+    to_fetch = eligible_repos - set(known_rulesets)
 
-    logger.debug("Repo eligibility for ruleset", ruleset_name=ruleset_name, repo_status=repo_status)
+    unscanned: set[str] = set()
+    if max_scans is not None and len(to_fetch) > max_scans:
+        # newer repos are the most likely to be missing rulesets
+        newest_first = sorted(
+            (r for r in repo_list if r["full_name"] in to_fetch),
+            key=lambda r: r.get("created_at") or "",
+            reverse=True,
+        )
+        unscanned = {r["full_name"] for r in newest_first[max(max_scans, 0) :]}
+        eligible_repos = eligible_repos - unscanned
+        to_fetch = to_fetch - unscanned
+
+    def _scan(repo: str) -> list[str]:
+        if get_rulesets is not None:
+            return [r.get("name") for r in get_rulesets(repo)]
+        return _get_branch_rulesets(repo, session)
+
+    progress.start_phase("scanning", len(to_fetch))
+    existing_rulesets = run_concurrently(_scan, to_fetch, deadline=deadline, phase="scanning")
+    # repos that weren't scanned before the deadline or a cancellation
+    stopped = to_fetch - set(existing_rulesets)
+    if stopped:
+        logger.warning("Run stopped before every repo was scanned", unscanned=len(stopped))
+    # requests cut short by the run deadline or --time-budget end with a timeout or
+    # connection error, so their repos are reported as unscanned rather than ending the run
+    timed_out = {
+        repo: e for repo, e in existing_rulesets.items() if isinstance(e, (requests.Timeout, requests.ConnectionError))
+    }
+    for repo, repo_rulesets in existing_rulesets.items():
+        if isinstance(repo_rulesets, Exception) and repo not in timed_out:
+            raise repo_rulesets
+    if timed_out:
+        logger.warning(
+            "Repo scans timed out or lost their connection",
+            unscanned=len(timed_out),
+            error=str(next(iter(timed_out.values()))),
+        )
+        for repo in timed_out:
+            del existing_rulesets[repo]
+        stopped = stopped | set(timed_out)
+    if stopped:
+        unscanned = unscanned | stopped
+        eligible_repos = eligible_repos - stopped
+    existing_rulesets.update(known_rulesets)
+    no_rulesets = {repo for repo in eligible_repos if not existing_rulesets[repo]}
 
-    return repo_status
+    status = {}
+    for ruleset in rulesets:
+        ruleset_name = ruleset["name"]
+        existing_ruleset = {repo for repo in eligible_repos if ruleset_name in existing_rulesets[repo]}
+
+        repo_status = {}
+        repo_status["archived"] = archived_repos
+        repo_status["exceptions"] = exceptions
+        repo_status["existing_ruleset"] = existing_ruleset
+        repo_status["eligible_repos"] = eligible_repos - existing_ruleset
+        repo_status["no_rulesets"] = no_rulesets
+        repo_status["unscanned"] = unscanned
+        repo_status["no_admin"] = no_admin
+        status[ruleset_name] = repo_status
+
+        logger.debug(
+            "Repo eligibility for ruleset",
+            ruleset_name=ruleset_name,
+            repo_status=LazyField(lambda status=repo_status: {key: sorted(repos) for key, repos in status.items()}),
+        )
+
+    return status
+
+
+def estimate_ruleset_requests(org: str, repo_list: list[dict], ruleset_count: int) -> dict[str, int]:
+    """
+    Estimate the number of GitHub API requests used by each phase of applying rulesets.
+
+    Parameters:
+    ------------
+    org : str
+        The GitHub organization or user name.
+    repo_list : list
+        A list of dictionaries that represent repository objects as returned by
+        GitHub's API.
+    ruleset_count : int
+        The number of rulesets being applied
+
+    Returns:
+    ---------
+    dict[str, int]
+        The number of requests needed to list the repositories (including
+        verifying the org), to fetch the existing rulesets of the eligible
+        repositories, and (at most) to apply the rulesets. Keyed by "list",
+        "scan", and "apply".
+    """
+    skipped = _get_repo_exceptions(org) | _get_no_admin_repos(repo_list)
+    scan_count = sum(1 for r in repo_list if not r.get("archived") and r["full_name"] not in skipped)
+    list_pages = max(1, -(-len(repo_list) // REPOS_PER_PAGE))
+    estimate = {"list": 1 + list_pages, "scan": scan_count, "apply": scan_count * ruleset_count}
+    logger.debug("Estimated API requests", org=org, estimate=estimate)
+    return estimate
+
+
+def schedule_ruleset_writes(
+    ruleset_status: dict[str, dict[str, set[str]]], rulesets: list[dict], limit: int | None = None
+) -> tuple[list[tuple[dict, list[str]]], dict[str, list[str]]]:
+    """
+    Choose which rulesets to apply to which repos when they can't all be applied.
+
+    Repos that have no rulesets at all are scheduled first, followed by the repos
+    that are missing the most rulesets.
+
+    Parameters:
+    ------------
+    ruleset_status : dict
+        The repository status of each ruleset, as returned by get_rulesets_repo_status
+    rulesets : list
+        The rulesets to apply
+    limit : int
+        An optional limit on the number of rulesets to apply, across all repos
+
+    Returns:
+    ---------
+    tuple
+        A list of (ruleset, repo_list) tuples to pass to apply_branch_rulesets,
+        and a dictionary mapping ruleset names to the repos that were left out
+    """
+    missing: dict[str, int] = {}
+    no_rulesets: set[str] = set()
+    for repo_status in ruleset_status.values():
+        no_rulesets.update(repo_status.get("no_rulesets", set()))
+        for repo in repo_status["eligible_repos"]:
+            missing[repo] = missing.get(repo, 0) + 1
+
+    ruleset_order = {ruleset["name"]: i for i, ruleset in enumerate(rulesets)}
+
+    def _priority(item):
+        repo, ruleset_name = item
+        return (repo not in no_rulesets, -missing[repo], repo, ruleset_order[ruleset_name])
+
+    items = sorted(
+        ((repo, ruleset["name"]) for ruleset in rulesets for repo in ruleset_status[ruleset["name"]]["eligible_repos"]),
+        key=_priority,
+    )
+    if limit is not None:
+        scheduled, left = items[: max(limit, 0)], items[max(limit, 0) :]
+    else:
+        scheduled, left = items, []
+
+    ruleset_repos = [(ruleset, [repo for repo, name in scheduled if name == ruleset["name"]]) for ruleset in rulesets]
+    deferred = {ruleset["name"]: sorted(repo for repo, name in left if name == ruleset["name"]) for ruleset in rulesets}
+    return ruleset_repos, deferred
+
+
+def get_repo_delta(org: str, events: list[dict], source: str = "events") -> set[str]:
+    """
+    Determine which repositories were added to a GitHub organization, based on its event feed.
+
+    The organization events feed reports repositories that were created or
+    made public. Unarchived and transferred repositories are only reported
+    by the audit log.
+
+    Parameters:
+    ------------
+    org : str
+        The GitHub organization name.
+    events : list
+        A list of dictionaries that represent events (or audit log entries)
+        as returned by GitHub's API.
+    source : str
+        The feed that the events came from: "events" or "audit-log"
+
+    Returns:
+    ---------
+    set[str]
+        Full names of the repositories that were added to the organization
+    """
+    repos = set()
+    for event in events:
+        if source == "audit-log":
+            if event.get("action") in AUDIT_LOG_REPO_ACTIONS:
+                repos.add(event.get("repo", ""))
+        elif event.get("type") == "PublicEvent" or (
+            event.get("type") == "CreateEvent" and event.get("payload", {}).get("ref_type") == "repository"
+        ):
+            repos.add(event.get("repo", {}).get("name", ""))
+
+    # ignore repos that were transferred out of the org
+    repo_delta = {repo for repo in repos if repo.startswith(f"{org}/")}
+    logger.debug("Repositories added since last poll", org=org, source=source, repo_delta=repo_delta)
+
+    return repo_delta
+
+
+def get_ruleset_ids(repo_list: list[str], ruleset_name: str, session: requests.Session | None = None) -> dict[str, int]:
+    """
+    Find the id of a named ruleset in every specified repository.
+
+    Parameters:
+    ------------
+    repo_list: list
+        A list of repository names in the format "org/repo"
+    ruleset_name: str
+        The name of the ruleset to find
+    session: requests.Session
+        An optional requests session for using the GitHub API. If not
+        passed, a new session will be created.
+
+    Returns:
+    ---------
+    dict[str, int]
+        A dictionary mapping repository names to the id of their ruleset.
+        Repositories that don't have a ruleset with the specified name
+        are omitted.
+    """
+    if session is None:
+        session = _get_session(reporule.TOKENS)
+
+    # only a repo's own rulesets can be removed or updated through the repo
+    results = run_concurrently(lambda repo: _get_repo_rulesets(repo, session, includes_parents=False), repo_list)
+
+    ruleset_ids = {}
+    for repo, rulesets in results.items():
+        if isinstance(rulesets, Exception):
+            logger.error("Failed to get rulesets", repo=repo, error=str(rulesets))
+            continue
+        for r in rulesets:
+            if r.get("name") == ruleset_name:
+                ruleset_ids[repo] = r["id"]
+
+    logger.debug("Ruleset ids found", ruleset_name=ruleset_name, ruleset_ids=ruleset_ids)
+    return ruleset_ids  # type: ignore
+
+
+def remove_branch_ruleset(ruleset_ids: dict[str, int], session: requests.Session | None = None) -> int:
+    """
+    Delete a branch ruleset from every specified repository
+
+    Parameters:
+    ------------
+    ruleset_ids: dict
+        A dictionary mapping repository names (in the format "org/repo")
+        to the id of the ruleset to delete, as returned by get_ruleset_ids
+    session: requests.Session
+        An optional requests session for using the GitHub API. If not
+        passed, a new session will be created.
+
+    Returns:
+    ---------
+    int
+        The number of repositories that had the ruleset removed
+    """
+    if session is None:
+        session = _get_session(reporule.TOKENS)
+
+    def _delete(repo):
+        return session.delete(f"https://api.github.com/repos/{repo}/rulesets/{ruleset_ids[repo]}")
+
+    results = run_concurrently(_delete, ruleset_ids, rate_limiter=RateLimiter(WRITE_REQUESTS_PER_SECOND))
+    return len(_count_write_results(results, "remove", "removed"))
+
+
+def update_branch_ruleset(ruleset_ids: dict[str, int], ruleset: dict, session: requests.Session | None = None) -> int:
+    """
+    Replace an existing ruleset in every specified repository
+
+    Parameters:
+    ------------
+    ruleset_ids: dict
+        A dictionary mapping repository names (in the format "org/repo")
+        to the id of the ruleset to replace, as returned by get_ruleset_ids
+    ruleset: dict
+        The GitHub ruleset that replaces the existing one
+    session: requests.Session
+        An optional requests session for using the GitHub API. If not
+        passed, a new session will be created.
+
+    Returns:
+    ---------
+    int
+        The number of repositories that had the ruleset updated
+    """
+    if session is None:
+        session = _get_session(reporule.TOKENS)
+
+    def _put(repo):
+        return session.put(f"https://api.github.com/repos/{repo}/rulesets/{ruleset_ids[repo]}", json=ruleset)
+
+    results = run_concurrently(_put, ruleset_ids, rate_limiter=RateLimiter(WRITE_REQUESTS_PER_SECOND))
+    return len(_count_write_results(results, "update", "updated"))
+
+
+def build_audit_snapshot(orgs: list[str], previous: dict, session: requests.Session | None = None) -> dict:
+    """
+    Build a snapshot of the rulesets on every repository of one or more GitHub organizations.
+
+    A repository's rulesets include the rulesets it inherits from its
+    organization, as ruleset apply counts them. Rulesets are requested
+    conditionally, using the ETags saved in the previous snapshot, so only
+    repositories whose rulesets changed are downloaded again.
+
+    Parameters:
+    ------------
+    orgs : list
+        The GitHub organization or user names to audit
+    previous : dict
+        The snapshot saved by the previous audit (or an empty dictionary)
+    session: requests.Session
+        An optional requests session for using the GitHub API. If not
+        passed, a new session will be created.
+
+    Returns:
+    ---------
+    dict
+        The snapshot: for each org, a dictionary mapping repository names to
+        their archived status, ruleset names, and rulesets ETag (with the URL
+        it was returned for)
+    """
+    if session is None:
+        session = _get_session(reporule.TOKENS)
+
+    snapshot: dict = {"created_at": datetime.now(timezone.utc).isoformat(), "orgs": {}}
+    for org in orgs:
+        previous_repos = previous.get("orgs", {}).get(org, {})
+        repos = {r["full_name"]: {"archived": bool(r.get("archived"))} for r in _get_repo(org, session=session)}
+
+        def _fetch(repo):
+            # the rulesets ruleset apply sees, including inherited ones. An ETag
+            # is only valid for the URL and parameters it was returned for
+            previous_info = previous_repos.get(repo, {})
+            etag = previous_info.get("etag") if previous_info.get("url") == _get_repo_rulesets_url(repo) else None
+            return _get_repo_rulesets_if_changed(repo, etag, session)
+
+        active_repos = [repo for repo, info in repos.items() if not info["archived"]]
+        results = run_concurrently(_fetch, active_repos)
+        refetched = 0
+        for repo, info in repos.items():
+            previous_info = previous_repos.get(repo, {})
+            result = results.get(repo)
+            if result is None or isinstance(result, Exception):
+                # archived repos aren't checked, and failed checks keep their previous state
+                if isinstance(result, Exception):
+                    logger.error("Failed to get rulesets", repo=repo, error=str(result))
+                info["rulesets"] = previous_info.get("rulesets", [])
+                info["etag"] = previous_info.get("etag")
+                info["url"] = previous_info.get("url")
+                continue
+            rulesets, etag = result
+            if rulesets is None:
+                info["rulesets"] = previous_info.get("rulesets", [])
+            else:
+                refetched += 1
+                info["rulesets"] = sorted(r.get("name") for r in rulesets)
+            info["etag"] = etag
+            info["url"] = _get_repo_rulesets_url(repo)
+
+        logger.info("Org audited", org=org, repos=len(repos), refetched=refetched)
+        snapshot["orgs"][org] = repos
+
+    return snapshot
+
+
+def diff_audit_snapshots(previous: dict, current: dict, ruleset_names: list[str]) -> dict:
+    """
+    Compare two audit snapshots.
+
+    Parameters:
+    ------------
+    previous : dict
+        The snapshot saved by the previous audit (or an empty dictionary)
+    current : dict
+        The snapshot built by the current audit
+    ruleset_names : list
+        Names of the rulesets that every active repository (not archived
+        and not on the exception list) should have
+
+    Returns:
+    ---------
+    dict
+        A dictionary of sets of repository names: "new_repos",
+        "removed_repos", and "archived_repos" (repos archived since the
+        previous audit), along with "non_compliant" and "covered", which map
+        each ruleset name to the repositories that lost or gained it
+    """
+    delta: dict = {
+        "new_repos": set(),
+        "removed_repos": set(),
+        "archived_repos": set(),
+        "non_compliant": {name: set() for name in ruleset_names},
+        "covered": {name: set() for name in ruleset_names},
+    }
+    for org, repos in current.get("orgs", {}).items():
+        previous_repos = previous.get("orgs", {}).get(org, {})
+        exceptions = _get_repo_exceptions(org)
+        delta["new_repos"] |= set(repos) - set(previous_repos)
+        delta["removed_repos"] |= set(previous_repos) - set(repos)
+
+        for repo, info in repos.items():
+            previous_info = previous_repos.get(repo)
+            if info["archived"]:
+                if previous_info is not None and not previous_info["archived"]:
+                    delta["archived_repos"].add(repo)
+                continue
+            if repo in exceptions:
+                continue
+            for name in ruleset_names:
+                has_ruleset = name in info["rulesets"]
+                # new repos count as non-compliant (or covered) for the first time
+                had_ruleset = (
+                    None if previous_info is None or previous_info["archived"] else name in previous_info["rulesets"]
+                )
+                if not has_ruleset and had_ruleset is not False:
+                    delta["non_compliant"][name].add(repo)
+                elif has_ruleset and had_ruleset is not True:
+                    delta["covered"][name].add(repo)
+
+    return delta
+
+
+@profiled
+def simulate_branch_rulesets(
+    repo_list: list[dict],
+    rulesets: list[dict],
+    cache: dict | None = None,
+    session: requests.Session | None = None,
+    refresh: bool = False,
+) -> dict[str, dict]:
+    """
+    Count the branches of each repository that each ruleset's ref_name conditions target.
+
+    Branch names are fetched concurrently: first page one of every
+    repository, then all of the remaining pages at once. They're saved in the
+    cache and reused for BRANCH_CACHE_MAX_AGE seconds, so simulating an
+    edited ruleset doesn't request them again.
+
+    Parameters:
+    ------------
+    repo_list : list
+        A list of dictionaries that represent repository objects as returned by
+        GitHub's API.
+    rulesets : list
+        The branch rulesets to simulate
+    cache : dict
+        Optional branch names saved by a previous simulation. It is updated
+        with the branch names fetched by this one.
+    session: requests.Session
+        An optional requests session for using the GitHub API. If not
+        passed, a new session will be created.
+    refresh : bool
+        If True, fetch every repository's branch names, even if they're cached
+
+    Returns:
+    ---------
+    dict
+        A dictionary mapping each repository name (in the format "org/repo")
+        to its number of "branches" and the number of branches "matched" by
+        each ruleset. Repositories whose branches couldn't be fetched are
+        left out.
+
+    Raises:
+    -------
+    ValueError
+        If a ruleset's ref_name patterns can't be compiled
+    """
+    if session is None:
+        session = _get_session(reporule.TOKENS)
+    if cache is None:
+        cache = {}
+
+    # compile each ruleset's patterns once, rather than once per branch
+    matchers = {r["name"]: RefNameMatcher(r.get("conditions", {}).get("ref_name", {})) for r in rulesets}
+
+    now = time.time()
+    to_fetch = [
+        r["full_name"]
+        for r in repo_list
+        if refresh or now - cache.get(r["full_name"], {}).get("fetched_at", 0) > BRANCH_CACHE_MAX_AGE
+    ]
+    progress.start_phase("branches", len(to_fetch))
+    first_pages = run_concurrently(lambda repo: _get_branch_page(repo, 1, session), to_fetch, phase="branches")
+    more_pages = [
+        (repo, page)
+        for repo, result in first_pages.items()
+        if not isinstance(result, Exception)
+        for page in range(2, result[1] + 1)
+    ]
+    pages = run_concurrently(lambda item: _get_branch_page(*item, session), more_pages)
+    progress.finish_phase("branches")
+    failed_repos = set()
+    for repo in to_fetch:
+        first_page = first_pages.get(repo)
+        repo_pages = (
+            [pages.get((repo, page)) for page in range(2, first_page[1] + 1)] if isinstance(first_page, tuple) else []
+        )
+        failed = [p for p in [first_page, *repo_pages] if p is None or isinstance(p, Exception)]
+        if failed:
+            # pages that weren't fetched (None) were skipped by a cancellation
+            logger.error("Failed to get branches", repo=repo, error=str(failed[0]) if failed[0] else "not fetched")
+            failed_repos.add(repo)
+            continue
+        branches = [name for page in [first_page, *repo_pages] for name in page[0]]  # type: ignore
+        cache[repo] = {"fetched_at": now, "branches": branches}
+
+    results = {}
+    for repo in repo_list:
+        name = repo["full_name"]
+        if name not in cache or name in failed_repos:
+            continue
+        branches = cache[name]["branches"]
+        default_branch = repo.get("default_branch")
+        results[name] = {
+            "branches": len(branches),
+            "matched": {r: matcher.count(branches, default_branch) for r, matcher in matchers.items()},
+        }
+
+    logger.info("Rulesets simulated", repos=len(results), fetched=len(to_fetch), pages=len(to_fetch) + len(more_pages))
+    return results
+
+
+def merge_shard_results(results: list[dict]) -> dict:
+    """
+    Combine the JSON results written by sharded runs of a reporule command.
+
+    Parameters:
+    ------------
+    results : list
+        A list of dictionaries, each written by the --output-json option of
+        one shard's run of the list or ruleset command
+
+    Returns:
+    ---------
+    dict
+        A summary of all shards: the shards found, any shards missing from
+        the results, and the combined counts for each ruleset (or the combined
+        repo count, for the list command)
+
+    Raises:
+    -------
+    ValueError
+        If the results come from different commands, organizations, or shard
+        counts, include a shard more than once, or mix dry runs and real runs
+    """
+    if not results:
+        raise ValueError("No shard results to merge.")
+    for key in ["command", "org"]:
+        values = {r.get(key) for r in results}
+        if len(values) > 1:
+            raise ValueError(f"Shard results have different {key} values: {sorted(values)}")
+    shard_counts = {int(r["shard"].split("/")[1]) for r in results}
+    if len(shard_counts) > 1:
+        raise ValueError(f"Shard results have different shard counts: {sorted(shard_counts)}")
+
+    shard_count = shard_counts.pop()
+    shards = sorted(r["shard"] for r in results)
+    duplicates = sorted({shard for shard in shards if shards.count(shard) > 1})
+    if duplicates:
+        raise ValueError(f"Shard results include the same shard more than once: {duplicates}")
+    dryrun_values = {r.get("dryrun", False) for r in results}
+    if len(dryrun_values) > 1:
+        raise ValueError("Shard results mix dry runs and real runs.")
+    missing_shards = [f"{i}/{shard_count}" for i in range(1, shard_count + 1) if f"{i}/{shard_count}" not in shards]
+    summary = {
+        "command": results[0]["command"],
+        "org": results[0]["org"],
+        "shards": shards,
+        "missing_shards": missing_shards,
+    }
+
+    if summary["command"] == "list":
+        summary["repos"] = sum(len(r.get("repos", [])) for r in results)
+        return summary
+
+    rulesets: dict[str, dict[str, int]] = {}
+    for r in results:
+        for ruleset_name, counts in r.get("rulesets", {}).items():
+            totals = rulesets.setdefault(ruleset_name, {"eligible": 0, "skipped": 0, "applied": 0})
+            totals["eligible"] += len(counts.get("eligible", []))
+            totals["skipped"] += len(counts.get("skipped", []))
+            totals["applied"] += counts.get("applied", 0)
+    summary["rulesets"] = rulesets
+    summary["total_applied"] = sum(totals["applied"] for totals in rulesets.values())
+
+    logger.debug("Shard results merged", summary=summary)
+    return summary
+
+
+def _get_no_admin_repos(repo_list: list[dict]) -> set[str]:
+    """
+    Return the repos that GitHub reports the token doesn't have admin access to.
+
+    Repos without a permissions object (for example, when listed without a
+    token) are assumed to be writable.
+    """
+    return {r["full_name"] for r in repo_list if r.get("permissions") and not r["permissions"].get("admin")}
+
+
+def _get_error_signature(response: requests.Response) -> str | None:
+    """
+    Return a summary of a failed response's error that is the same for every repo, or None if the request succeeded.
+
+    The signature is made of the status code and GitHub's error messages,
+    which don't include the repo name.
+    """
+    if response.ok:
+        return None
+    try:
+        payload = response.json()
+        errors = payload.get("errors") or []
+        messages = [payload.get("message", "")] + [e if isinstance(e, str) else json.dumps(e) for e in errors]
+    except (ValueError, AttributeError):
+        messages = [response.reason or ""]
+    return f"{response.status_code} " + "; ".join(m for m in messages if m)
+
+
+def _count_write_results(results: dict, action: str, past_tense: str) -> set:
+    """
+    Report the outcome of concurrent ruleset writes.
+
+    Results are keyed by repo name, or by (repo name, ruleset name) tuples.
+    Returns the keys of the writes that succeeded.
+    """
+    succeeded = set()
+    for key, response in sorted(results.items()):
+        repo, ruleset_name = key if isinstance(key, tuple) else (key, None)
+        label = f"{repo}: {past_tense} ruleset" + (f" {ruleset_name}" if ruleset_name else "")
+        if isinstance(response, Exception):
+            logger.error(f"Failed to {action} branch ruleset", repo=repo, ruleset=ruleset_name, error=str(response))
+        elif response.ok:
+            print(f"  • {label}")
+            succeeded.add(key)
+        else:
+            try:
+                detail = response.json()
+            except ValueError:
+                # a proxy or GitHub outage can answer with an HTML error page
+                detail = response.text
+            logger.error(f"Failed to {action} branch ruleset", repo=repo, ruleset=ruleset_name, response=detail)
+    return succeeded
@@ -0,0 +1,374 @@
+"""Concurrent, rate-limited execution of GitHub API requests."""
+
+import queue
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable, Hashable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+import structlog
+
+from reporule import progress
+from reporule.logging import flush_logs
+
+logger = structlog.get_logger()
+
+# Number of concurrent requests made by reporule. GitHub's secondary rate
+# limits allow up to 100 concurrent requests, but recommend far fewer.
+MAX_WORKERS = 8
+
+# GitHub's secondary rate limits allow up to 80 content-creating requests
+# (POST, PATCH, PUT, DELETE) per minute
+# https://docs.github.com/en/rest/using-the-rest-api/rate-limits-for-the-rest-api#about-secondary-rate-limits
+WRITE_REQUESTS_PER_SECOND = 80 / 60
+
+# The number of writes that must fail in the same way, before any write
+# succeeds, to stop the rest of a batch (see FailFast)
+FAIL_FAST_WRITES = 5
+
+# The number of items that can wait between two stages of a pipeline
+PIPELINE_QUEUE_SIZE = 100
+
+# The time.monotonic() value by which the whole run must finish, if any
+RUN_DEADLINE: float | None = None
+
+# Returned in place of a result for calls skipped because of a deadline
+_NOT_STARTED = object()
+
+# Tells a pipeline stage's worker that there are no more items
+_DONE = object()
+
+# Set when the run is cancelled, so no new calls are started
+_cancelled = threading.Event()
+
+# The cancellation event of the current context: the run's, unless code
+# embedding reporule (see reporule.Client) has its own (see cancellation_scope)
+_cancellation: ContextVar[threading.Event] = ContextVar("cancellation", default=_cancelled)
+
+
+class RateLimiter:
+    """
+    Limit how often requests can start, across all threads that share the limiter.
+
+    Parameters:
+    ------------
+    requests_per_second : float
+        The maximum sustained rate at which requests can start
+    """
+
+    # set to False to turn off rate limiting (for example, when replaying
+    # recorded responses)
+    enabled = True
+
+    def __init__(self, requests_per_second: float):
+        self.interval = 1 / requests_per_second
+        self._next_start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until the caller is allowed to start a request."""
+        if not self.enabled:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class FailFast:
+    """
+    Stop a batch of calls when its first calls all fail in the same way.
+
+    A problem that affects every call (for example, a ruleset that uses a rule
+    the org's GitHub plan doesn't support) would otherwise fail once per
+    repo, spending the rate limit on requests that can't succeed. Once any
+    call succeeds, the failures are assumed to be specific to their repos.
+
+    Parameters:
+    ------------
+    threshold : int
+        The number of calls that must fail with the same error signature,
+        before any call succeeds, to stop the batch
+    """
+
+    def __init__(self, threshold: int = FAIL_FAST_WRITES):
+        self.threshold = threshold
+        self.signature: str | None = None
+        self._failures: Counter = Counter()
+        self._succeeded = False
+        self._lock = threading.Lock()
+
+    def record(self, signature: str | None):
+        """Record the outcome of a call: None if it succeeded, or a signature that identifies its error."""
+        with self._lock:
+            if signature is None:
+                self._succeeded = True
+                return
+            if self._succeeded or self.signature is not None:
+                return
+            self._failures[signature] += 1
+            if self._failures[signature] >= self.threshold:
+                self.signature = signature
+                logger.error("Stopping after repeated identical failures", failures=self.threshold, error=signature)
+
+    def tripped(self) -> bool:
+        """Return True if the batch should stop."""
+        return self.signature is not None
+
+
+def run_concurrently(
+    func: Callable[[Any], Any],
+    items: Iterable[Hashable],
+    max_workers: int = MAX_WORKERS,
+    rate_limiter: RateLimiter | None = None,
+    deadline: float | None = None,
+    phase: str | None = None,
+    fail_fast: FailFast | None = None,
+) -> dict[Hashable, Any]:
+    """
+    Call a function for every item, using a pool of worker threads.
+
+    An interrupt (Ctrl-C) cancels the run: no new calls are started, the calls
+    in flight are allowed to finish, and their results are returned.
+
+    Parameters:
+    ------------
+    func : Callable
+        The function to call. It receives a single item as its argument.
+    items : Iterable
+        The items to process
+    max_workers : int
+        The maximum number of concurrent function calls
+    rate_limiter : RateLimiter
+        An optional rate limiter that each call must acquire before it starts
+    deadline : float
+        An optional time.monotonic() value. Calls that haven't started by the
+        deadline (or the run deadline, if earlier) are skipped.
+    phase : str
+        An optional progress phase that is advanced as each call completes
+    fail_fast : FailFast
+        An optional FailFast, updated by func. Calls that haven't started
+        when it trips are skipped.
+
+    Returns:
+    ---------
+    dict
+        A dictionary mapping each item to the function's return value, or to
+        the exception raised by the function. Items skipped because of the
+        deadline, because the run was cancelled, or because fail_fast tripped,
+        are not included.
+    """
+
+    deadline = min((d for d in (deadline, RUN_DEADLINE) if d is not None), default=None)
+    # the worker threads don't share the caller's context
+    cancellation = _cancellation.get()
+
+    def _stopped():
+        return (
+            cancellation.is_set()
+            or (deadline is not None and time.monotonic() >= deadline)
+            or (fail_fast is not None and fail_fast.tripped())
+        )
+
+    def _call(item):
+        if _stopped():
+            return _NOT_STARTED
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        if _stopped():
+            return _NOT_STARTED
+        with progress.in_flight():
+            return func(item)
+
+    results: dict[Hashable, Any] = {}
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = {executor.submit(_call, item): item for item in items}
+    try:
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                result = future.result()
+                if result is not _NOT_STARTED:
+                    results[item] = result
+            except Exception as e:
+                logger.debug("Concurrent call failed", item=item, error=str(e))
+                results[item] = e
+            if phase is not None:
+                progress.advance(phase)
+    except KeyboardInterrupt:
+        # stop starting new calls, and let the ones in flight finish (they're
+        # bounded by the request timeouts) so their results can be reported
+        cancellation.set()
+        logger.warning("Interrupted; waiting for requests in flight to finish")
+        executor.shutdown(wait=True, cancel_futures=True)
+        for future, item in futures.items():
+            if not future.done() or future.cancelled():
+                continue
+            error = future.exception()
+            if error is None and future.result() is not _NOT_STARTED:
+                results[item] = future.result()
+            elif isinstance(error, Exception):
+                results[item] = error
+    else:
+        executor.shutdown(wait=True)
+    # the caller's output comes after the calls' log events
+    flush_logs()
+    return results
+
+
+def run_pipeline(
+    items: Iterable[Any],
+    stages: list[tuple[Callable[[Any], Iterable[Any]], int, RateLimiter | None]],
+    queue_size: int = PIPELINE_QUEUE_SIZE,
+    deadline: float | None = None,
+    fail_fast: FailFast | None = None,
+):
+    """
+    Pass items through a series of stages that run at the same time, connected by bounded queues.
+
+    Each stage is a function, a number of worker threads, and an optional
+    rate limiter. The function receives one item and returns the items for the
+    next stage (the last stage's return values are ignored). Items are read
+    from the items iterable in the calling thread, so a slow source (for
+    example, a paginated API) overlaps with the work of the later stages.
+    When a queue is full, the stage before it waits, so memory stays bounded.
+
+    Functions should handle their own errors; an exception is logged and the
+    item is dropped. Like run_concurrently, the pipeline stops starting calls
+    once the deadline passes, the run is cancelled, or fail_fast trips, but
+    lets the calls in flight finish.
+
+    Parameters:
+    ------------
+    items : Iterable
+        The items for the first stage
+    stages : list
+        A list of (function, workers, rate_limiter) tuples
+    queue_size : int
+        The maximum number of items waiting for each stage
+    deadline : float
+        An optional time.monotonic() value after which no calls are started
+    fail_fast : FailFast
+        An optional FailFast, updated by the stage functions
+    """
+    deadline = min((d for d in (deadline, RUN_DEADLINE) if d is not None), default=None)
+    # the worker threads don't share the caller's context
+    cancellation = _cancellation.get()
+
+    def _stopped():
+        return (
+            cancellation.is_set()
+            or (deadline is not None and time.monotonic() >= deadline)
+            or (fail_fast is not None and fail_fast.tripped())
+        )
+
+    queues: list[queue.Queue] = [queue.Queue(maxsize=queue_size) for _ in stages]
+
+    def _work(index: int, func: Callable, rate_limiter: RateLimiter | None):
+        outbox = queues[index + 1] if index + 1 < len(queues) else None
+        # keep taking items after stopping, so the stages before never block
+        while (item := queues[index].get()) is not _DONE:
+            if _stopped():
+                continue
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            if _stopped():
+                continue
+            try:
+                with progress.in_flight():
+                    outputs = list(func(item))
+            except Exception as e:
+                logger.error("Pipeline call failed", item=item, error=str(e))
+                continue
+            if outbox is not None:
+                for output in outputs:
+                    outbox.put(output)
+
+    workers = [
+        [
+            threading.Thread(
+                target=_work, args=(index, func, rate_limiter), name=f"reporule-stage-{index}", daemon=True
+            )
+            for _ in range(count)
+        ]
+        for index, (func, count, rate_limiter) in enumerate(stages)
+    ]
+    for thread in (thread for stage_workers in workers for thread in stage_workers):
+        thread.start()
+
+    try:
+        for item in items:
+            if _stopped():
+                break
+            queues[0].put(item)
+    except KeyboardInterrupt:
+        cancellation.set()
+        logger.warning("Interrupted; waiting for requests in flight to finish")
+    finally:
+        # shut down one stage at a time, so each stage's output is queued
+        # before the next stage is told there are no more items
+        for index, stage_workers in enumerate(workers):
+            for _ in stage_workers:
+                queues[index].put(_DONE)
+            for thread in stage_workers:
+                thread.join()
+        flush_logs()
+
+
+def cancel():
+    """Stop starting new calls in run_concurrently, for the rest of the run."""
+    _cancellation.get().set()
+
+
+def reset_cancellation():
+    """Allow calls to start again, after an earlier run was cancelled."""
+    _cancellation.get().clear()
+
+
+@contextmanager
+def cancellation_scope(event: threading.Event) -> Iterator[threading.Event]:
+    """
+    Use a separate cancellation event for the calls made in this context.
+
+    Cancelling them (or the run) then doesn't affect the other.
+    """
+    token = _cancellation.set(event)
+    try:
+        yield event
+    finally:
+        _cancellation.reset(token)
+
+
+def start_run(deadline: float | None = None):
+    """Start a run: clear an earlier run's cancellation, and set the run deadline (in seconds from now)."""
+    reset_cancellation()
+    set_run_deadline(deadline)
+
+
+def cancelled() -> bool:
+    """Return True if the run was cancelled (for example, with Ctrl-C)."""
+    return _cancellation.get().is_set()
+
+
+def set_run_deadline(seconds: float | None):
+    """
+    Set a deadline for the whole run, a number of seconds from now.
+
+    run_concurrently skips calls that haven't started by the deadline, and
+    requests sent through reporule's sessions stop retrying and time out by it.
+    """
+    global RUN_DEADLINE
+    RUN_DEADLINE = time.monotonic() + seconds if seconds is not None else None
+
+
+def remaining_time() -> float | None:
+    """Return the number of seconds left before the run deadline, or None if there is no deadline."""
+    if RUN_DEADLINE is None:
+        return None
+    return RUN_DEADLINE - time.monotonic()
@@ -1,19 +1,175 @@
 """reporule logging configuration."""
 
+import atexit
 import logging
 import os
+import queue
 import sys
+import threading
+import time
+from collections.abc import Callable
+from typing import Any, TextIO
 
 import structlog
 
+# The default number of debug events with the same message logged per second.
+# Per-repo debug events beyond this are dropped, and the number dropped is
+# reported on the next event that gets through.
+DEBUG_EVENTS_PER_SECOND = 20
+
+# The QueueLogger set up by setup_logging, if any (see flush_logs)
+_QUEUE_LOGGER: "QueueLogger | None" = None
+
+
+class LazyField:
+    """
+    A log field whose value is only computed if the event is logged.
+
+    Events below the log level are dropped before any processors run, so
+    expensive values (for example, a response payload) wrapped in a LazyField
+    cost nothing when their level is disabled.
+
+    Parameters:
+    ------------
+    func : Callable
+        A function, called without arguments, that returns the field's value
+    """
+
+    __slots__ = ("func",)
+
+    def __init__(self, func: Callable[[], Any]):
+        self.func = func
+
+    def __repr__(self) -> str:
+        return repr(self.func())
+
+
+def resolve_lazy_fields(logger, method_name: str, event_dict: dict) -> dict:
+    """A structlog processor that computes the value of each LazyField in an event."""
+    for key, value in event_dict.items():
+        if isinstance(value, LazyField):
+            event_dict[key] = value.func()
+    return event_dict
+
+
+class DebugEventRateLimiter:
+    """
+    A structlog processor that limits how often a debug event with the same message is logged.
+
+    Parameters:
+    ------------
+    events_per_second : float
+        The number of debug events with the same message that can be logged
+        per second. Zero turns off the limit.
+    """
+
+    def __init__(self, events_per_second: float):
+        self.events_per_second = events_per_second
+        self._windows: dict[str, tuple[int, int, int]] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, logger, method_name: str, event_dict: dict) -> dict:
+        if method_name != "debug" or not self.events_per_second:
+            return event_dict
+        event = str(event_dict.get("event"))
+        window = int(time.monotonic())
+        with self._lock:
+            start, count, suppressed = self._windows.get(event, (window, 0, 0))
+            if start != window:
+                start, count = window, 0
+            if count >= self.events_per_second:
+                self._windows[event] = (start, count, suppressed + 1)
+                raise structlog.DropEvent
+            self._windows[event] = (start, count + 1, 0)
+        if suppressed:
+            event_dict["suppressed"] = suppressed
+        return event_dict
+
+
+class QueueLogger:
+    """
+    A structlog logger that writes events as JSON lines from a background thread.
+
+    Events are rendered in the thread that logged them (so later changes to
+    their field values don't show up in the log), and worker threads only put
+    the line on a queue, so writing the log doesn't slow them down. Events
+    logged by the main thread are written right away, after the queued lines,
+    so they stay in order with the command's printed output. Call flush_logs()
+    before printing output that follows work done by other threads. Queued
+    events are written when the program exits.
+
+    Parameters:
+    ------------
+    file : TextIO
+        The file to write the log to. Defaults to sys.stdout.
+    """
+
+    def __init__(self, file: TextIO | None = None):
+        self.file = file or sys.stdout
+        self._renderer = structlog.processors.JSONRenderer()
+        self._queue: queue.Queue = queue.Queue()
+        self._write_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._write_queued, name="reporule-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def msg(self, **event_dict):
+        line = self._renderer(None, "", event_dict) + "\n"
+        if threading.current_thread() is threading.main_thread() or not self._thread.is_alive():
+            self.flush()
+            self._write(line)
+        else:
+            self._queue.put(line)
+
+    log = debug = info = warn = warning = error = critical = exception = msg
+
+    def _write(self, line: str):
+        with self._write_lock:
+            self.file.write(line)
+            self.file.flush()
+
+    def _write_queued(self):
+        while (line := self._queue.get()) is not None:
+            self._write(line)
+            self._queue.task_done()
+        self._queue.task_done()
+
+    def flush(self):
+        """Wait until the queued events are written."""
+        if self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """Write the queued events and stop the background thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+
+def flush_logs():
+    """Write the events queued by the JSON logger, so output printed next comes after them."""
+    if _QUEUE_LOGGER is not None:
+        _QUEUE_LOGGER.flush()
+
 
 def setup_logging():
     """Set up structlog-based logging configuration."""
     # get log level from env variable or default to INFO
+    global _QUEUE_LOGGER
+
     level = os.environ.get("LOG_LEVEL", "INFO").upper()
     LOG_LEVEL = getattr(logging, level)
+    invalid_events_per_second = None
+    try:
+        events_per_second = float(os.environ.get("LOG_DEBUG_EVENTS_PER_SECOND", DEBUG_EVENTS_PER_SECOND))
+    except ValueError:
+        invalid_events_per_second = os.environ["LOG_DEBUG_EVENTS_PER_SECOND"]
+        events_per_second = DEBUG_EVENTS_PER_SECOND
 
+    # drop rate-limited events before doing any work to format them
     shared_processors = [
+        DebugEventRateLimiter(events_per_second),
+        resolve_lazy_fields,
         structlog.processors.TimeStamper(fmt="%Y-%m-%d %H:%M:%S"),
         structlog.processors.add_log_level,
     ]
@@ -26,7 +182,6 @@ def setup_logging():
                     structlog.processors.CallsiteParameter.FILENAME,
                     structlog.processors.CallsiteParameter.FUNC_NAME,
                     structlog.processors.CallsiteParameter.LINENO,
-                    structlog.processors.CallsiteParameter.PATHNAME,
                 ],
             )
         )
@@ -36,15 +191,27 @@ def setup_logging():
         processors = shared_processors + [
             structlog.dev.ConsoleRenderer(),
         ]  # pragma: no cover
+        logger_factory: Callable = structlog.PrintLoggerFactory()
     else:
-        # Otherwise, output logs in JSON format
+        # Otherwise, output logs in JSON format, rendered and written by a
+        # background thread
         processors = shared_processors + [
             structlog.processors.dict_tracebacks,
-            structlog.processors.JSONRenderer(),
         ]
+        queue_logger = _QUEUE_LOGGER = QueueLogger()
+
+        def logger_factory(*args):
+            return queue_logger
 
     structlog.configure(
         processors=processors,
+        logger_factory=logger_factory,
         cache_logger_on_first_use=True,
         wrapper_class=structlog.make_filtering_bound_logger(LOG_LEVEL),
     )
+    if invalid_events_per_second is not None:
+        structlog.get_logger().warning(
+            "LOG_DEBUG_EVENTS_PER_SECOND isn't a number; using the default",
+            value=invalid_events_per_second,
+            default=DEBUG_EVENTS_PER_SECOND,
+        )
@@ -1,14 +1,92 @@
 """Create the reporule CLI."""
 
+from pathlib import Path
+
 import structlog
 import typer
+from typing_extensions import Annotated
 
+from reporule import cassette, executor, memo, profiling
+from reporule.executor import RateLimiter
+from reporule.repo.audit import app as audit_app
 from reporule.repo.list import app as list_app
+from reporule.repo.merge import app as merge_app
+from reporule.repo.poll import app as poll_app
 from reporule.repo.ruleset import app as ruleset_app
+from reporule.util import _clear_run_caches
 
 logger = structlog.get_logger()
 
 app = typer.Typer(no_args_is_help=True, pretty_exceptions_show_locals=False, add_completion=False)
 
+
+@app.callback()
+def main(
+    ctx: typer.Context,
+    record: Annotated[
+        Path | None,
+        typer.Option("--record", help="Record every GitHub API response to a cassette file.", dir_okay=False),
+    ] = None,
+    replay: Annotated[
+        Path | None,
+        typer.Option(
+            "--replay",
+            help="Answer GitHub API requests from a cassette file recorded with --record, without using the network.",
+            exists=True,
+            dir_okay=False,
+        ),
+    ] = None,
+    deadline: Annotated[
+        float | None,
+        typer.Option(
+            "--deadline",
+            help="Stop the run after this many seconds, reporting the work that was done.",
+            min=0,
+        ),
+    ] = None,
+    profile: Annotated[
+        Path | None,
+        typer.Option(
+            "--profile",
+            help="Write CPU, stack sample, and memory profiles of each phase of the command to a directory.",
+            file_okay=False,
+        ),
+    ] = None,
+):
+    """A CLI for standardizing repos in a GitHub org."""
+    if record and replay:
+        raise typer.BadParameter("Cannot specify --record when using --replay")
+    # reuse GET responses (for example, an org looked up by several steps) for the rest of the run
+    memo.start()
+    ctx.call_on_close(memo.stop)
+    ctx.call_on_close(_clear_run_caches)
+    if record:
+        cassette.start(record, "record")
+        ctx.call_on_close(cassette.stop)
+    elif replay:
+        try:
+            cassette.start(replay, "replay")
+        except ValueError as e:
+            raise typer.BadParameter(str(e))
+        # replayed responses don't count against GitHub's rate limits
+        RateLimiter.enabled = False
+        ctx.call_on_close(_enable_rate_limiting)
+        ctx.call_on_close(cassette.stop)
+    executor.start_run(deadline)
+    # don't leave the deadline or a cancellation behind for later runs in the same process
+    ctx.call_on_close(executor.start_run)
+    if profile:
+        profiling.start(profile)
+        ctx.call_on_close(profiling.stop)
+
+
+def _enable_rate_limiting():
+    """Turn write rate limiting back on after a replay, for later runs in the same process."""
+    RateLimiter.enabled = True
+
+
 app.add_typer(list_app, no_args_is_help=True)
-app.add_typer(ruleset_app, no_args_is_help=True)
+app.add_typer(ruleset_app, name="ruleset", no_args_is_help=True)
+app.add_typer(poll_app, no_args_is_help=True)
+app.add_typer(merge_app, no_args_is_help=True)
+app.add_typer(audit_app, no_args_is_help=True)
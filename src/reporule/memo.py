@@ -0,0 +1,202 @@
+"""Coalesce identical GitHub API GET requests, and reuse their responses for the rest of the run."""
+
+import hashlib
+import threading
+from urllib.parse import urlsplit
+
+import requests
+import structlog
+from requests.adapters import BaseAdapter
+
+logger = structlog.get_logger()
+
+# The cache used by new sessions, if responses are being reused for the run
+CACHE: "ResponseCache | None" = None
+
+# Endpoints whose responses change from one request to the next, so are never reused
+UNCACHED_PATHS = ("/rate_limit",)
+
+# Response statuses that are reused. Other responses (errors, redirects, and
+# 304 responses to conditional requests) are only shared with identical
+# requests in flight at the same time.
+CACHED_STATUS_CODES = frozenset([200, 404])
+
+
+class _Call:
+    """A request in flight, and its outcome once it completes."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response: requests.Response | None = None
+        self.error: BaseException | None = None
+
+
+class ResponseCache:
+    """
+    Merge identical GET requests in flight, and optionally reuse their responses.
+
+    When several threads make the same GET request at the same time, only the
+    first is sent and the others wait for its response. If memoize is True,
+    successful responses are also kept and returned for later identical
+    requests. A write (POST, PUT, PATCH or DELETE) discards the kept responses
+    for the same repository, org, or user, so a run never reads its own stale
+    data (for example, when verifying that a ruleset was created).
+
+    Parameters:
+    ------------
+    memoize : bool
+        If True, keep responses for later identical requests. Otherwise, only
+        merge requests that are in flight at the same time.
+    """
+
+    def __init__(self, memoize: bool = True):
+        self.memoize = memoize
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._responses: dict[str, tuple[str, requests.Response]] = {}
+        self._in_flight: dict[str, _Call] = {}
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def stats(self) -> dict[str, int]:
+        """Return the number of requests answered from the cache, merged with a request in flight, and sent."""
+        with self._lock:
+            return {"hits": self.hits, "coalesced": self.coalesced, "misses": self.misses}
+
+    def fetch(self, request: requests.PreparedRequest, send) -> requests.Response:
+        """Return the response to a GET request, calling send() only if no identical request is cached or in flight."""
+        key, scope = _request_key(request), _scope(request.url)
+        with self._lock:
+            if key in self._responses:
+                self.hits += 1
+                return _copy_response(self._responses[key][1], shared=True)
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _Call()
+                generation = self._generations.get(scope, 0)
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return _copy_response(call.response, shared=True)  # type: ignore
+
+        try:
+            response = send()
+            # read the body now, so the response can be shared
+            response.content
+            call.response = response
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                # don't keep a response fetched while the same repo was being written to
+                if (
+                    self.memoize
+                    and call.response is not None
+                    and call.response.status_code in CACHED_STATUS_CODES
+                    and self._generations.get(scope, 0) == generation
+                ):
+                    self._responses[key] = (scope, call.response)
+            call.done.set()
+        return _copy_response(response)
+
+    def invalidate(self, url: str):
+        """Discard the responses kept for the repository, org, or user that a URL belongs to."""
+        scope = _scope(url)
+        with self._lock:
+            self._generations[scope] = self._generations.get(scope, 0) + 1
+            for key in [k for k, (s, _) in self._responses.items() if s == scope]:
+                del self._responses[key]
+
+
+class CoalescingAdapter(BaseAdapter):
+    """
+    A requests transport adapter that sends GET requests through a ResponseCache.
+
+    Parameters:
+    ------------
+    adapter : requests.adapters.BaseAdapter
+        The adapter that sends the requests
+    cache : ResponseCache
+        The cache that merges and keeps responses
+    """
+
+    def __init__(self, adapter: BaseAdapter, cache: ResponseCache):
+        super().__init__()
+        self.adapter = adapter
+        self.cache = cache
+
+    def send(self, request, *args, **kwargs):
+        if request.method == "GET" and _is_cacheable(request):
+            return self.cache.fetch(request, lambda: self.adapter.send(request, *args, **kwargs))
+        if request.method in ("GET", "HEAD", "OPTIONS"):
+            return self.adapter.send(request, *args, **kwargs)
+        # a write may succeed even if its response is lost, so invalidate on both sides of it
+        self.cache.invalidate(request.url)
+        try:
+            return self.adapter.send(request, *args, **kwargs)
+        finally:
+            self.cache.invalidate(request.url)
+
+    def close(self):
+        self.adapter.close()
+
+
+def _is_cacheable(request: requests.PreparedRequest) -> bool:
+    """Return True if a GET request's response can be shared or reused."""
+    if "If-None-Match" in request.headers or "If-Modified-Since" in request.headers:
+        # conditional requests are already cheap, and their caller keeps the data
+        return False
+    return urlsplit(request.url).path not in UNCACHED_PATHS
+
+
+def _request_key(request: requests.PreparedRequest) -> str:
+    """Return the key of a GET request. Requests made with different credentials have different keys."""
+    credential = hashlib.sha256(request.headers.get("Authorization", "").encode()).hexdigest()[:16]
+    return f"{request.url} {credential}"
+
+
+def _scope(url: str) -> str:
+    """Return the repository, org, or user a URL belongs to (for example, "/repos/reichlab/reporule")."""
+    return "/".join(urlsplit(url).path.split("/")[:4])
+
+
+def _copy_response(response: requests.Response, shared: bool = False) -> requests.Response:
+    """
+    Return a copy of a response whose body has been read, so each caller can change its own.
+
+    Copies given to callers other than the one whose request was sent are
+    marked as shared (with a _reporule_cached attribute), so response hooks
+    don't record their rate limit headers again.
+    """
+    clone = requests.Response()
+    clone.__setstate__(response.__getstate__())
+    clone.headers = response.headers.copy()
+    # __getstate__ leaves these out, but auth hooks re-send requests through the connection
+    clone.connection = getattr(response, "connection", None)
+    clone.raw = response.raw
+    clone._reporule_cached = shared  # type: ignore
+    return clone
+
+
+def start():
+    """Reuse GET responses in the sessions created from now on, until stop() is called."""
+    global CACHE
+    CACHE = ResponseCache()
+
+
+def stop():
+    """Stop reusing GET responses, logging how many requests were saved."""
+    global CACHE
+    if CACHE is None:
+        return
+    logger.info("API response cache", **CACHE.stats())
+    CACHE = None
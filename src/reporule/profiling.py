@@ -0,0 +1,156 @@
+"""Per-phase CPU and memory profiling of reporule commands."""
+
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from collections.abc import Callable
+from pathlib import Path
+
+import structlog
+
+logger = structlog.get_logger()
+
+# The directory profiles are written to, if profiling is on
+PROFILE_DIR: Path | None = None
+
+# The number of seconds between samples of every thread's stack
+SAMPLE_INTERVAL = 0.005
+
+# The number of allocation sites listed in each phase's memory report
+TOP_ALLOCATIONS = 25
+
+# reporule's own background threads, which are left out of the stack samples
+_IGNORED_THREADS = {"reporule-log-writer", "reporule-progress", "reporule-stack-sampler"}
+
+_active_phase: str | None = None
+_calls: Counter = Counter()
+_summary: dict[str, list[dict]] = {}
+_lock = threading.Lock()
+
+
+class _StackSampler(threading.Thread):
+    """Periodically sample the stack of every thread, counting identical stacks."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        super().__init__(name="reporule-stack-sampler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if names.get(ident) in _IGNORED_THREADS:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def start(profile_dir: Path):
+    """Turn on profiling, writing the profiles of each phase to a directory."""
+    global PROFILE_DIR
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    PROFILE_DIR = profile_dir
+    tracemalloc.start()
+    logger.info("Profiling started", profile_dir=str(profile_dir))
+
+
+def stop():
+    """Turn off profiling, writing a summary of every profiled phase."""
+    global PROFILE_DIR
+    if PROFILE_DIR is None:
+        return
+    tracemalloc.stop()
+    (PROFILE_DIR / "summary.json").write_text(json.dumps(_summary, indent=2))
+    logger.info("Profiles written", profile_dir=str(PROFILE_DIR), phases=list(_summary))
+    PROFILE_DIR = None
+    _calls.clear()
+    _summary.clear()
+
+
+def profiled(func: Callable) -> Callable:
+    """
+    Profile each call to a function as its own phase, when profiling is on.
+
+    Each call writes these files, named after the function (with a number
+    added for repeated calls), to the profile directory:
+
+    - <phase>.prof: a cProfile profile of the calling thread (for pstats or snakeviz)
+    - <phase>.folded: wall-clock stack samples of every thread, in collapsed
+      stack format (for speedscope or flamegraph.pl), including worker threads
+      waiting on the network
+    - <phase>.memory.txt: the tracemalloc peak and the top allocation sites
+
+    Calls made while another phase is being profiled are part of that phase.
+    """
+    phase = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        global _active_phase
+        with _lock:
+            if PROFILE_DIR is None or _active_phase is not None:
+                run_profiled = False
+            else:
+                run_profiled = True
+                _active_phase = phase
+                _calls[phase] += 1
+                name = phase if _calls[phase] == 1 else f"{phase}.{_calls[phase]}"
+        if not run_profiled:
+            return func(*args, **kwargs)
+        try:
+            return _profile_call(name, phase, func, args, kwargs)
+        finally:
+            _active_phase = None
+
+    return wrapper
+
+
+def _profile_call(name: str, phase: str, func: Callable, args, kwargs):
+    profile_dir = PROFILE_DIR
+    assert profile_dir is not None
+    sampler = _StackSampler()
+    profiler = cProfile.Profile()
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+
+    sampler.start()
+    profiler.enable()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profiler.disable()
+        sampler.stop()
+        wall, cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+        _, peak = tracemalloc.get_traced_memory()
+        allocations = tracemalloc.take_snapshot().compare_to(before, "lineno")[:TOP_ALLOCATIONS]
+
+        profiler.dump_stats(profile_dir / f"{name}.prof")
+        with open(profile_dir / f"{name}.folded", "w") as file:
+            for stack, count in sampler.stacks.most_common():
+                file.write(f"{stack} {count}\n")
+        with open(profile_dir / f"{name}.memory.txt", "w") as file:
+            file.write(f"peak: {peak} bytes\n\ntop {TOP_ALLOCATIONS} allocation sites (change during phase):\n")
+            for allocation in allocations:
+                file.write(f"{allocation}\n")
+
+        _summary.setdefault(phase, []).append(
+            {"file_prefix": name, "wall_seconds": round(wall, 4), "cpu_seconds": round(cpu, 4), "peak_bytes": peak}
+        )
+        logger.debug("Phase profiled", phase=name, wall_seconds=round(wall, 4), cpu_seconds=round(cpu, 4))
@@ -0,0 +1,210 @@
+"""Live progress reporting for long-running commands."""
+
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import structlog
+from rich.console import Console, Group
+from rich.live import Live
+from rich.progress_bar import ProgressBar
+from rich.table import Table
+from rich.text import Text
+
+logger = structlog.get_logger()
+
+# The number of seconds between progress lines when stderr isn't a terminal
+PROGRESS_LOG_INTERVAL = 10.0
+
+# The tracker updated by reporule's functions, if a command is tracking progress
+TRACKER: "ProgressTracker | None" = None
+
+
+class ProgressTracker:
+    """
+    Track the progress of each phase of a run (for example, listing, scanning and applying).
+
+    Besides the items completed in each phase, the tracker counts the requests
+    in flight, the retried requests, and the remaining GitHub rate limit.
+
+    Parameters:
+    ------------
+    live : bool
+        If True, display the progress in the terminal. Otherwise, log a
+        progress line every interval seconds.
+    interval : float
+        The number of seconds between progress lines when live is False
+    """
+
+    def __init__(self, live: bool, interval: float = PROGRESS_LOG_INTERVAL):
+        self.live = live
+        self.interval = interval
+        self.in_flight = 0
+        self.retries = 0
+        self.rate_limit_remaining: int | None = None
+        self._phases: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._display: Live | None = None
+        self._thread: threading.Thread | None = None
+
+    def start_phase(self, phase: str, total: int | None = None):
+        """Start (or restart) a phase, with an optional number of items to complete."""
+        with self._lock:
+            self._phases[phase] = {"total": total, "completed": 0, "started": time.monotonic(), "finished": None}
+
+    def advance(self, phase: str, count: int = 1):
+        """Record completed items of a phase."""
+        with self._lock:
+            if phase not in self._phases:
+                self._phases[phase] = {"total": None, "completed": 0, "started": time.monotonic(), "finished": None}
+            state = self._phases[phase]
+            state["completed"] += count
+            if state["total"] is not None and state["completed"] >= state["total"]:
+                state["finished"] = time.monotonic()
+
+    def finish_phase(self, phase: str):
+        """Mark a phase as complete."""
+        with self._lock:
+            if phase in self._phases and self._phases[phase]["finished"] is None:
+                self._phases[phase]["finished"] = time.monotonic()
+
+    def snapshot(self) -> dict:
+        """Return the progress of each phase, with its rate (items per second) and ETA (in seconds)."""
+        now = time.monotonic()
+        with self._lock:
+            phases = []
+            for phase, state in self._phases.items():
+                elapsed = (state["finished"] or now) - state["started"]
+                rate = state["completed"] / elapsed if elapsed > 0 else 0.0
+                eta = None
+                if state["total"] is not None and rate > 0 and state["finished"] is None:
+                    eta = max(state["total"] - state["completed"], 0) / rate
+                phases.append(
+                    {
+                        "phase": phase,
+                        "completed": state["completed"],
+                        "total": state["total"],
+                        "rate": round(rate, 2),
+                        "eta": round(eta, 1) if eta is not None else None,
+                        "done": state["finished"] is not None,
+                    }
+                )
+            return {
+                "phases": phases,
+                "in_flight": self.in_flight,
+                "retries": self.retries,
+                "rate_limit_remaining": self.rate_limit_remaining,
+            }
+
+    def render(self) -> Group:
+        """Return a rich renderable of the current progress."""
+        snapshot = self.snapshot()
+        table = Table.grid(padding=(0, 2))
+        for phase in snapshot["phases"]:
+            total = phase["total"]
+            bar = ProgressBar(total=total, completed=phase["completed"], width=30)
+            count = f"{phase['completed']}/{total}" if total is not None else str(phase["completed"])
+            eta = "done" if phase["done"] else (f"ETA {phase['eta']:.0f}s" if phase["eta"] is not None else "")
+            table.add_row(phase["phase"], bar, count, f"{phase['rate']:.1f}/s", eta)
+        headroom = snapshot["rate_limit_remaining"]
+        status = Text(
+            f"in flight: {snapshot['in_flight']}  retries: {snapshot['retries']}  "
+            f"rate limit remaining: {headroom if headroom is not None else '?'}",
+            style="dim",
+        )
+        return Group(table, status)
+
+    def start(self):
+        """Start displaying or logging the progress."""
+        if self.live:
+            self._display = Live(get_renderable=self.render, console=Console(stderr=True), transient=False)
+            self._display.start()
+        else:
+            self._thread = threading.Thread(target=self._log_progress, name="reporule-progress", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop displaying or logging the progress, showing the final progress first."""
+        self._stopped.set()
+        if self._display is not None:
+            self._display.stop()
+        if self._thread is not None:
+            self._thread.join()
+            logger.info("Progress", **self.snapshot())
+
+    def _log_progress(self):
+        while not self._stopped.wait(self.interval):
+            logger.info("Progress", **self.snapshot())
+
+
+@contextmanager
+def track(live: bool | None = None) -> Iterator[ProgressTracker]:
+    """
+    Track the progress of the reporule functions called in the block.
+
+    Progress is displayed in the terminal when stderr is a terminal, and logged
+    as periodic progress lines (JSON, as configured by setup_logging) otherwise.
+    """
+    global TRACKER
+    tracker = ProgressTracker(sys.stderr.isatty() if live is None else live)
+    TRACKER = tracker
+    tracker.start()
+    try:
+        yield tracker
+    finally:
+        tracker.stop()
+        TRACKER = None
+
+
+def start_phase(phase: str, total: int | None = None):
+    """Start a phase of the active tracker, if any."""
+    if TRACKER is not None:
+        TRACKER.start_phase(phase, total)
+
+
+def advance(phase: str, count: int = 1):
+    """Record completed items of a phase of the active tracker, if any."""
+    if TRACKER is not None:
+        TRACKER.advance(phase, count)
+
+
+def finish_phase(phase: str):
+    """Mark a phase of the active tracker, if any, as complete."""
+    if TRACKER is not None:
+        TRACKER.finish_phase(phase)
+
+
+@contextmanager
+def in_flight() -> Iterator[None]:
+    """Count the requests made in the block as in flight."""
+    tracker = TRACKER
+    if tracker is None:
+        yield
+        return
+    with tracker._lock:
+        tracker.in_flight += 1
+    try:
+        yield
+    finally:
+        with tracker._lock:
+            tracker.in_flight -= 1
+
+
+def record_retry():
+    """Count a retried request."""
+    if TRACKER is not None:
+        with TRACKER._lock:
+            TRACKER.retries += 1
+
+
+def record_response(response, *args, **kwargs):
+    """A requests response hook that records the remaining rate limit."""
+    remaining = response.headers.get("x-ratelimit-remaining")
+    if getattr(response, "_reporule_cached", False):
+        # responses shared from the cache carry the rate limit from when they were sent
+        return
+    if TRACKER is not None and remaining is not None and remaining.isdigit():
+        TRACKER.rate_limit_remaining = int(remaining)
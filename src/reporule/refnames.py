@@ -0,0 +1,114 @@
+"""Match branch names against the ref_name conditions of a ruleset, the way GitHub does."""
+
+import re
+from collections.abc import Iterable
+from typing import NamedTuple
+
+# Patterns may name a branch with or without this prefix
+BRANCH_REF_PREFIX = "refs/heads/"
+
+# Special patterns that match the repository's default branch, and every branch
+DEFAULT_BRANCH = "~DEFAULT_BRANCH"
+ALL_BRANCHES = "~ALL"
+
+
+class _PatternSet(NamedTuple):
+    """A list of ref_name patterns, compiled into a single regular expression."""
+
+    all: bool
+    default_branch: bool
+    regex: re.Pattern | None
+
+    def matches(self, branch: str, default_branch: str | None) -> bool:
+        if self.all or (self.default_branch and branch == default_branch):
+            return True
+        return self.regex is not None and self.regex.fullmatch(branch) is not None
+
+
+class RefNameMatcher:
+    """
+    The ref_name conditions of a branch ruleset, compiled for matching many branch names.
+
+    Patterns use GitHub's fnmatch syntax: * matches any characters except /,
+    ** matches any characters (and **/ matches zero or more directories), ?
+    matches one character except /, and [...] matches a set of characters.
+    ~DEFAULT_BRANCH matches the repository's default branch, and ~ALL matches
+    every branch. A branch is targeted if it matches an include pattern and no
+    exclude pattern.
+
+    Parameters:
+    ------------
+    ref_name : dict
+        The "ref_name" conditions of a ruleset, with "include" and "exclude"
+        lists of patterns
+
+    Raises:
+    -------
+    ValueError
+        If a pattern can't be compiled
+    """
+
+    def __init__(self, ref_name: dict):
+        self.include = _compile(ref_name.get("include", []))
+        self.exclude = _compile(ref_name.get("exclude", []))
+
+    def matches(self, branch: str, default_branch: str | None = None) -> bool:
+        """Return True if the conditions target a branch."""
+        return self.include.matches(branch, default_branch) and not self.exclude.matches(branch, default_branch)
+
+    def count(self, branches: Iterable[str], default_branch: str | None = None) -> int:
+        """Return the number of branches the conditions target."""
+        return sum(1 for branch in branches if self.matches(branch, default_branch))
+
+
+def _compile(patterns: list[str]) -> _PatternSet:
+    """Compile a list of ref_name patterns."""
+    regexes = [_translate(p) for p in patterns if p not in (DEFAULT_BRANCH, ALL_BRANCHES)]
+    try:
+        regex = re.compile("|".join(f"(?:{r})" for r in regexes)) if regexes else None
+    except re.error as e:
+        raise ValueError(f"Invalid ref_name pattern in {patterns}: {e}") from None
+    return _PatternSet(all=ALL_BRANCHES in patterns, default_branch=DEFAULT_BRANCH in patterns, regex=regex)
+
+
+def _translate(pattern: str) -> str:
+    """Translate an fnmatch-style ref_name pattern into a regular expression."""
+    if pattern.startswith(BRANCH_REF_PREFIX):
+        pattern = pattern[len(BRANCH_REF_PREFIX) :]
+
+    parts = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            # like Ruby's File.fnmatch with FNM_PATHNAME, "**/" matches zero or more directories
+            parts.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+            continue
+        if char == "*":
+            parts.append("[^/]*")
+        elif char == "?":
+            parts.append("[^/]")
+        elif char == "[":
+            # a "]" right after the opening bracket (or "[!") is part of the set
+            start = i + 2 if pattern.startswith("[!", i) else i + 1
+            end = pattern.find("]", start + 1)
+            if end == -1:
+                parts.append(re.escape(char))
+            else:
+                body = pattern[i + 1 : end].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                elif body.startswith("^"):
+                    body = "\\" + body
+                parts.append(f"[{body}]")
+                i = end + 1
+                continue
+        else:
+            parts.append(re.escape(char))
+        i += 1
+    return "".join(parts)
@@ -0,0 +1,104 @@
+"""Command for auditing which repos carry which rulesets."""
+
+from pathlib import Path
+
+import typer
+from rich import print
+from typing_extensions import Annotated
+
+import reporule
+from reporule.core import build_audit_snapshot, diff_audit_snapshots
+from reporule.util import (
+    _get_repo_exceptions,
+    _get_session,
+    _load_branch_ruleset,
+    _load_gzip_json,
+    _save_gzip_json,
+)
+
+app = typer.Typer()
+
+
+@app.command(no_args_is_help=True)
+def audit(
+    orgs: Annotated[list[str], typer.Argument(help="GitHub organization or user names.")],
+    ruleset: Annotated[
+        list[str] | None,
+        typer.Option(
+            "--ruleset",
+            help=(
+                "Ruleset filename that every repo should have (without the .json extension). "
+                "The file must be in the reporule/data directory. Can be repeated. "
+                "Defaults to default_branch_protections."
+            ),
+        ),
+    ] = None,
+    snapshot: Annotated[
+        Path,
+        typer.Option("--snapshot", help="File that stores the audit snapshot compared by the next audit."),
+    ] = Path(".reporule") / "audit_snapshot.json.gz",
+):
+    """
+    \b
+    Report which repos carry which rulesets, and what changed
+    since the previous audit.
+
+    \b
+    The first audit reports the repos that are missing each
+    ruleset. Later audits only download the rulesets of repos
+    that changed, and report new and archived repos and repos
+    that lost or gained a ruleset.
+
+    \b
+    EXAMPLES:
+    ----------
+    reporule audit reichlab hubverse-org
+    reporule audit reichlab --ruleset default_branch_protections --snapshot state/audit.json.gz
+    """
+    if not ruleset:
+        ruleset = ["default_branch_protections"]
+    try:
+        ruleset_names = [_load_branch_ruleset(r)["name"] for r in ruleset]
+    except Exception:
+        raise typer.BadParameter(f"Unable to load rulesets {', '.join(ruleset)}.")
+    try:
+        previous = _load_gzip_json(snapshot)
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+
+    print(f"Auditing rulesets for {', '.join(orgs)}...")
+    session = _get_session(reporule.TOKENS)
+    current = build_audit_snapshot(orgs, previous, session)
+
+    if not previous:
+        for org, repos in current["orgs"].items():
+            active_repos = {repo for repo, info in repos.items() if not info["archived"]}
+            active_repos -= _get_repo_exceptions(org)
+            print(f"\n{org}: {len(active_repos)} active repositories")
+            for name in ruleset_names:
+                missing = sorted(repo for repo in active_repos if name not in repos[repo]["rulesets"])
+                print(f"  {name}: {len(active_repos) - len(missing)} covered, {len(missing)} missing")
+                for repo in missing:
+                    print(f"    • {repo}")
+    else:
+        delta = diff_audit_snapshots(previous, current, ruleset_names)
+        print(f"\nChanges since the audit of {previous.get('created_at')}:")
+        sections = [
+            ("New repositories", delta["new_repos"]),
+            ("Newly archived repositories", delta["archived_repos"]),
+            ("Removed repositories", delta["removed_repos"]),
+        ]
+        for name in ruleset_names:
+            sections.append((f"Newly non-compliant ({name})", delta["non_compliant"][name]))
+            sections.append((f"Newly covered ({name})", delta["covered"][name]))
+        changed = False
+        for title, repos in sections:
+            if repos:
+                changed = True
+                print(f"\n{title}: {len(repos)}")
+                for repo in sorted(repos):
+                    print(f"  • {repo}")
+        if not changed:
+            print("No changes.")
+
+    _save_gzip_json(snapshot, current)
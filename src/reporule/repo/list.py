@@ -1,10 +1,13 @@
 """Command for listing a GitHub organization's repos."""
 
+import json
+from pathlib import Path
+
 import typer
 from typing_extensions import Annotated
 
-from reporule.core import list_repos
-from reporule.util import _get_repo
+from reporule.core import DETAIL_COLUMNS, get_repo_details, list_repos
+from reporule.util import _get_repo, _load_gzip_json, _parse_shard, _save_gzip_json, _shard_repos
 
 app = typer.Typer(
     add_completion=False,
@@ -15,6 +18,28 @@ app = typer.Typer(
 @app.command(no_args_is_help=True)
 def list(
     org: Annotated[str, typer.Argument()],
+    shard: Annotated[
+        str | None,
+        typer.Option(
+            "--shard",
+            help="Only list one shard of the repos, in the format i/N (for example, 2/4).",
+        ),
+    ] = None,
+    with_columns: Annotated[
+        str | None,
+        typer.Option(
+            "--with",
+            help=f"Comma-separated extra columns to show: {', '.join(DETAIL_COLUMNS)}.",
+        ),
+    ] = None,
+    cache: Annotated[
+        Path,
+        typer.Option("--cache", help="File that stores the extra columns, so unchanged repos aren't fetched again."),
+    ] = Path(".reporule") / "list_cache.json.gz",
+    output_json: Annotated[
+        Path | None,
+        typer.Option("--output-json", help="Optional file to write the listed repo names to (as JSON)."),
+    ] = None,
 ):
     """
     \b
@@ -27,10 +52,38 @@ def list(
     EXAMPLE:
     --------
     reporule list hubverse-org
+    reporule list hubverse-org --shard 1/4 --output-json shard-1.json
+    reporule list hubverse-org --with rulesets,default-branch,visibility
     """
+    if shard is not None:
+        try:
+            shard_index, shard_count = _parse_shard(shard)
+        except ValueError as e:
+            raise typer.BadParameter(str(e))
+    columns = [c.strip() for c in (with_columns or "").split(",") if c.strip()]
+    unknown = [c for c in columns if c not in DETAIL_COLUMNS]
+    if unknown:
+        raise typer.BadParameter(f"Unknown columns {', '.join(unknown)}. Choose from {', '.join(DETAIL_COLUMNS)}.")
+
     print(f"Getting public repos for {org}...")
     repos = _get_repo(org)
-    list_repos(org, repos)
+    if shard is not None:
+        repos = _shard_repos(repos, shard_index, shard_count)
+    details = None
+    if columns:
+        try:
+            saved_details = _load_gzip_json(cache)
+        except ValueError as e:
+            raise typer.BadParameter(str(e))
+        details = get_repo_details(repos, columns, saved_details)
+        _save_gzip_json(cache, saved_details)
+    list_repos(org, repos, details)
+
+    if output_json:
+        result = {"command": "list", "org": org, "shard": shard or "1/1", "repos": sorted(r["name"] for r in repos)}
+        if details is not None:
+            result["details"] = details
+        output_json.write_text(json.dumps(result, indent=2))
 
 
 if __name__ == "__main__":
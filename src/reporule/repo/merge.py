@@ -0,0 +1,58 @@
+"""Command for combining the results of sharded reporule runs."""
+
+import json
+from pathlib import Path
+
+import typer
+from rich import print
+from typing_extensions import Annotated
+
+from reporule.core import merge_shard_results
+
+app = typer.Typer()
+
+
+@app.command(no_args_is_help=True)
+def merge(
+    files: Annotated[list[Path], typer.Argument(help="JSON results written by each shard's --output-json option.")],
+    output: Annotated[
+        Path | None, typer.Option("--output", help="Optional file to write the combined summary to (as JSON).")
+    ] = None,
+):
+    """
+    \b
+    Combine the results of a list or ruleset command that was
+    run in shards (using the --shard option).
+
+    \b
+    EXAMPLE:
+    --------
+    reporule merge results/shard-*.json --output summary.json
+    """
+    results = []
+    for file_name in files:
+        try:
+            results.append(json.loads(file_name.read_text()))
+        except (OSError, json.JSONDecodeError):
+            raise typer.BadParameter(f"Unable to read shard results from {file_name}.")
+
+    try:
+        summary = merge_shard_results(results)
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+
+    print(f"Merged {len(summary['shards'])} shards of the {summary['command']} command for {summary['org']}.")
+    if summary["missing_shards"]:
+        print(f"Missing shards: {', '.join(summary['missing_shards'])}")
+    if summary["command"] == "list":
+        print(f"Total repositories: {summary['repos']}")
+    else:
+        for ruleset_name, totals in summary["rulesets"].items():
+            print(
+                f"  • {ruleset_name}: {totals['applied']} applied, {totals['eligible']} eligible, "
+                f"{totals['skipped']} skipped"
+            )
+        print(f"Total rulesets applied: {summary['total_applied']}")
+
+    if output:
+        output.write_text(json.dumps(summary, indent=2))
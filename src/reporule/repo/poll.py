@@ -0,0 +1,141 @@
+"""Command for applying a ruleset to repos added to an org since the last poll."""
+
+from pathlib import Path
+
+import structlog
+import typer
+from rich import print
+from typing_extensions import Annotated
+
+import reporule
+from reporule.core import SystematicWriteError, apply_branch_ruleset, get_repo_delta, get_ruleset_repo_status
+from reporule.util import (
+    _get_org_audit_log,
+    _get_org_events,
+    _get_repos_by_name,
+    _get_session,
+    _load_branch_ruleset,
+    _load_poll_cursor,
+    _save_poll_cursor,
+    _verify_org_or_user,
+)
+
+logger = structlog.get_logger()
+
+app = typer.Typer()
+
+
+@app.command(no_args_is_help=True)
+def poll(
+    org: Annotated[str, typer.Argument(help="GitHub organization name.")],
+    ruleset: Annotated[
+        str,
+        typer.Option(
+            "--ruleset",
+            help=(
+                "Ruleset filename to apply (without the .json extension). "
+                "The file must be in the reporule/data directory."
+            ),
+        ),
+    ] = "default_branch_protections",
+    cursor: Annotated[
+        Path | None,
+        typer.Option(
+            "--cursor",
+            help="File that stores the position of the last poll. Defaults to .reporule/<org>_poll_cursor.json",
+        ),
+    ] = None,
+    audit_log: Annotated[
+        bool,
+        typer.Option(
+            "--audit-log",
+            help=(
+                "Poll the organization audit log instead of the events feed. Requires GitHub Enterprise Cloud, "
+                "but also picks up unarchived and transferred repos."
+            ),
+        ),
+    ] = False,
+    dryrun: Annotated[bool, typer.Option("--dryrun", help="Display repos to update without applying changes.")] = False,
+):
+    """
+    \b
+    Apply a ruleset to repos that were added to a GitHub
+    organization since the last poll.
+
+    \b
+    The first poll only records the current position of the
+    organization's feed. Use the ruleset command with --all
+    to cover the organization's existing repos.
+
+    \b
+    EXAMPLES:
+    ----------
+    reporule poll reichlab --dryrun
+    reporule poll hubverse-org --audit-log --cursor state/hubverse.json
+    """
+    try:
+        ruleset_dict = _load_branch_ruleset(ruleset)
+        ruleset_name = ruleset_dict["name"]
+    except Exception as e:
+        raise typer.BadParameter(f"Unable to load ruleset name {ruleset}. {e}")
+
+    cursor_file = cursor or Path(".reporule") / f"{org}_poll_cursor.json"
+    saved_cursor = _load_poll_cursor(cursor_file)
+    source = "audit-log" if audit_log else "events"
+    if saved_cursor and saved_cursor.get("source") != source:
+        raise typer.BadParameter(f"Cursor {cursor_file} was created by polling the {saved_cursor.get('source')} feed.")
+
+    session = _get_session(reporule.TOKENS)
+    # the events feed and the audit log are only available for organizations
+    org_or_user = _verify_org_or_user(org, session)
+    if org_or_user is None:
+        raise typer.BadParameter(f"{org} is not a valid GitHub organization")
+    if org_or_user == "user":
+        raise typer.BadParameter(f"{org} is a GitHub user; only organizations can be polled")
+    if audit_log:
+        events = _get_org_audit_log(org, "action:repo", saved_cursor.get("timestamp"), session)
+        new_cursor = {
+            "source": source,
+            "timestamp": events[0]["@timestamp"] if events else saved_cursor.get("timestamp"),
+        }
+    else:
+        events, etag = _get_org_events(org, saved_cursor.get("event_id"), saved_cursor.get("etag"), session)
+        new_cursor = {
+            "source": source,
+            "etag": etag,
+            "event_id": events[0]["id"] if events else saved_cursor.get("event_id"),
+        }
+
+    prefix = "DRY RUN:" if dryrun else ""
+    if not saved_cursor:
+        print(f"{prefix} No poll cursor found for {org}. Later polls will pick up repositories added from now on.")
+        if not dryrun:
+            _save_poll_cursor(cursor_file, new_cursor)
+        return
+
+    repo_delta = get_repo_delta(org, events, source)
+    print(f"{prefix} Found {len(repo_delta)} repositories added since the last poll.")
+    repos = _get_repos_by_name(repo_delta, session) if repo_delta else []
+    repo_status = get_ruleset_repo_status(org, repos, ruleset_dict, session)
+    eligible_repos = repo_status["eligible_repos"]
+
+    num_repos = len(eligible_repos)
+    if dryrun:
+        print(f"\n{prefix} would apply ruleset {ruleset_name} to {num_repos} repositories:")
+        for repo in eligible_repos:
+            print(f"  • {repo}")
+        return
+
+    try:
+        total_rulesets_applied = apply_branch_ruleset(list(eligible_repos), ruleset_dict, session)  # type: ignore
+    except SystematicWriteError as e:
+        # keep the previous cursor, so the next poll tries these repos again
+        print(f"\nStopped applying {ruleset}: every attempt failed with the same error ({e.signature}).")
+        raise typer.Exit(code=1)
+    print(f"\nApplied {ruleset} to {total_rulesets_applied} repositories.")
+
+    if total_rulesets_applied < num_repos:
+        # keep the previous position and drop the ETag, so the next poll
+        # sees the same events again and retries the failed repos
+        new_cursor = saved_cursor | {"etag": None}
+    _save_poll_cursor(cursor_file, new_cursor)
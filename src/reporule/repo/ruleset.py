@@ -1,22 +1,88 @@
-"""Command for adding a ruleset to a repo or set of repos."""
+"""Commands for adding, updating, removing, and simulating a ruleset on a repo or set of repos."""
 
+import json
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+
+import requests
 import structlog
 import typer
 from rich import print
+from typer.core import TyperGroup
 from typing_extensions import Annotated
 
-from reporule.core import apply_branch_ruleset, get_ruleset_repo_status
+import reporule
+from reporule import executor, progress
+from reporule.auth import TokenPool
+from reporule.coordination import RESULTS_MAX_AGE, CoordinationBackend, FileCoordinationBackend
+from reporule.core import (
+    SystematicWriteError,
+    apply_branch_rulesets,
+    apply_branch_rulesets_pipelined,
+    estimate_ruleset_requests,
+    get_ruleset_ids,
+    get_rulesets_repo_status,
+    remove_branch_ruleset,
+    schedule_ruleset_writes,
+    simulate_branch_rulesets,
+    update_branch_ruleset,
+)
+from reporule.executor import FAIL_FAST_WRITES, WRITE_REQUESTS_PER_SECOND, RateLimiter
+from reporule.profiling import profiled
 from reporule.util import (
+    _get_rate_limit,
     _get_repo,
+    _get_repo_exceptions,
+    _get_repos_by_name,
+    _get_session,
+    _iter_repo_pages,
     _load_branch_ruleset,
+    _load_branch_ruleset_dir,
+    _load_gzip_json,
+    _load_repo_names,
+    _parse_shard,
+    _save_gzip_json,
+    _shard_repos,
     _verify_org_or_user,
 )
 
 logger = structlog.get_logger()
 
-app = typer.Typer()
+# The repo fields saved for runs that reuse another run's repo list
+INVENTORY_KEYS = ("name", "full_name", "archived", "created_at", "permissions")
+
+
+class DefaultCommandGroup(TyperGroup):
+    """
+    A command group that runs its "apply" command when no other command is named.
+
+    This keeps "reporule ruleset <org> ..." working alongside the
+    "reporule ruleset remove <org> ..." and "reporule ruleset update <org> ..."
+    subcommands.
+    """
+
+    default_command = "apply"
+
+    def parse_args(self, ctx: typer.Context, args: list[str]) -> list[str]:
+        if args and args[0] not in self.commands and args[0] not in ctx.help_option_names:
+            args = [self.default_command, *args]
+        return super().parse_args(ctx, args)
 
 
+app = typer.Typer(
+    cls=DefaultCommandGroup,
+    name="ruleset",
+    help=(
+        "Apply, update, remove, or simulate a ruleset on a single repo "
+        "or on all eligible repos of a GitHub organization or user."
+    ),
+)
+
+
+@profiled
 def validate_org(org: str) -> str:
     """
     Validate the GitHub organization or user name.
@@ -38,11 +104,12 @@ def validate_org(org: str) -> str:
 
 
 @app.command(
+    "apply",
     no_args_is_help=True,
     epilog="visit https://github.com/reichlab/reporule/tree/main/src/reporule/data to update the repo exception list",
 )
 def ruleset(
-    org: Annotated[str, typer.Argument(help="GitHub organization or user name.", callback=validate_org)],
+    org: Annotated[str, typer.Argument(help="GitHub organization or user name.")],
     all: Annotated[
         bool,
         typer.Option(
@@ -56,17 +123,73 @@ def ruleset(
             help="GitHub repository name. Cannot be used with --all.",
         ),
     ] = None,
+    repos_file: Annotated[
+        Path | None,
+        typer.Option(
+            "--repos-file",
+            help=(
+                "File listing the repositories to apply the ruleset to, one name per line. "
+                "Cannot be used with --all or --repo."
+            ),
+        ),
+    ] = None,
     ruleset: Annotated[
-        str,
+        list[str] | None,
         typer.Option(
             "--ruleset",
             help=(
                 "Ruleset filename to apply (without the .json extension). "
-                "The file must be in the reporule/data directory."
+                "The file must be in the reporule/data directory. "
+                "Can be repeated, or can be a directory of .json ruleset files. "
+                "Defaults to default_branch_protections."
             ),
         ),
-    ] = "default_branch_protections",
+    ] = None,
     dryrun: Annotated[bool, typer.Option("--dryrun", help="Display repos to update without applying changes.")] = False,
+    shard: Annotated[
+        str | None,
+        typer.Option(
+            "--shard",
+            help="Only process one shard of the repos, in the format i/N (for example, 2/4). Requires --all.",
+        ),
+    ] = None,
+    output_json: Annotated[
+        Path | None,
+        typer.Option("--output-json", help="Optional file to write the results to (as JSON)."),
+    ] = None,
+    max_requests: Annotated[
+        int | None,
+        typer.Option("--max-requests", help="Maximum number of GitHub API requests to use.", min=1),
+    ] = None,
+    time_budget: Annotated[
+        float | None,
+        typer.Option(
+            "--time-budget",
+            help="Maximum number of seconds to spend checking repos' rulesets and applying new ones.",
+            min=0,
+        ),
+    ] = None,
+    coordinate: Annotated[
+        str,
+        typer.Option(
+            "--coordinate",
+            help=(
+                "How to share work with other reporule runs on the same org: "
+                "'wait' for a running one to finish and reuse its results, "
+                "'skip' the repos it has claimed, or 'off'."
+            ),
+        ),
+    ] = "off",
+    pipeline: Annotated[
+        bool,
+        typer.Option(
+            "--pipeline",
+            help=(
+                "List repos, check their rulesets, and apply rulesets at the same time, "
+                "instead of one step after another. Requires --all."
+            ),
+        ),
+    ] = False,
 ):
     """
     \b
@@ -78,57 +201,663 @@ def ruleset(
 
     \b
     Rulesets will not be applied to archived repos, repos listed in
-    repos_exceptions.yml, or repos that already have a ruleset of the same name.
+    repos_exceptions.yml, repos that already have a ruleset of the same name,
+    or repos that the GitHub token doesn't have admin access to.
 
     \b
     EXAMPLES:
     ----------
     reporule ruleset reichlab --all --dryrun
     reporule ruleset reichlab --repo reichlab.io
+    reporule ruleset reichlab --repos-file repos.txt
     reporule ruleset hubverse-io --all --ruleset hubverse_branch_protections
+    reporule ruleset hubverse-io --all --ruleset default_branch_protections --ruleset release_branch_protections
+    reporule ruleset apply reichlab --all --ruleset ./rulesets
+    reporule ruleset reichlab --all --shard 1/4 --output-json shard-1.json
+    reporule ruleset reichlab --all --max-requests 1000 --time-budget 600
+    reporule ruleset reichlab --all --coordinate wait
+    reporule ruleset reichlab --all --pipeline
+
+    \b
+    The number of API requests needed is estimated before any rulesets are
+    applied. If the run doesn't fit in the remaining GitHub rate limit,
+    --max-requests, or --time-budget, repos with no rulesets are handled
+    first and the rest are reported as left for a later run.
 
     """
-    # Either we're applying rulesets to a single repo or to all repos
-    if repo is None and all is False:
-        raise typer.BadParameter("Either --all or --repo must be specified")
+    if not ruleset:
+        ruleset = ["default_branch_protections"]
+    # We're applying rulesets to a single repo, to a list of repos, or to all repos
+    if repo is None and repos_file is None and all is False:
+        raise typer.BadParameter("Either --all, --repo, or --repos-file must be specified")
     if repo is not None and all is True:
         raise typer.BadParameter("Cannot specify --repo when using --all")
+    if repos_file is not None and (all is True or repo is not None):
+        raise typer.BadParameter("Cannot specify --repos-file when using --all or --repo")
+    if repo is None:
+        # for a single repo, fetching the repo itself shows whether its owner exists
+        validate_org(org)
+    if repos_file is not None:
+        try:
+            repo_names = _load_repo_names(repos_file, org)
+        except ValueError as e:
+            raise typer.BadParameter(str(e))
+    if shard is not None:
+        if not all:
+            raise typer.BadParameter("--shard requires --all")
+        try:
+            shard_index, shard_count = _parse_shard(shard)
+        except ValueError as e:
+            raise typer.BadParameter(str(e))
 
-    try:
-        ruleset_dict = _load_branch_ruleset(ruleset)
-        ruleset_name = ruleset_dict["name"]
-    except Exception:
-        raise typer.BadParameter(f"Unable to load ruleset name {ruleset}.")
+    ruleset_dicts = []
+    for ruleset_file in ruleset:
+        try:
+            if Path(ruleset_file).is_dir():
+                ruleset_dicts.extend(_load_branch_ruleset_dir(Path(ruleset_file)))
+            else:
+                ruleset_dicts.append(_load_branch_ruleset(ruleset_file))
+            ruleset_names = [r["name"] for r in ruleset_dicts]
+        except Exception as e:
+            raise typer.BadParameter(f"Unable to load ruleset name {ruleset_file}. {e}")
+    if len(set(ruleset_names)) < len(ruleset_names):
+        raise typer.BadParameter("Each ruleset must have a unique name.")
+    if coordinate not in ("wait", "skip", "off"):
+        raise typer.BadParameter("--coordinate must be one of: wait, skip, off")
+    if pipeline and not all:
+        raise typer.BadParameter("--pipeline requires --all")
+    if pipeline and (max_requests is not None or coordinate != "off"):
+        # budgets and coordination decide which writes to make after every repo is scanned
+        raise typer.BadParameter("Cannot specify --max-requests or --coordinate when using --pipeline")
+
+    prefix = "DRY RUN:" if dryrun else ""
+    stopped_on_error = None
+    list_error = None
+    with ExitStack() as stack:
+        if all or repos_file is not None:
+            # show live progress (or log it, when stderr isn't a terminal) on multi-repo runs
+            stack.enter_context(progress.track())
+        backend, run_id, reusable, holds_lock = _start_coordination(org, coordinate, all, ruleset_names, prefix, stack)
+        deadline = time.monotonic() + time_budget if time_budget is not None else None
+        if executor.RUN_DEADLINE is not None:
+            deadline = min(deadline or executor.RUN_DEADLINE, executor.RUN_DEADLINE)
+
+        session = _get_session(reporule.TOKENS)
+        if pipeline:
+            # repos flow from the repo list to the ruleset checks to the writes
+            # as they're found, instead of each step waiting for the one before
+            print(f"{prefix} Applying rulesets as eligible repositories are found...")
+            repo_pages = _iter_repo_pages(org, session)
+            if shard is not None:
+                repo_pages = (_shard_repos(page, shard_index, shard_count) for page in repo_pages)
+            pipeline_result = apply_branch_rulesets_pipelined(
+                org, repo_pages, ruleset_dicts, session, deadline=deadline, dryrun=dryrun
+            )
+            ruleset_status = pipeline_result.status
+        else:
+            # the repo list and each repo's existing rulesets are fetched once and
+            # shared by all of the rulesets being applied
+            if reusable is not None:
+                repos = reusable["repos"]
+            elif all:
+                repos = _get_repo(org, session=session)
+            elif repos_file is not None:
+                # fetch only the listed repos, instead of listing the whole org
+                repos = _get_repos_by_name(repo_names, session)
+            else:
+                try:
+                    repos = _get_repo(org, repo, session=session)
+                except requests.HTTPError as e:
+                    if e.response is not None and e.response.status_code == 404:
+                        raise typer.BadParameter(f"Repository {org}/{repo} not found.")
+                    raise
+            org_repos = repos
+            if shard is not None:
+                repos = _shard_repos(repos, shard_index, shard_count)
+
+            request_budget = None
+            if repo is None or max_requests is not None:
+                # a single repo can't exhaust the rate limit, so don't spend a round trip checking it
+                request_budget = _get_request_budget(org, repos, len(ruleset_dicts), max_requests, prefix, session)
+            max_scans = None
+            if request_budget is not None:
+                # reserve enough requests to apply every ruleset to each scanned repo
+                max_scans = request_budget // (1 + len(ruleset_dicts))
+
+            print(f"{prefix} Getting list of eligible repositories...")
+            ruleset_status = get_rulesets_repo_status(
+                org,
+                repos,
+                ruleset_dicts,
+                session,
+                max_scans=max_scans,
+                known_rulesets=reusable["known_rulesets"] if reusable is not None else None,
+                deadline=deadline,
+            )
+
+        results: dict[str, dict] = {}
+        for ruleset_dict in ruleset_dicts:
+            ruleset_name = ruleset_dict["name"]
+            repo_status = ruleset_status[ruleset_name]
+            if repo is not None:
+                # User is applying ruleset to specific repo. Unless that single repo
+                # is on the exception list, we don't care about the exceptions.
+                repo_status["exceptions"] = repo_status["exceptions"].intersection({repo})
+            repos_to_skip = (
+                repo_status["archived"].union(repo_status["exceptions"]).union(repo_status["existing_ruleset"])
+            )
+            eligible_repos = repo_status["eligible_repos"]
+            results[ruleset_name] = {"eligible": sorted(eligible_repos), "skipped": sorted(repos_to_skip), "applied": 0}
+
+            if len(repos_to_skip) > 0:
+                print(
+                    f"\n{prefix} Skipping repositories because they are archived, on the exception list or already have a ruleset named {ruleset_name}:"
+                )
+                for skipped_repo in repos_to_skip:
+                    print(f"  • {skipped_repo}")
+                print(f"{prefix} Total repositories skipped: {len(repos_to_skip)}")
 
-    if all:
-        repos = _get_repo(org)
+        # repos the token can't create rulesets on aren't scanned or written to
+        no_admin = set().union(*(status.get("no_admin", set()) for status in ruleset_status.values()))
+        if no_admin:
+            print(f"\n{prefix} Skipping repositories because the token doesn't have admin access to them:")
+            for skipped_repo in sorted(no_admin):
+                print(f"  • {skipped_repo}")
+            print(f"{prefix} Total repositories without admin access: {len(no_admin)}")
+
+        if pipeline:
+            ruleset_repos, deferred = pipeline_result.ruleset_repos, pipeline_result.deferred
+        else:
+            write_limit = None
+            if request_budget is not None:
+                write_limit = request_budget - len(_get_scanned_repos(ruleset_status))
+            if deadline is not None and RateLimiter.enabled:
+                time_limit = int((deadline - time.monotonic()) * WRITE_REQUESTS_PER_SECOND)
+                write_limit = time_limit if write_limit is None else min(write_limit, time_limit)
+            ruleset_repos, deferred = schedule_ruleset_writes(ruleset_status, ruleset_dicts, write_limit)
+            if backend is not None and not dryrun:
+                try:
+                    ruleset_repos = _claim_ruleset_writes(backend, org, run_id, ruleset_repos, results)
+                except TimeoutError as e:
+                    print(f"{prefix} {e}")
+                    raise typer.Exit(code=1)
+
+        if dryrun:
+            for ruleset_dict, scheduled_repos in ruleset_repos:
+                print(f"\n{prefix} would apply ruleset {ruleset_dict['name']} to {len(scheduled_repos)} repositories:")
+                for scheduled_repo in scheduled_repos:
+                    print(f"  • {scheduled_repo}")
+        else:
+            if pipeline:
+                total_rulesets_applied = pipeline_result.applied
+                stopped_on_error = pipeline_result.stopped_on_error
+            else:
+                try:
+                    total_rulesets_applied = apply_branch_rulesets(ruleset_repos, session, deadline=deadline)
+                except SystematicWriteError as e:
+                    total_rulesets_applied = e.applied
+                    stopped_on_error = e.signature
+            if stopped_on_error:
+                print(
+                    f"\nStopped applying rulesets: the first {FAIL_FAST_WRITES} attempts all failed with the "
+                    f"same error ({stopped_on_error}). Check the ruleset and the features of the org's GitHub plan."
+                )
+            print()
+            for ruleset_name, num_applied in total_rulesets_applied.items():
+                print(f"Applied {ruleset_name} to {num_applied} repositories.")
+                results[ruleset_name]["applied"] = num_applied
+            if executor.cancelled():
+                scheduled = sum(len(repo_list) for _, repo_list in ruleset_repos)
+                print(f"Interrupted after applying {sum(total_rulesets_applied.values())} of {scheduled} rulesets.")
+
+        # report the work that didn't fit in the request or time budget
+        unscanned = set().union(*(status.get("unscanned", set()) for status in ruleset_status.values()))
+        if unscanned or any(deferred.values()):
+            print(f"\n{prefix} Stopped before finishing. Left for a later run:")
+            for ruleset_name, deferred_repos in deferred.items():
+                results[ruleset_name]["deferred"] = deferred_repos
+                if deferred_repos:
+                    print(f"  • {ruleset_name}: {len(deferred_repos)} repositories")
+            if unscanned:
+                print(f"  • {len(unscanned)} repositories not checked for existing rulesets")
+        failed = set().union(*(status.get("failed", set()) for status in ruleset_status.values()))
+        if failed:
+            print(f"\n{prefix} Unable to check the existing rulesets of these repositories:")
+            for failed_repo in sorted(failed):
+                print(f"  • {failed_repo}")
+        if pipeline and pipeline_result.list_error:
+            list_error = pipeline_result.list_error
+            print(f"\n{prefix} Stopped listing repositories after an error: {list_error}")
+
+        claimed_elsewhere = any(result.get("claimed_by_another_run") for result in results.values())
+        if backend is not None and all and not dryrun and holds_lock and not claimed_elsewhere:
+            # let runs that start soon after reuse the repo list and the rulesets of repos that weren't
+            # changed (unless another run was changing them at the same time)
+            changed = {changed_repo for _, repo_list in ruleset_repos for changed_repo in repo_list}
+            known_rulesets = {
+                scanned_repo: [
+                    name for name in ruleset_names if scanned_repo in ruleset_status[name]["existing_ruleset"]
+                ]
+                for scanned_repo in _get_scanned_repos(ruleset_status) - changed
+            }
+            backend.save_results(
+                org,
+                {
+                    "saved_at": time.time(),
+                    "rulesets": ruleset_names,
+                    "repos": [{key: r.get(key) for key in INVENTORY_KEYS} for r in org_repos],
+                    "known_rulesets": known_rulesets,
+                },
+            )
+
+        if output_json:
+            output = {"command": "ruleset", "org": org, "shard": shard or "1/1", "dryrun": dryrun, "rulesets": results}
+            if unscanned:
+                output["unscanned"] = sorted(unscanned)
+            if failed:
+                output["failed"] = sorted(failed)
+            if stopped_on_error:
+                output["stopped_on_error"] = stopped_on_error
+            if list_error:
+                output["list_error"] = list_error
+            if no_admin:
+                output["no_admin"] = sorted(no_admin)
+            output_json.write_text(json.dumps(output, indent=2))
+
+    if executor.cancelled():
+        raise typer.Exit(code=130)
+    if stopped_on_error or list_error:
+        raise typer.Exit(code=1)
+
+
+def _start_coordination(
+    org: str, mode: str, all: bool, ruleset_names: list[str], prefix: str, stack: ExitStack
+) -> tuple[CoordinationBackend | None, str, dict | None, bool]:
+    """
+    Coordinate with other runs on the same org, as set by the --coordinate option.
+
+    Returns the coordination backend (or None if coordination is off), this
+    run's id, the results of a recent run that can be reused (or None), and
+    whether this run holds the org's lock.
+    """
+    run_id = uuid.uuid4().hex
+    if mode == "off":
+        return None, run_id, None, False
+
+    backend = FileCoordinationBackend()
+    stack.callback(backend.release, org, run_id)
+    if mode == "skip":
+        holds_lock = backend.acquire(org, run_id, wait=False)
+        if not holds_lock:
+            print(f"{prefix} Another reporule run is working on {org}; repos it has claimed will be skipped.")
+        return backend, run_id, None, holds_lock
+
+    if not backend.acquire(org, run_id, wait=True):
+        print(f"Timed out waiting for another reporule run on {org} to finish.")
+        raise typer.Exit(code=1)
+    results = backend.load_results(org)
+    if (
+        all
+        and results is not None
+        and time.time() - results["saved_at"] <= RESULTS_MAX_AGE
+        and set(ruleset_names) <= set(results["rulesets"])
+    ):
+        age = int(time.time() - results["saved_at"])
+        print(f"{prefix} Reusing the repository list and rulesets found by a run that finished {age} seconds ago.")
+        return backend, run_id, results, True
+    return backend, run_id, None, True
+
+
+def _claim_ruleset_writes(
+    backend: CoordinationBackend, org: str, run_id: str, ruleset_repos: list[tuple[dict, list[str]]], results: dict
+) -> list[tuple[dict, list[str]]]:
+    """Claim the ruleset writes of this run, leaving out the writes claimed by another active run."""
+    items = [f"{repo}#{ruleset['name']}" for ruleset, repo_list in ruleset_repos for repo in repo_list]
+    claimed = backend.claim(org, run_id, items)
+
+    claimed_ruleset_repos = []
+    for ruleset, repo_list in ruleset_repos:
+        ruleset_name = ruleset["name"]
+        claimed_elsewhere = [repo for repo in repo_list if f"{repo}#{ruleset_name}" not in claimed]
+        if claimed_elsewhere:
+            print(f"\nSkipping {len(claimed_elsewhere)} repositories claimed by another run for {ruleset_name}:")
+            for skipped_repo in claimed_elsewhere:
+                print(f"  • {skipped_repo}")
+            results[ruleset_name]["claimed_by_another_run"] = claimed_elsewhere
+        claimed_ruleset_repos.append((ruleset, [repo for repo in repo_list if repo not in claimed_elsewhere]))
+    return claimed_ruleset_repos
+
+
+def _get_request_budget(
+    org: str, repos: list[dict], ruleset_count: int, max_requests: int | None, prefix: str, session
+) -> int | None:
+    """
+    Estimate the API requests needed to apply rulesets, and return the number of requests left to spend on them.
+
+    The budget is the smaller of the live rate limit (measured for, and summed
+    over, every credential of a token pool) and --max-requests (less the
+    requests already used to list the repos), or None if neither applies.
+    """
+    estimate = estimate_ruleset_requests(org, repos, ruleset_count)
+    print(
+        f"{prefix} Estimated API requests: {estimate['list']} to list repositories, "
+        f"{estimate['scan']} to check existing rulesets, and up to {estimate['apply']} to apply rulesets"
+    )
+
+    request_budget = max_requests - estimate["list"] if max_requests is not None else None
+    if isinstance(session.auth, TokenPool):
+        # requests are spread across every credential in the pool, and their
+        # limits differ (an App installation's can be higher than a token's),
+        # so measure each one
+        rate_limits = [_get_rate_limit(session, credential=i) for i in range(len(session.auth.credentials))]
     else:
-        repos = _get_repo(org, repo)
+        rate_limits = [_get_rate_limit(session)]
+    measured = [rate_limit for rate_limit in rate_limits if rate_limit is not None]
+    if measured:
+        remaining = sum(rate_limit["remaining"] for rate_limit in measured)
+        limit = sum(rate_limit["limit"] for rate_limit in measured)
+        reset = datetime.fromtimestamp(min(rate_limit["reset"] for rate_limit in measured)).strftime("%H:%M")
+        print(f"{prefix} GitHub rate limit: {remaining} of {limit} remaining (resets {reset})")
+        if len(measured) > 1:
+            print(f"{prefix} {remaining} requests remaining across {len(measured)} credentials")
+        request_budget = min(remaining, request_budget if request_budget is not None else float("inf"))
 
-    prefix = "DRY RUN:" if dryrun else ""
-    print(f"{prefix} Getting list of eligible repositories...")
-    repo_status = get_ruleset_repo_status(org, repos, ruleset_dict)
+    if request_budget is None or estimate["scan"] + estimate["apply"] <= request_budget:
+        return None
+    print(
+        f"{prefix} The estimate exceeds the {int(request_budget)} requests available; repos with no rulesets go first"
+    )
+    return int(request_budget)
+
+
+def _get_scanned_repos(ruleset_status: dict) -> set[str]:
+    """Return the repos whose existing rulesets were fetched by get_rulesets_repo_status."""
+    scanned: set[str] = set()
+    for repo_status in ruleset_status.values():
+        scanned.update(repo_status["eligible_repos"], repo_status["existing_ruleset"])
+    return scanned
+
+
+def _get_ruleset_target_ids(org: str, all: bool, repo: str | None, ruleset_name: str, prefix: str, session) -> dict:
+    """
+    Find the ids of an existing ruleset on the repos targeted by the remove and update commands.
+
+    Archived repos and repos on the exception list are skipped, using the same
+    rules as the apply command.
+    """
+    if repo is None and all is False:
+        raise typer.BadParameter("Either --all or --repo must be specified")
+    if repo is not None and all is True:
+        raise typer.BadParameter("Cannot specify --repo when using --all")
+
+    repos = _get_repo(org, repo, session=session)
+    archived_repos = {r["full_name"] for r in repos if r.get("archived")}
+    exceptions = _get_repo_exceptions(org)
     if repo is not None:
-        # User is applying ruleset to specific repo. Unless that single repo
+        # User is targeting a specific repo. Unless that single repo
         # is on the exception list, we don't care about the exceptions.
-        repo_status["exceptions"] = repo_status["exceptions"].intersection({repo})
-    repos_to_skip = repo_status["archived"].union(repo_status["exceptions"]).union(repo_status["existing_ruleset"])
-    eligible_repos = repo_status["eligible_repos"]
+        exceptions = exceptions.intersection({f"{org}/{repo}"})
+    target_repos = {r["full_name"] for r in repos} - archived_repos - exceptions
 
+    print(f"{prefix} Finding repositories with a ruleset named {ruleset_name}...")
+    ruleset_ids = get_ruleset_ids(sorted(target_repos), ruleset_name, session)
+
+    repos_to_skip = archived_repos.union(exceptions).union(target_repos - set(ruleset_ids))
     if len(repos_to_skip) > 0:
         print(
-            f"\n{prefix} Skipping repositories because they are archived, on the exception list or already have a ruleset named {ruleset_name}:"
+            f"\n{prefix} Skipping repositories because they are archived, on the exception list or don't have a ruleset named {ruleset_name}:"
         )
-        for repo in repos_to_skip:
-            print(f"  • {repo}")
+        for skipped_repo in sorted(repos_to_skip):
+            print(f"  • {skipped_repo}")
         print(f"{prefix} Total repositories skipped: {len(repos_to_skip)}")
 
-    total_rulesets_applied = 0
-    num_repos = len(eligible_repos)
+    return ruleset_ids
+
+
+@app.command(
+    "remove",
+    no_args_is_help=True,
+    epilog="visit https://github.com/reichlab/reporule/tree/main/src/reporule/data to update the repo exception list",
+)
+def remove(
+    org: Annotated[str, typer.Argument(help="GitHub organization or user name.", callback=validate_org)],
+    name: Annotated[str, typer.Option("--name", help="Name of the ruleset to remove.")],
+    all: Annotated[
+        bool,
+        typer.Option(
+            "--all",
+            help="Remove ruleset from all org/user repos not on the exception list. Cannot be used with --repo.",
+        ),
+    ] = False,
+    repo: Annotated[
+        str | None,
+        typer.Option(
+            "--repo",
+            help="GitHub repository name. Cannot be used with --all.",
+        ),
+    ] = None,
+    dryrun: Annotated[bool, typer.Option("--dryrun", help="Display repos to update without applying changes.")] = False,
+):
+    """
+    \b
+    Remove a named ruleset from a single repo or from all eligible
+    repos that belong to a GitHub organization or user.
+
+    \b
+    Rulesets will not be removed from archived repos or repos
+    listed in repos_exceptions.yml.
+
+    \b
+    EXAMPLES:
+    ----------
+    reporule ruleset remove reichlab --all --name default-branch-protections --dryrun
+    reporule ruleset remove reichlab --repo reichlab.io --name default-branch-protections
+    """
+    session = _get_session(reporule.TOKENS)
+    prefix = "DRY RUN:" if dryrun else ""
+    ruleset_ids = _get_ruleset_target_ids(org, all, repo, name, prefix, session)
+
+    if dryrun:
+        print(f"\n{prefix} would remove ruleset {name} from {len(ruleset_ids)} repositories:")
+        for target_repo in sorted(ruleset_ids):
+            print(f"  • {target_repo}")
+    else:
+        total_rulesets_removed = remove_branch_ruleset(ruleset_ids, session)
+        print(f"\nRemoved {name} from {total_rulesets_removed} repositories.")
+
+
+@app.command(
+    "update",
+    no_args_is_help=True,
+    epilog="visit https://github.com/reichlab/reporule/tree/main/src/reporule/data to update the repo exception list",
+)
+def update(
+    org: Annotated[str, typer.Argument(help="GitHub organization or user name.", callback=validate_org)],
+    all: Annotated[
+        bool,
+        typer.Option(
+            "--all", help="Update ruleset on all org/user repos not on the exception list. Cannot be used with --repo."
+        ),
+    ] = False,
+    repo: Annotated[
+        str | None,
+        typer.Option(
+            "--repo",
+            help="GitHub repository name. Cannot be used with --all.",
+        ),
+    ] = None,
+    ruleset: Annotated[
+        str,
+        typer.Option(
+            "--ruleset",
+            help=(
+                "Ruleset filename to apply (without the .json extension). "
+                "The file must be in the reporule/data directory."
+            ),
+        ),
+    ] = "default_branch_protections",
+    name: Annotated[
+        str | None,
+        typer.Option(
+            "--name",
+            help="Name of the existing ruleset to replace. Use this to rename a ruleset. Defaults to the ruleset's name.",
+        ),
+    ] = None,
+    dryrun: Annotated[bool, typer.Option("--dryrun", help="Display repos to update without applying changes.")] = False,
+):
+    """
+    \b
+    Replace an existing ruleset with the contents of a ruleset file on
+    a single repo or on all eligible repos that belong to a GitHub
+    organization or user.
+
+    \b
+    Rulesets will not be updated on archived repos or repos
+    listed in repos_exceptions.yml.
+
+    \b
+    EXAMPLES:
+    ----------
+    reporule ruleset update reichlab --all --dryrun
+    reporule ruleset update hubverse-org --all --ruleset hubverse_branch_protections --name old-branch-protections
+    """
+    try:
+        ruleset_dict = _load_branch_ruleset(ruleset)
+        ruleset_name = ruleset_dict["name"]
+    except Exception as e:
+        raise typer.BadParameter(f"Unable to load ruleset name {ruleset}. {e}")
+
+    session = _get_session(reporule.TOKENS)
+    prefix = "DRY RUN:" if dryrun else ""
+    target_name = name or ruleset_name
+    ruleset_ids = _get_ruleset_target_ids(org, all, repo, target_name, prefix, session)
+
     if dryrun:
-        print(f"\n{prefix} would apply ruleset {ruleset_name} to {num_repos} repositories:")
-        for repo in eligible_repos:
-            print(f"  • {repo}")
+        print(f"\n{prefix} would update ruleset {target_name} on {len(ruleset_ids)} repositories:")
+        for target_repo in sorted(ruleset_ids):
+            print(f"  • {target_repo}")
     else:
-        total_rulesets_applied = apply_branch_ruleset(list(eligible_repos), ruleset_dict)  # type: ignore
-        print(f"\nApplied {ruleset} to {total_rulesets_applied} repositories.")
+        total_rulesets_updated = update_branch_ruleset(ruleset_ids, ruleset_dict, session)
+        print(f"\nUpdated {target_name} on {total_rulesets_updated} repositories.")
+
+
+@app.command(
+    "simulate",
+    no_args_is_help=True,
+    epilog="visit https://github.com/reichlab/reporule/tree/main/src/reporule/data to update the repo exception list",
+)
+def simulate(
+    org: Annotated[str, typer.Argument(help="GitHub organization or user name.", callback=validate_org)],
+    all: Annotated[
+        bool,
+        typer.Option(
+            "--all",
+            help="Simulate ruleset on all org/user repos not on the exception list. Cannot be used with --repo.",
+        ),
+    ] = False,
+    repo: Annotated[
+        str | None,
+        typer.Option(
+            "--repo",
+            help="GitHub repository name. Cannot be used with --all.",
+        ),
+    ] = None,
+    ruleset: Annotated[
+        list[str] | None,
+        typer.Option(
+            "--ruleset",
+            help=(
+                "Ruleset filename to simulate (without the .json extension). "
+                "The file must be in the reporule/data directory. "
+                "Can be repeated, or can be a directory of .json ruleset files. "
+                "Defaults to default_branch_protections."
+            ),
+        ),
+    ] = None,
+    cache: Annotated[
+        Path,
+        typer.Option("--cache", help="File that stores each repo's branch names for later simulations."),
+    ] = Path(".reporule") / "branch_cache.json.gz",
+    refresh: Annotated[
+        bool, typer.Option("--refresh", help="Fetch every repo's branch names, even if they're cached.")
+    ] = False,
+    output_json: Annotated[
+        Path | None,
+        typer.Option("--output-json", help="Optional file to write the results to (as JSON)."),
+    ] = None,
+):
+    """
+    \b
+    Report which branches a ruleset's ref_name conditions would
+    target on a single repo or on all eligible repos that belong
+    to a GitHub organization or user, without applying it.
+
+    \b
+    Branch names are saved and reused for a day (unless --refresh
+    is used), so simulating an edited ruleset only requests the
+    org and its repo list, not every repo's branches.
+    Archived repos and repos listed in repos_exceptions.yml are skipped.
+
+    \b
+    EXAMPLES:
+    ----------
+    reporule ruleset simulate reichlab --all
+    reporule ruleset simulate reichlab --repo reichlab.io --ruleset release_branch_protections
+    reporule ruleset simulate hubverse-org --all --ruleset ./rulesets --refresh
+    """
+    if not ruleset:
+        ruleset = ["default_branch_protections"]
+    if repo is None and all is False:
+        raise typer.BadParameter("Either --all or --repo must be specified")
+    if repo is not None and all is True:
+        raise typer.BadParameter("Cannot specify --repo when using --all")
+
+    ruleset_dicts = []
+    for ruleset_file in ruleset:
+        try:
+            if Path(ruleset_file).is_dir():
+                ruleset_dicts.extend(_load_branch_ruleset_dir(Path(ruleset_file)))
+            else:
+                ruleset_dicts.append(_load_branch_ruleset(ruleset_file))
+        except Exception as e:
+            raise typer.BadParameter(f"Unable to load ruleset name {ruleset_file}. {e}")
+    not_branch = [r["name"] for r in ruleset_dicts if r.get("target", "branch") != "branch"]
+    if not_branch:
+        raise typer.BadParameter(f"Only branch rulesets can be simulated: {', '.join(not_branch)}")
+    try:
+        saved_branches = _load_gzip_json(cache)
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+
+    with ExitStack() as stack:
+        if all:
+            stack.enter_context(progress.track())
+        session = _get_session(reporule.TOKENS)
+        repos = _get_repo(org, repo, session=session)
+        if all:
+            exceptions = _get_repo_exceptions(org)
+            repos = [r for r in repos if not r.get("archived") and r["full_name"] not in exceptions]
+        print(f"Simulating rulesets on {len(repos)} repositories...")
+        try:
+            results = simulate_branch_rulesets(repos, ruleset_dicts, saved_branches, session, refresh=refresh)
+        except ValueError as e:
+            raise typer.BadParameter(str(e))
+        _save_gzip_json(cache, saved_branches)
+
+    ruleset_names = [r["name"] for r in ruleset_dicts]
+    for repo_name in sorted(results):
+        matched = ", ".join(f"{name}: {count}" for name, count in results[repo_name]["matched"].items())
+        print(f"  • {repo_name} ({results[repo_name]['branches']} branches) {matched}")
+    print("\nBranches targeted by each ruleset:")
+    for name in ruleset_names:
+        counts = [r["matched"][name] for r in results.values()]
+        print(f"  {name}: {sum(counts)} branches in {sum(1 for c in counts if c)} of {len(results)} repositories")
+    unchecked = sorted({r["full_name"] for r in repos} - set(results))
+    if unchecked:
+        print(f"\nUnable to get the branches of {len(unchecked)} repositories:")
+        for repo_name in unchecked:
+            print(f"  • {repo_name}")
+
+    if output_json:
+        output = {"command": "ruleset simulate", "org": org, "rulesets": ruleset_names, "repos": results}
+        output_json.write_text(json.dumps(output, indent=2))
@@ -0,0 +1,318 @@
+"""Retry and circuit breaker policies for GitHub API requests."""
+
+import random
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+
+import requests
+import structlog
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.exceptions import MaxRetryError  # type: ignore
+from requests.packages.urllib3.util.retry import Retry  # type: ignore
+
+from reporule import executor, progress
+
+logger = structlog.get_logger()
+
+# Longest that reporule will wait before retrying a request, even if GitHub
+# asks for a longer wait
+MAX_RETRY_WAIT = 120
+
+# Status codes that indicate a transient server-side failure
+RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+
+# Seconds to wait for a connection to GitHub, and for each read of a response
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 60
+
+
+class DeadlineExceededError(requests.Timeout):
+    """Raised instead of sending or retrying a request after the run deadline."""
+
+
+def _clip_to_deadline(wait: float) -> float:
+    """Shorten a wait so it ends by the run deadline."""
+    remaining = executor.remaining_time()
+    return wait if remaining is None else max(0.0, min(wait, remaining))
+
+
+def _decorrelated_jitter(previous: float, base: float, cap: float) -> float:
+    """
+    Return the next backoff wait, using "decorrelated jitter".
+
+    Each wait is drawn at random between the base wait and three times the
+    previous wait, so clients that fail at the same time don't retry in lockstep.
+    https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+    """
+    return min(cap, random.uniform(base, max(base, previous * 3)))
+
+
+def _get_rate_limit_wait(headers) -> float | None:
+    """
+    Return the number of seconds to wait before retrying a rate-limited request.
+
+    Uses the Retry-After header if present. Otherwise, if the rate limit is
+    exhausted, waits until the time in the x-ratelimit-reset header.
+    """
+    retry_after = headers.get("Retry-After")
+    if retry_after is not None:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            return None
+    if headers.get("x-ratelimit-remaining") == "0" and headers.get("x-ratelimit-reset"):
+        return max(0.0, int(headers["x-ratelimit-reset"]) - time.time())
+    return None
+
+
+class GitHubRetry(Retry):
+    """
+    A urllib3 retry policy for the GitHub API.
+
+    Compared to urllib3's default policy, it:
+
+    - waits between retries using decorrelated jitter rather than a fixed
+      exponential backoff
+    - honors Retry-After on 403 responses, which GitHub uses for secondary rate limits
+    - waits for the x-ratelimit-reset time when the primary rate limit is exhausted
+    - never waits longer than MAX_RETRY_WAIT seconds
+    """
+
+    RETRY_AFTER_STATUS_CODES = frozenset([403, 413, 429, 503])
+
+    def __init__(self, *args, last_backoff: float = 0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.last_backoff = last_backoff
+
+    def new(self, **kw) -> "GitHubRetry":
+        kw.setdefault("last_backoff", self.last_backoff)
+        return super().new(**kw)  # type: ignore
+
+    def get_backoff_time(self) -> float:
+        if len(self.history) <= 1:
+            return 0
+        self.last_backoff = _decorrelated_jitter(self.last_backoff, self.backoff_factor, self.backoff_max)
+        return _clip_to_deadline(self.last_backoff)
+
+    def increment(self, method=None, url=None, *args, **kwargs) -> "GitHubRetry":
+        # urllib3 passes the method and url positionally
+        remaining = executor.remaining_time()
+        if remaining is not None and remaining <= 0:
+            raise MaxRetryError(kwargs.get("_pool"), url, DeadlineExceededError("Run deadline exceeded"))
+        progress.record_retry()
+        return super().increment(method, url, *args, **kwargs)  # type: ignore
+
+    def get_retry_after(self, response) -> float | None:
+        wait = _get_rate_limit_wait(response.headers)
+        if wait is None:
+            return None
+        if wait > MAX_RETRY_WAIT:
+            logger.warning("Requested retry wait is too long; waiting less", requested=wait, wait=MAX_RETRY_WAIT)
+        return _clip_to_deadline(min(wait, MAX_RETRY_WAIT))
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised instead of sending a request while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Stop sending requests when too many recent requests have failed.
+
+    The breaker tracks the outcome of the most recent requests. When the share
+    of failures reaches the threshold, the breaker opens and requests fail
+    immediately with CircuitOpenError. After the cooldown, a single trial
+    request is allowed through: if it succeeds, the breaker closes again.
+
+    Parameters:
+    ------------
+    window : int
+        The number of recent requests to track
+    failure_threshold : float
+        The share of failed requests (between 0 and 1) that opens the breaker
+    min_requests : int
+        The minimum number of tracked requests before the breaker can open
+    cooldown : float
+        Seconds to wait before allowing a trial request through an open breaker
+    """
+
+    def __init__(
+        self, window: int = 50, failure_threshold: float = 0.5, min_requests: int = 10, cooldown: float = 30.0
+    ):
+        self.failure_threshold = failure_threshold
+        self.min_requests = min_requests
+        self.cooldown = cooldown
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._opened_at: float | None = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def before_request(self):
+        """Raise CircuitOpenError if a request should not be sent."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.cooldown or self._trial_in_flight:
+                raise CircuitOpenError("Too many GitHub API requests are failing; not sending request.")
+            self._trial_in_flight = True
+
+    def end_trial(self):
+        """Allow another trial request, when the trial request in flight ended without an outcome."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record(self, success: bool):
+        """Record the outcome of a request."""
+        with self._lock:
+            if self._trial_in_flight:
+                self._trial_in_flight = False
+                if success:
+                    logger.info("Circuit breaker closed")
+                    self._opened_at = None
+                    self._outcomes.clear()
+                else:
+                    self._opened_at = time.monotonic()
+                return
+
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if (
+                self._opened_at is None
+                and len(self._outcomes) >= self.min_requests
+                and failures / len(self._outcomes) >= self.failure_threshold
+            ):
+                logger.warning("Circuit breaker opened", failures=failures, requests=len(self._outcomes))
+                self._opened_at = time.monotonic()
+
+
+class GitHubAdapter(HTTPAdapter):
+    """
+    A requests transport adapter that routes every request through a circuit breaker.
+
+    Requests that don't set a timeout get the adapter's connect and read
+    timeouts, shortened so they end by the run deadline. No request is sent
+    after the run deadline.
+
+    Parameters:
+    ------------
+    circuit_breaker : CircuitBreaker
+        The circuit breaker shared by all requests sent through the adapter
+    timeout : tuple[float, float]
+        The default (connect, read) timeouts, in seconds
+    """
+
+    def __init__(
+        self,
+        *args,
+        circuit_breaker: CircuitBreaker | None = None,
+        timeout: tuple[float, float] = (CONNECT_TIMEOUT, READ_TIMEOUT),
+        **kwargs,
+    ):
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, *args, **kwargs):
+        remaining = executor.remaining_time()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceededError("Run deadline exceeded", request=request)
+        if kwargs.get("timeout") is None:
+            connect, read = self.timeout
+            kwargs["timeout"] = (_clip_to_deadline(connect), _clip_to_deadline(read))
+        self.circuit_breaker.before_request()
+        recorded = False
+        try:
+            response = super().send(request, *args, **kwargs)
+            self.circuit_breaker.record(response.status_code < 500)
+            recorded = True
+            return response
+        except requests.RequestException:
+            # includes RetryError, raised when urllib3 runs out of retries on 5xx responses
+            self.circuit_breaker.record(False)
+            recorded = True
+            raise
+        finally:
+            if not recorded:
+                # a trial request must not stay in flight, or the breaker never closes
+                self.circuit_breaker.end_trial()
+
+
+def post_with_verification(
+    session: requests.Session,
+    url: str,
+    payload: dict,
+    exists: Callable[[], bool],
+    max_attempts: int = 4,
+    backoff_factor: float = 1.0,
+) -> requests.Response:
+    """
+    POST a payload, retrying failures without risking a duplicate create.
+
+    A POST that fails with a server error or a dropped connection may still
+    have been processed by GitHub. Before retrying one, this function calls
+    ``exists`` (typically a cheap GET) and stops retrying if the resource has
+    already been created. Rate-limited POSTs were not processed, so they are
+    retried after the requested wait.
+
+    Parameters:
+    ------------
+    session : requests.Session
+        The requests session used to send the POST
+    url : str
+        The URL to POST to
+    payload : dict
+        The JSON payload of the POST
+    exists : Callable
+        A function that returns True if the resource created by the POST exists
+    max_attempts : int
+        The maximum number of times to send the POST
+    backoff_factor : float
+        The base wait (in seconds) between attempts
+
+    Returns:
+    ---------
+    requests.Response
+        The response to the last POST. If an earlier attempt turned out to
+        have succeeded, a response with a 200 status is returned instead.
+    """
+    backoff = 0.0
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            response = session.post(url, json=payload)
+        except (CircuitOpenError, DeadlineExceededError):
+            raise
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt >= max_attempts:
+                raise
+            ambiguous = True
+        else:
+            if response.ok or attempt >= max_attempts:
+                return response
+            rate_limit_wait = _get_rate_limit_wait(response.headers)
+            if response.status_code in (403, 429) and rate_limit_wait is not None:
+                # rate-limited requests aren't processed, so they can be retried as-is
+                progress.record_retry()
+                time.sleep(_clip_to_deadline(min(rate_limit_wait, MAX_RETRY_WAIT)))
+                continue
+            if response.status_code not in RETRY_STATUS_CODES:
+                return response
+            ambiguous = response.status_code != 429
+
+        backoff = _decorrelated_jitter(backoff, backoff_factor, MAX_RETRY_WAIT)
+        logger.info("Retrying POST", url=url, attempt=attempt, wait=round(backoff, 2))
+        progress.record_retry()
+        time.sleep(_clip_to_deadline(backoff))
+        if ambiguous and exists():
+            logger.info("POST succeeded despite an error response", url=url)
+            verified = requests.Response()
+            verified.status_code = 200
+            verified.url = url
+            return verified
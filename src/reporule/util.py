@@ -1,19 +1,165 @@
 """Utility functions for reporules."""
 
+import gzip
+import hashlib
 import json
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
 from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
 
 import requests
 import structlog
 import yaml
-from requests.adapters import HTTPAdapter
-from requests.packages.urllib3.util.retry import Retry  # type: ignore
+from requests.adapters import BaseAdapter
 
 import reporule
-from reporule import REPORULE_PATH
+from reporule import REPORULE_PATH, cassette, memo, progress
+from reporule.auth import StaticToken, TokenPool, _get_app_credentials
+from reporule.executor import MAX_WORKERS, run_concurrently
+from reporule.logging import LazyField
+from reporule.profiling import profiled
+from reporule.retry import (
+    RETRY_STATUS_CODES,
+    GitHubAdapter,
+    GitHubRetry,
+    post_with_verification,
+)
 
 logger = structlog.get_logger()
 
+# The largest number of repositories GitHub returns per page of a repo list
+REPOS_PER_PAGE = 100
+
+# The largest number of branches GitHub returns per page of a branch list
+BRANCHES_PER_PAGE = 100
+
+# The largest number of rulesets GitHub returns per page of a repository's rulesets
+RULESETS_PER_PAGE = 100
+
+
+# The values GitHub's API accepts in a ruleset, for checking rulesets before they're used
+# https://docs.github.com/en/rest/repos/rules#create-a-repository-ruleset
+RULESET_TARGETS = frozenset(["branch", "tag", "push"])
+RULESET_ENFORCEMENTS = frozenset(["disabled", "active", "evaluate"])
+RULE_TYPES = frozenset(
+    [
+        "branch_name_pattern",
+        "code_scanning",
+        "commit_author_email_pattern",
+        "commit_message_pattern",
+        "committer_email_pattern",
+        "copilot_code_review",
+        "creation",
+        "deletion",
+        "file_extension_restriction",
+        "file_path_restriction",
+        "max_file_path_length",
+        "max_file_size",
+        "merge_queue",
+        "non_fast_forward",
+        "pull_request",
+        "required_deployments",
+        "required_linear_history",
+        "required_signatures",
+        "required_status_checks",
+        "tag_name_pattern",
+        "update",
+        "workflows",
+    ]
+)
+BYPASS_ACTOR_TYPES = frozenset(["Integration", "OrganizationAdmin", "RepositoryRole", "Team", "DeployKey"])
+
+# The repo exceptions files loaded during a run, by path. Code embedding
+# reporule (see reporule.Client) can keep its own cache (see _run_cache_scope)
+_RUN_CACHE: dict[Path, dict] = {}
+_run_cache: ContextVar[dict[Path, dict]] = ContextVar("run_cache", default=_RUN_CACHE)
+
+
+def _clear_run_caches():
+    """Forget the repo exceptions files loaded during a run, so the next run sees any changes."""
+    _run_cache.get().clear()
+
+
+@contextmanager
+def _run_cache_scope(cache: dict[Path, dict]) -> Iterator[dict[Path, dict]]:
+    """Cache the repo exceptions files loaded in this context separately from the run's."""
+    token = _run_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _run_cache.reset(token)
+
+
+def _create_branch_ruleset(repo_name: str, ruleset: dict, session: requests.Session | None = None) -> requests.Response:
+    """
+    Create a ruleset on a GitHub repository.
+
+    Failed requests are retried, but only after confirming that the ruleset
+    wasn't created by the failed request.
+
+    Parameters:
+    ------------
+    repo_name : str
+        Name of the GitHub repository in the format "org/repo"
+    ruleset : dict
+        The GitHub ruleset to create
+    session: requests.Session
+        An optional requests session for using the GitHub API. If not
+        passed, a new session will be created.
+
+    Returns:
+    ----------
+    requests.Response
+        The response to the request that created the ruleset
+    """
+    if session is None:
+        session = _get_session(reporule.TOKENS)
+
+    return post_with_verification(
+        session,
+        f"https://api.github.com/repos/{repo_name}/rulesets",
+        ruleset,
+        exists=lambda: ruleset.get("name") in _get_branch_rulesets(repo_name, session),
+    )
+
+
+def _get_branch_page(repo_name: str, page: int = 1, session: requests.Session | None = None) -> tuple[list[str], int]:
+    """
+    Return one page of a GitHub repository's branch names.
+
+    Parameters:
+        repo_name : str
+            Name of the GitHub repository in the format "org/repo"
+        page : int
+            The page number to request, starting at 1
+        session: requests.Session
+            An optional requests session for using the GitHub API. If not
+            passed, a new session will be created.
+
+    Returns:
+        tuple
+            The branch names on the page, and the number of the last page
+            (so the remaining pages can be requested at the same time)
+
+    Raises:
+        requests.HTTPError
+            If the request to the GitHub API fails
+    """
+    if session is None:
+        session = _get_session(reporule.TOKENS)
+
+    branch_url = f"https://api.github.com/repos/{repo_name}/branches"
+    response = session.get(branch_url, params={"per_page": BRANCHES_PER_PAGE, "page": page})
+    response.raise_for_status()
+    last_page = page
+    last_url = response.links.get("last", {}).get("url")
+    if last_url:
+        last_page = int(parse_qs(urlsplit(last_url).query).get("page", [page])[0])
+    return [b["name"] for b in response.json()], last_page
+
 
 def _get_branch_rulesets(repo_name: str, session: requests.Session | None = None) -> list:
     """
@@ -25,24 +171,227 @@ def _get_branch_rulesets(repo_name: str, session: requests.Session | None = None
 
     Returns:
         list
-            A list of ruleset names applied to the repository
+            A list of ruleset names applied to the repository, including
+            those it inherits from its organization
+
+    Raises:
+        requests.HTTPError
+            If the request to the GitHub API fails
+    """
+    rulesets = [r.get("name") for r in _get_repo_rulesets(repo_name, session)]
+    logger.debug("Existing rulesets", repo=repo_name, rulesets=rulesets)
+    return rulesets
+
+
+def _get_json_if_changed(
+    url: str, etag: str | None = None, session: requests.Session | None = None, params: dict | None = None
+) -> tuple[list | dict | None, str | None]:
+    """
+    Return the JSON response of a GitHub API endpoint, if it changed since a previous request.
+
+    Responses of 304 Not Modified don't count against GitHub's rate limit.
+    Only the first page is requested conditionally; if it changed, the rest of
+    a paginated list is fetched and returned with it.
+
+    Parameters:
+        url : str
+            The GitHub API URL to request
+        etag : str
+            Optional ETag returned by a previous request for the same URL and
+            parameters
+        session: requests.Session
+            An optional requests session for using the GitHub API. If not
+            passed, a new session will be created.
+        params : dict
+            Optional query parameters
+
+    Returns:
+        tuple
+            The decoded response (or None if it hasn't changed since the
+            request that returned the ETag), and the current ETag
 
     Raises:
         requests.HTTPError
             If the request to the GitHub API fails
     """
     if session is None:
-        session = _get_session(reporule.TOKEN)
+        session = _get_session(reporule.TOKENS)
 
-    ruleset_url = f"https://api.github.com/repos/{repo_name}/rulesets"
-    response = session.get(ruleset_url)
+    headers = {"If-None-Match": etag} if etag else {}
+    response = session.get(url, headers=headers, params=params)
+    if response.status_code == 304:
+        return None, etag
     response.raise_for_status()
+    new_etag = response.headers.get("ETag")
+    payload = response.json()
+    # the "next" links carry the parameters forward
+    while isinstance(payload, list) and (next_url := response.links.get("next", {}).get("url")):
+        response = session.get(next_url)
+        response.raise_for_status()
+        payload.extend(response.json())
+    return payload, new_etag
 
-    rulesets = [r.get("name") for r in response.json()]
-    logger.debug("Existing rulesets", repo=repo_name, rulesets=rulesets)
-    return rulesets
 
+def _get_org_audit_log(
+    org_name: str,
+    phrase: str,
+    since: int | None = None,
+    session: requests.Session | None = None,
+) -> list[dict]:
+    """
+    Retrieve entries from a GitHub organization's audit log.
+
+    The audit log API is only available to organizations on GitHub Enterprise Cloud.
+
+    Parameters:
+    ------------
+    org_name : str
+        Name of a GitHub organization
+    phrase : str
+        Audit log search phrase (for example, "action:repo")
+    since : int
+        Optional timestamp (milliseconds since the epoch) of the newest entry
+        seen by the previous poll. Only newer entries are returned. If not
+        specified, only the newest entry is returned.
+    session: requests.Session
+        An optional requests session for using the GitHub API. If not
+        passed, a new session will be created.
+
+    Returns:
+    ----------
+    list
+        A list of audit log entries (newest first)
+
+    Raises:
+    -------
+    requests.HTTPError
+        If the request to the GitHub API fails
+    """
+    if session is None:
+        session = _get_session(reporule.TOKENS)
+
+    if since is not None:
+        created = datetime.fromtimestamp(since / 1000, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        phrase = f"{phrase} created:>={created}"
+
+    audit_log_url = f"https://api.github.com/orgs/{org_name}/audit-log"
+    # without a cursor, the newest entry is all a first poll needs
+    params: dict | None = {"phrase": phrase, "order": "desc", "per_page": 100 if since is not None else 1}
+    entries = []
+    while audit_log_url:
+        response = session.get(audit_log_url, params=params)
+        response.raise_for_status()
+        # the created:>= qualifier has a granularity of one second, so drop
+        # entries that the previous poll has already seen
+        entries.extend(e for e in response.json() if since is None or e.get("@timestamp", 0) > since)
+        audit_log_url = response.links.get("next", {}).get("url") if since is not None else None
+        params = None
+    return entries
+
+
+def _get_org_events(
+    org_name: str,
+    since_id: str | None = None,
+    etag: str | None = None,
+    session: requests.Session | None = None,
+) -> tuple[list[dict], str | None]:
+    """
+    Retrieve events from a GitHub organization's event feed that are newer than a cursor.
+
+    The first page is requested conditionally, so an unchanged feed costs a
+    single request that GitHub does not count against the rate limit.
+
+    Parameters:
+    ------------
+    org_name : str
+        Name of a GitHub organization
+    since_id : str
+        Optional ID of the newest event seen by the previous poll. Paging stops
+        once this event is reached. If not specified, only the first page of
+        events is returned.
+    etag : str
+        Optional ETag of the first events page returned by the previous poll
+    session: requests.Session
+        An optional requests session for using the GitHub API. If not
+        passed, a new session will be created.
 
+    Returns:
+    ----------
+    tuple
+        A list of event dictionaries (newest first) and the ETag of the
+        first events page
+
+    Raises:
+    -------
+    requests.HTTPError
+        If the request to the GitHub API fails
+    """
+    if session is None:
+        session = _get_session(reporule.TOKENS)
+
+    events_url = f"https://api.github.com/orgs/{org_name}/events"
+    headers = {"If-None-Match": etag} if etag else {}
+    response = session.get(events_url, headers=headers, params={"per_page": 100})
+    if response.status_code == 304:
+        logger.debug("Organization events unchanged", org_name=org_name, etag=etag)
+        return [], etag
+    response.raise_for_status()
+    new_etag = response.headers.get("ETag")
+
+    events = []
+    while True:
+        for event in response.json():
+            if event.get("id") == since_id:
+                return events, new_etag
+            events.append(event)
+        events_url = response.links.get("next", {}).get("url")
+        if not events_url or since_id is None:
+            break
+        response = session.get(events_url)
+        response.raise_for_status()
+
+    return events, new_etag
+
+
+def _get_rate_limit(session: requests.Session | None = None, credential: int | None = None) -> dict | None:
+    """
+    Return the live core rate limit of the credential used by a session.
+
+    Requests to the rate_limit endpoint don't count against the rate limit.
+
+    Parameters:
+    ------------
+    session: requests.Session
+        An optional requests session for using the GitHub API. If not
+        passed, a new session will be created.
+    credential: int
+        If the session uses a token pool, the index of the credential to
+        measure. The pool's budget for that credential is updated with the
+        result.
+
+    Returns:
+    ----------
+    dict | None
+        A dictionary with the "limit", "remaining", "used", and "reset" (a Unix
+        timestamp) of the core rate limit, or None if rate limiting is disabled
+        (as it can be on GitHub Enterprise Server).
+    """
+    if session is None:
+        session = _get_session(reporule.TOKENS)
+    pool = session.auth if credential is not None and isinstance(session.auth, TokenPool) else None
+    auth = pool.credential_auth(credential) if pool is not None else None  # type: ignore
+    response = session.get("https://api.github.com/rate_limit", auth=auth)
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    rate_limit = response.json()["resources"]["core"]
+    if pool is not None:
+        pool.record_rate_limit(credential, rate_limit["remaining"], rate_limit["reset"])  # type: ignore
+    logger.debug("Rate limit retrieved", credential=credential, rate_limit=rate_limit)
+    return rate_limit
+
+
+@profiled
 def _get_repo(org_name: str, repo_name: str | None = None, session: requests.Session | None = None) -> list[dict]:
     """
     Retrieve information about public GitHub repositories.
@@ -69,30 +418,18 @@ def _get_repo(org_name: str, repo_name: str | None = None, session: requests.Ses
         If org_name is not a valid GitHub organization or user
     """
     if session is None:
-        session = _get_session(reporule.TOKEN)
-    github_type = _verify_org_or_user(org_name, session)
-    if github_type == "org":
-        repos_url = f"https://api.github.com/orgs/{org_name}/repos"
-    elif github_type == "user":
-        repos_url = f"https://api.github.com/users/{org_name}/repos"
-    else:
-        raise ValueError(f"Organization or user '{org_name}' not found.") from None
-
-    # if we want a specific repo, use the repos route
-    if repo_name:
-        repos_url = f"https://api.github.com/repos/{org_name}/{repo_name}"
+        session = _get_session(reporule.TOKENS)
+    if not repo_name:
+        return [repo for page in _iter_repo_pages(org_name, session) for repo in page]
 
-    repos = []
-    while repos_url:
-        response = session.get(repos_url)
-        response.raise_for_status()
-        if isinstance(response.json(), dict):
-            # we only requested a single repo
-            repos.append(response.json())
-            break
-        repos.extend(response.json())
-        repos_url = response.links.get("next", {}).get("url")
-    return repos
+    # if we want a specific repo, use the repos route, which works the same
+    # for orgs and users
+    progress.start_phase("listing")
+    response = session.get(f"https://api.github.com/repos/{org_name}/{repo_name}")
+    response.raise_for_status()
+    progress.advance("listing")
+    progress.finish_phase("listing")
+    return [response.json()]
 
 
 def _get_repo_exceptions(org_name: str, file_name: Path | None = None) -> set[str]:
@@ -126,9 +463,7 @@ def _get_repo_exceptions(org_name: str, file_name: Path | None = None) -> set[st
     try:
         if file_name is None:
             file_name = REPORULE_PATH / "data" / "repos_exception.yml"
-        with open(file_name, "r") as file:
-            repo_exceptions = yaml.safe_load(file)
-        logger.debug("Repo exceptions loaded", repo_exceptions=repo_exceptions)
+        repo_exceptions = _load_repo_exceptions_file(Path(file_name))
         repos = set()
         for org in repo_exceptions.get("organizations", []):
             if org.get("name") == org_name:
@@ -144,30 +479,269 @@ def _get_repo_exceptions(org_name: str, file_name: Path | None = None) -> set[st
         raise ValueError(f"Unable to retrieve repo exceptions list from {file_name}.") from None
 
 
-def _get_session(token: str) -> requests.Session:
-    """Return a requests session with retry logic."""
+def _get_repo_rulesets(
+    repo_name: str, session: requests.Session | None = None, includes_parents: bool = True
+) -> list[dict]:
+    """
+    Return the existing rulesets for a specified GitHub repository.
+
+    Parameters:
+        repo_name : str
+            Name of the GitHub repository in the format "org/repo"
+        session: requests.Session
+            An optional requests session for using the GitHub API. If not
+            passed, a new session will be created.
+        includes_parents : bool
+            Whether to include rulesets the repository inherits from its
+            organization. Pass False to return only the repository's own
+            rulesets (the only ones that can be changed through the repository).
+
+    Returns:
+        list
+            A list of dictionaries that represent the repository's rulesets
+            (including their ids and names) as returned by GitHub's API
+
+    Raises:
+        requests.HTTPError
+            If the request to the GitHub API fails
+    """
+    if session is None:
+        session = _get_session(reporule.TOKENS)
+
+    ruleset_url = f"https://api.github.com/repos/{repo_name}/rulesets"
+    # the "next" links carry these parameters forward
+    params: dict | None = _get_repo_rulesets_params(includes_parents)
+    rulesets = []
+    while ruleset_url:
+        response = session.get(ruleset_url, params=params)
+        params = None
+        response.raise_for_status()
+        rulesets.extend(_filter_repo_rulesets(response.json(), includes_parents))
+        ruleset_url = response.links.get("next", {}).get("url")
+    return rulesets
+
+
+def _get_repo_rulesets_params(includes_parents: bool = True) -> dict:
+    """Return the query parameters of a request for a repository's rulesets (see _get_repo_rulesets)."""
+    if includes_parents:
+        return {"per_page": RULESETS_PER_PAGE}
+    return {"includes_parents": "false", "per_page": RULESETS_PER_PAGE}
+
+
+def _filter_repo_rulesets(rulesets: list[dict], includes_parents: bool = True) -> list[dict]:
+    """Leave out the inherited rulesets in a list of a repository's rulesets, unless includes_parents is True."""
+    if includes_parents:
+        return rulesets
+    return [r for r in rulesets if r.get("source_type", "Repository") == "Repository"]
+
+
+def _get_repo_rulesets_if_changed(
+    repo_name: str, etag: str | None = None, session: requests.Session | None = None, includes_parents: bool = True
+) -> tuple[list[dict] | None, str | None]:
+    """
+    Return the rulesets of a GitHub repository, if they changed since a previous request.
+
+    The rulesets are the same ones _get_repo_rulesets returns, so ruleset
+    apply, audit and list agree on whether a repository has a ruleset.
+
+    Parameters:
+        repo_name : str
+            Name of the GitHub repository in the format "org/repo"
+        etag : str
+            Optional ETag returned by a previous request for the repository's
+            rulesets (to the URL returned by _get_repo_rulesets_url)
+        session: requests.Session
+            An optional requests session for using the GitHub API. If not
+            passed, a new session will be created.
+        includes_parents : bool
+            Whether to include rulesets the repository inherits from its
+            organization
+
+    Returns:
+        tuple
+            The repository's rulesets (or None if they haven't changed since
+            the request that returned the ETag), and the current ETag
+
+    Raises:
+        requests.HTTPError
+            If the request to the GitHub API fails
+    """
+    rulesets, etag = _get_json_if_changed(
+        f"https://api.github.com/repos/{repo_name}/rulesets",
+        etag,
+        session,
+        params=_get_repo_rulesets_params(includes_parents),
+    )
+    if rulesets is not None:
+        rulesets = _filter_repo_rulesets(rulesets, includes_parents)  # type: ignore
+    return rulesets, etag  # type: ignore
+
+
+def _get_repo_rulesets_url(repo_name: str, includes_parents: bool = True) -> str:
+    """Return the URL, with its query parameters, requested for a repository's rulesets (for keying ETags)."""
+    request = requests.Request(
+        "GET",
+        f"https://api.github.com/repos/{repo_name}/rulesets",
+        params=_get_repo_rulesets_params(includes_parents),
+    )
+    return request.prepare().url  # type: ignore
+
+
+def _get_repos_by_name(repo_names: set[str], session: requests.Session | None = None) -> list[dict]:
+    """
+    Retrieve information about specific GitHub repositories.
+
+    Parameters:
+    ------------
+    repo_names : set
+        Full names of the repositories to retrieve, in the format "org/repo"
+    session: requests.Session
+        An optional requests session for using the GitHub API. If not
+        passed, a new session will be created.
+
+    Returns:
+    ----------
+    list
+        A list of dictionaries that represent the repositories, sorted by
+        name. Repositories that no longer exist (for example, because they
+        were renamed or transferred) are omitted.
+
+    Raises:
+    -------
+    requests.HTTPError
+        If the request to the GitHub API fails
+    """
+    if session is None:
+        session = _get_session(reporule.TOKENS)
+
+    def _fetch(repo_name):
+        response = session.get(f"https://api.github.com/repos/{repo_name}")
+        if response.status_code == 404:
+            logger.warning("Repository not found", repo=repo_name)
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    # the repos are independent, so fetch them concurrently
+    progress.start_phase("listing", len(repo_names))
+    results = run_concurrently(_fetch, sorted(repo_names), phase="listing")
+    progress.finish_phase("listing")
 
+    repos = []
+    for repo_name in sorted(repo_names):
+        repo = results.get(repo_name)
+        if isinstance(repo, Exception):
+            raise repo
+        if repo is not None:
+            repos.append(repo)
+    return repos
+
+
+def _get_session(token: str | list[str]) -> requests.Session:
+    """
+    Return a requests session with retry logic.
+
+    If GitHub App credentials are configured (see reporule.auth), they are
+    used alongside any tokens. If there is more than one credential, the
+    session routes each request to the credential with the most remaining
+    rate limit budget. Without any credentials, requests are unauthenticated.
+    """
+    tokens = [token] if isinstance(token, str) else token
+    credentials = [StaticToken(t) for t in tokens if t]
+    if cassette.CASSETTE is None or cassette.CASSETTE.mode != "replay":
+        # replayed requests don't need valid credentials, and exchanging an
+        # App's JWT for an installation token would need the network
+        credentials += _get_app_credentials()
     headers = {
-        "Authorization": f"Bearer {token}",
         "Accept": "application/vnd.github.v3+json",
         "X-GitHub-Api-Version": "2022-11-28",
     }
     session = requests.Session()
 
-    # attach a urllib3 retry adapter to the requests session
+    status_forcelist = RETRY_STATUS_CODES
+    if len(credentials) > 1 or (credentials and not isinstance(credentials[0], StaticToken)):
+        session.auth = TokenPool(credentials)
+        if len(credentials) > 1:
+            # let the token pool move rate-limited requests to another credential,
+            # rather than waiting for the rate limit to reset
+            status_forcelist = RETRY_STATUS_CODES - {429}
+    elif credentials:
+        headers["Authorization"] = f"Bearer {credentials[0].get_token()}"
+
+    # attach a retry adapter to the requests session. POSTs are not retried
+    # here because a failed POST may still have created a resource; see
+    # reporule.retry.post_with_verification
     # https://urllib3.readthedocs.io/en/latest/reference/urllib3.util.html#urllib3.util.retry.Retry
-    retries = Retry(
+    retries = GitHubRetry(
         total=5,
-        allowed_methods=frozenset(["GET", "POST", "PATCH"]),
+        allowed_methods=frozenset(["GET", "PUT", "DELETE"]),
         backoff_factor=1,
-        status_forcelist=[429, 500, 502, 503, 504],
+        status_forcelist=status_forcelist,
     )
-    session.mount("https://", HTTPAdapter(max_retries=retries))
+    # size the connection pool so concurrent requests can reuse connections
+    adapter: BaseAdapter = GitHubAdapter(max_retries=retries, pool_maxsize=MAX_WORKERS)
+    if cassette.CASSETTE is not None and cassette.CASSETTE.mode == "record":
+        adapter = cassette.RecordingAdapter(adapter, cassette.CASSETTE)
+    elif cassette.CASSETTE is not None:
+        adapter = cassette.ReplayAdapter(cassette.CASSETTE)
+    # merge identical GETs in flight, and reuse responses for the rest of the
+    # run when the CLI has turned that on (see reporule.memo)
+    session.mount("https://", memo.CoalescingAdapter(adapter, memo.CACHE or memo.ResponseCache(memoize=False)))
     session.headers.update(headers)
+    session.hooks["response"].append(progress.record_response)
 
     return session
 
 
+def _iter_repo_pages(org_name: str, session: requests.Session | None = None) -> Iterator[list[dict]]:
+    """
+    Retrieve the public GitHub repositories of an org or user, one page at a time.
+
+    Each page is yielded as soon as it arrives, so callers can start working
+    on the first repos while the rest are being listed.
+
+    Parameters:
+    ------------
+    org_name : str
+        Name of a GitHub organization or user
+    session: requests.Session
+        An optional requests session for using the GitHub API. If not
+        passed, a new session will be created.
+
+    Returns:
+    ----------
+    Iterator[list]
+        Pages of dictionaries that represent the org/user repositories
+
+    Raises:
+    -------
+    ValueError
+        If org_name is not a valid GitHub organization or user
+    """
+    if session is None:
+        session = _get_session(reporule.TOKENS)
+    github_type = _verify_org_or_user(org_name, session)
+    if github_type == "org":
+        repos_url = f"https://api.github.com/orgs/{org_name}/repos"
+    elif github_type == "user":
+        repos_url = f"https://api.github.com/users/{org_name}/repos"
+    else:
+        raise ValueError(f"Organization or user '{org_name}' not found.") from None
+
+    # request the largest page size; the "next" links carry it forward
+    params: dict | None = {"per_page": REPOS_PER_PAGE}
+    progress.start_phase("listing")
+    while repos_url:
+        response = session.get(repos_url, params=params)
+        params = None
+        response.raise_for_status()
+        page = response.json()
+        progress.advance("listing", len(page))
+        yield page
+        repos_url = response.links.get("next", {}).get("url")
+    progress.finish_phase("listing")
+
+
 def _load_branch_ruleset(branchset_name: str = "default_branch_protections") -> dict:
     """
     Return a dictionary that represents the requested branch ruleset.
@@ -186,7 +760,8 @@ def _load_branch_ruleset(branchset_name: str = "default_branch_protections") ->
     Raises:
     -------
     ValueError:
-        If the requested branch ruleset does not exist
+        If the requested branch ruleset does not exist or isn't a valid
+        ruleset (see _validate_branch_ruleset)
     """
     try:
         file_name = f"{branchset_name}.json"
@@ -195,10 +770,333 @@ def _load_branch_ruleset(branchset_name: str = "default_branch_protections") ->
             logger.debug("Branch ruleset loaded", ruleset_name=branchset_name, branch_ruleset=branch_ruleset)
     except FileNotFoundError:
         raise ValueError(f"Branch ruleset '{branchset_name}' not found.") from None
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Branch ruleset '{branchset_name}' is not valid JSON: {e}") from None
 
+    _validate_branch_ruleset(branch_ruleset, branchset_name)
     return branch_ruleset
 
 
+def _load_branch_ruleset_dir(dir_name: Path) -> list[dict]:
+    """
+    Return dictionaries that represent every branch ruleset in a directory.
+
+    Parameters:
+    ------------
+    dir_name : Path
+         Full path to a directory of .json branch ruleset files
+
+    Returns:
+    ----------
+    list
+        A list of dictionaries that represent the branch rulesets, in
+        file name order
+
+    Raises:
+    -------
+    ValueError:
+        If the directory doesn't contain any .json files, or one of them
+        isn't a valid ruleset (see _validate_branch_ruleset)
+    """
+    branch_rulesets = []
+    for file_name in sorted(dir_name.glob("*.json")):
+        with open(file_name, "r") as file:
+            try:
+                branch_ruleset = json.load(file)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Branch ruleset '{file_name.name}' is not valid JSON: {e}") from None
+            logger.debug("Branch ruleset loaded", file_name=str(file_name), branch_ruleset=branch_ruleset)
+        _validate_branch_ruleset(branch_ruleset, file_name.name)
+        branch_rulesets.append(branch_ruleset)
+
+    if not branch_rulesets:
+        raise ValueError(f"No branch rulesets found in {dir_name}.")
+    return branch_rulesets
+
+
+def _load_gzip_json(file_name: Path) -> dict:
+    """
+    Return the data saved in a gzipped JSON file (for example, an audit snapshot or a cache).
+
+    Parameters:
+    ------------
+    file_name : Path
+        Full path to the .json.gz file
+
+    Returns:
+    ----------
+    dict
+        The saved data, or an empty dictionary if there is no file
+
+    Raises:
+    -------
+    ValueError:
+        If the file cannot be parsed
+    """
+    try:
+        with gzip.open(file_name, "rt") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, json.JSONDecodeError):
+        raise ValueError(f"Unable to parse {file_name}.") from None
+
+
+def _load_poll_cursor(file_name: Path) -> dict:
+    """
+    Return the cursor saved by a previous poll of an organization's event feed.
+
+    Parameters:
+    ------------
+    file_name : Path
+        Full path to the cursor's .json file
+
+    Returns:
+    ----------
+    dict
+        The saved cursor, or an empty dictionary if there is no cursor file
+
+    Raises:
+    -------
+    ValueError:
+        If the cursor file cannot be parsed
+    """
+    try:
+        with open(file_name, "r") as file:
+            cursor = json.load(file)
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError:
+        raise ValueError(f"Unable to parse poll cursor {file_name}.") from None
+
+    logger.debug("Poll cursor loaded", file_name=str(file_name), cursor=cursor)
+    return cursor
+
+
+def _load_repo_exceptions_file(file_name: Path) -> dict:
+    """Parse the repo exceptions file once per run, however many times the exceptions are needed."""
+    cache = _run_cache.get()
+    if file_name not in cache:
+        with open(file_name, "r") as file:
+            cache[file_name] = yaml.safe_load(file)
+        logger.debug("Repo exceptions loaded", repo_exceptions=cache[file_name])
+    return cache[file_name]
+
+
+def _load_repo_names(file_name: Path, org_name: str) -> set[str]:
+    """
+    Read a list of repository names from a file, one per line.
+
+    Names can be given as "repo" or "org/repo". Blank lines and lines
+    starting with "#" are ignored.
+
+    Parameters:
+    ------------
+    file_name : Path
+        Full path to the file of repository names
+    org_name : str
+        Name of the GitHub organization or user that owns the repositories
+
+    Returns:
+    ----------
+    set
+        The full names of the repositories (in the format "org/repo")
+
+    Raises:
+    -------
+    ValueError:
+        If the file can't be read, is empty, or names a repository of another
+        organization or user
+    """
+    try:
+        lines = Path(file_name).read_text().splitlines()
+    except OSError:
+        raise ValueError(f"Unable to read repository list {file_name}.") from None
+
+    repo_names = set()
+    for line in lines:
+        name = line.split("#", 1)[0].strip()
+        if not name:
+            continue
+        owner, _, repo = name.rpartition("/")
+        if owner and owner.lower() != org_name.lower():
+            raise ValueError(f"{name} is not a repository of {org_name}.")
+        repo_names.add(f"{org_name}/{repo}")
+
+    if not repo_names:
+        raise ValueError(f"No repositories listed in {file_name}.")
+    logger.debug("Repository list loaded", file_name=str(file_name), count=len(repo_names))
+    return repo_names
+
+
+def _parse_shard(shard: str) -> tuple[int, int]:
+    """
+    Parse a shard specification in the format "i/N".
+
+    Parameters:
+    ------------
+    shard : str
+        The shard specification, where i is the 1-based index of the shard
+        and N is the total number of shards (for example, "2/4")
+
+    Returns:
+    ----------
+    tuple
+        The shard index and the number of shards
+
+    Raises:
+    -------
+    ValueError:
+        If the shard specification is invalid
+    """
+    try:
+        index, count = (int(part) for part in shard.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{shard}'. Use the format i/N, for example 1/4.") from None
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Invalid shard '{shard}'. The shard index must be between 1 and {max(count, 1)}.")
+    return index, count
+
+
+def _save_gzip_json(file_name: Path, data: dict):
+    """
+    Save data as compact, gzipped JSON, replacing the file only once it's fully written.
+
+    Parameters:
+    ------------
+    file_name : Path
+        Full path to the .json.gz file
+    data : dict
+        The data to save
+    """
+    file_name.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file_name = file_name.with_suffix(".tmp")
+    with gzip.open(tmp_file_name, "wt") as file:
+        json.dump(data, file, separators=(",", ":"))
+    tmp_file_name.replace(file_name)
+
+
+def _save_poll_cursor(file_name: Path, cursor: dict):
+    """
+    Save the cursor of an organization's event feed for use by the next poll.
+
+    Parameters:
+    ------------
+    file_name : Path
+        Full path to the cursor's .json file
+    cursor : dict
+        The cursor to save
+    """
+    file_name.parent.mkdir(parents=True, exist_ok=True)
+    # write to a temporary file first, so an interrupted run can't leave
+    # behind a truncated cursor
+    tmp_file_name = file_name.with_suffix(".tmp")
+    with open(tmp_file_name, "w") as file:
+        json.dump(cursor, file, indent=2)
+    tmp_file_name.replace(file_name)
+    logger.debug("Poll cursor saved", file_name=str(file_name), cursor=cursor)
+
+
+def _shard_repos(repo_list: list[dict], index: int, count: int) -> list[dict]:
+    """
+    Return the repositories that belong to one shard of a repository list.
+
+    Repositories are assigned to shards by a stable hash of their full name,
+    so every process that shards the same list gets the same partitions.
+
+    Parameters:
+    ------------
+    repo_list : list
+        A list of dictionaries that represent repository objects as returned by
+        GitHub's API.
+    index : int
+        The 1-based index of the shard
+    count : int
+        The total number of shards
+
+    Returns:
+    ----------
+    list
+        The repositories in the shard
+    """
+    shard = []
+    for repo in repo_list:
+        digest = hashlib.sha256(repo["full_name"].encode()).digest()
+        if int.from_bytes(digest[:8], "big") % count == index - 1:
+            shard.append(repo)
+    logger.debug("Repositories in shard", shard=f"{index}/{count}", count=len(shard), total=len(repo_list))
+    return shard
+
+
+def _validate_branch_ruleset(ruleset: dict, source: str = "ruleset"):
+    """
+    Check a ruleset against the format GitHub's API accepts, before any requests are made.
+
+    This catches malformed rulesets that GitHub would reject for every repo
+    with a 422 response. It can't catch rules the org's plan doesn't support;
+    those are detected when the first writes fail (see
+    reporule.executor.FailFast).
+
+    Parameters:
+    ------------
+    ruleset : dict
+        The ruleset to check
+    source : str
+        The name of the ruleset file, for error messages
+
+    Raises:
+    -------
+    ValueError:
+        If the ruleset is invalid. The message lists every problem found.
+    """
+    problems = []
+    if not isinstance(ruleset, dict):
+        raise ValueError(f"Branch ruleset '{source}' must be a JSON object.")
+    if not isinstance(ruleset.get("name"), str) or not ruleset["name"].strip():
+        problems.append("'name' must be a non-empty string")
+    if ruleset.get("target", "branch") not in RULESET_TARGETS:
+        problems.append(f"'target' must be one of {sorted(RULESET_TARGETS)}")
+    if ruleset.get("enforcement") not in RULESET_ENFORCEMENTS:
+        problems.append(f"'enforcement' must be one of {sorted(RULESET_ENFORCEMENTS)}")
+
+    conditions = ruleset.get("conditions", {})
+    if not isinstance(conditions, dict):
+        problems.append("'conditions' must be an object")
+        conditions = {}
+    ref_name = conditions.get("ref_name", {})
+    if not isinstance(ref_name, dict):
+        problems.append("'conditions.ref_name' must be an object")
+    else:
+        for key, patterns in ref_name.items():
+            if key not in ("include", "exclude"):
+                problems.append(f"unknown ref_name condition '{key}'")
+            elif not isinstance(patterns, list) or not all(isinstance(p, str) for p in patterns):
+                problems.append(f"ref_name '{key}' must be a list of strings")
+
+    rules = ruleset.get("rules", [])
+    if not isinstance(rules, list):
+        problems.append("'rules' must be a list")
+        rules = []
+    for index, rule in enumerate(rules):
+        if not isinstance(rule, dict) or rule.get("type") not in RULE_TYPES:
+            problems.append(
+                f"rules[{index}] has an unknown type {rule.get('type') if isinstance(rule, dict) else rule!r}"
+            )
+        elif not isinstance(rule.get("parameters", {}), dict):
+            problems.append(f"rules[{index}] parameters must be an object")
+
+    bypass_actors = ruleset.get("bypass_actors", [])
+    if not isinstance(bypass_actors, list):
+        problems.append("'bypass_actors' must be a list")
+        bypass_actors = []
+    for index, actor in enumerate(bypass_actors):
+        if not isinstance(actor, dict) or actor.get("actor_type") not in BYPASS_ACTOR_TYPES:
+            problems.append(f"bypass_actors[{index}] must have an actor_type in {sorted(BYPASS_ACTOR_TYPES)}")
+
+    if problems:
+        raise ValueError(f"Branch ruleset '{source}' is invalid: {'; '.join(problems)}.")
+
+
 def _verify_org_or_user(org_name: str, session: requests.Session | None = None) -> str | None:
     """
     Determines whether the specified org_name represents a GitHub organization,
@@ -219,13 +1117,13 @@ def _verify_org_or_user(org_name: str, session: requests.Session | None = None)
         org_name is a GitHub user, or None if neither.
     """
     if session is None:
-        session = _get_session(reporule.TOKEN)
+        session = _get_session(reporule.TOKENS)
     response = session.get(f"https://api.github.com/orgs/{org_name}")
     if response.ok:
-        logger.debug("GitHub organization found", org_name=org_name, org_info=response.json())
+        logger.debug("GitHub organization found", org_name=org_name, org_info=LazyField(response.json))
         return "org"
     response = session.get(f"https://api.github.com/users/{org_name}")
     if response.ok:
-        logger.debug("GitHub user found", user_name=org_name, user_info=response.json())
+        logger.debug("GitHub user found", user_name=org_name, user_info=LazyField(response.json))
         return "user"
     return None
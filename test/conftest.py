@@ -1,5 +1,14 @@
 import pytest
 
+from reporule.util import _clear_run_caches
+
+
+@pytest.fixture(autouse=True)
+def clear_run_caches():
+    """Don't let repo exceptions files cached by one test leak into the next."""
+    yield
+    _clear_run_caches()
+
 
 @pytest.fixture
 def repo_list():
@@ -0,0 +1,40 @@
+"""Test reporule cli."""
+
+from typer.testing import CliRunner
+
+from reporule.main import app
+
+runner = CliRunner()
+
+
+def test_audit_command(mocker, tmp_path):
+    """The first audit should report missing rulesets, and later audits should report changes."""
+    snapshots = [
+        {
+            "created_at": "2340-01-01",
+            "orgs": {"starfleet": {"starfleet/enterprise": {"archived": False, "rulesets": []}}},
+        },
+        {
+            "created_at": "2340-01-02",
+            "orgs": {
+                "starfleet": {
+                    "starfleet/enterprise": {"archived": False, "rulesets": ["default-branch-protections"]},
+                }
+            },
+        },
+    ]
+    build_audit_snapshot = mocker.patch("reporule.repo.audit.build_audit_snapshot", side_effect=snapshots)
+    mocker.patch("reporule.repo.audit._get_repo_exceptions", return_value=set())
+    mocker.patch("reporule.core._get_repo_exceptions", return_value=set())
+    snapshot_file = tmp_path / "audit.json.gz"
+
+    result = runner.invoke(app, ["audit", "starfleet", "--snapshot", str(snapshot_file)])
+    assert result.exit_code == 0
+    assert "0 covered, 1 missing" in result.output
+    assert snapshot_file.exists()
+
+    result = runner.invoke(app, ["audit", "starfleet", "--snapshot", str(snapshot_file)])
+    assert result.exit_code == 0
+    assert "Newly covered (default-branch-protections): 1" in result.output
+    # the second audit should be built from the first audit's snapshot
+    assert build_audit_snapshot.call_args.args[1] == snapshots[0]
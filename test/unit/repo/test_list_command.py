@@ -1,5 +1,7 @@
 """Test reporule cli."""
 
+import json
+
 from typer.testing import CliRunner
 
 from reporule.main import app
@@ -23,3 +25,38 @@ def test_list_command_missing_param(mocker):
     result = runner.invoke(app, ["list"])
     assert result.exit_code == 0
     get_repo.assert_not_called()
+
+
+def test_list_command_shard(mocker, repo_list, tmp_path):
+    """Test reporule CLI list command with the --shard option."""
+    mocker.patch("reporule.repo.list._get_repo", return_value=repo_list)
+    output = tmp_path / "shard.json"
+
+    listed = set()
+    for i in [1, 2]:
+        result = runner.invoke(app, ["list", "starfleet", "--shard", f"{i}/2", "--output-json", str(output)])
+        assert result.exit_code == 0
+        listed.update(json.loads(output.read_text())["repos"])
+
+    assert listed == {r["name"] for r in repo_list}
+
+
+def test_list_command_with(mocker, repo_list, tmp_path):
+    """Test reporule CLI list command with the --with option."""
+    mocker.patch("reporule.repo.list._get_repo", return_value=repo_list)
+    details = {r["full_name"]: {"rulesets": "a"} for r in repo_list}
+    get_details = mocker.patch("reporule.repo.list.get_repo_details", return_value=details)
+    output = tmp_path / "list.json"
+    cache = tmp_path / "list_cache.json.gz"
+
+    result = runner.invoke(
+        app, ["list", "starfleet", "--with", "rulesets", "--cache", str(cache), "--output-json", str(output)]
+    )
+    assert result.exit_code == 0
+    assert get_details.call_args.args[1] == ["rulesets"]
+    assert json.loads(output.read_text())["details"] == details
+    assert cache.exists()
+
+    result = runner.invoke(app, ["list", "starfleet", "--with", "rulesets,warp-core"])
+    assert result.exit_code == 2
+    assert "warp-core" in result.output
@@ -0,0 +1,33 @@
+"""Test reporule cli."""
+
+import json
+
+from typer.testing import CliRunner
+
+from reporule.main import app
+
+runner = CliRunner()
+
+
+def test_merge_command(tmp_path):
+    """Test reporule CLI merge command."""
+    files = []
+    for i in [1, 2]:
+        file_name = tmp_path / f"shard-{i}.json"
+        file_name.write_text(
+            json.dumps(
+                {
+                    "command": "ruleset",
+                    "org": "starfleet",
+                    "shard": f"{i}/2",
+                    "rulesets": {"vulcan_ruleset": {"eligible": ["starfleet/cerritos"], "skipped": [], "applied": 1}},
+                }
+            )
+        )
+        files.append(str(file_name))
+    output = tmp_path / "summary.json"
+
+    result = runner.invoke(app, ["merge", *files, "--output", str(output)])
+    assert result.exit_code == 0
+    assert "Total rulesets applied: 2" in result.output
+    assert json.loads(output.read_text())["total_applied"] == 2
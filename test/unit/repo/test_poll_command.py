@@ -0,0 +1,102 @@
+"""Test reporule cli."""
+
+import pytest
+from typer.testing import CliRunner
+
+from reporule.main import app
+
+runner = CliRunner()
+
+
+@pytest.fixture
+def mock_functions(mocker):
+    """Mocks for the poll command's supporting functions."""
+    mocks = {
+        "verify_org_or_user": mocker.patch("reporule.repo.poll._verify_org_or_user", return_value="org"),
+        "get_org_events": mocker.patch(
+            "reporule.repo.poll._get_org_events",
+            return_value=([{"id": "43", "type": "CreateEvent"}], 'W/"abc"'),
+        ),
+        "get_repo_delta": mocker.patch("reporule.repo.poll.get_repo_delta", return_value={"starfleet/cerritos"}),
+        "get_repos_by_name": mocker.patch("reporule.repo.poll._get_repos_by_name", return_value=[]),
+        "get_ruleset_repo_status": mocker.patch(
+            "reporule.repo.poll.get_ruleset_repo_status", return_value={"eligible_repos": {"starfleet/cerritos"}}
+        ),
+        "apply_branch_ruleset": mocker.patch("reporule.repo.poll.apply_branch_ruleset", return_value=1),
+        "save_poll_cursor": mocker.patch("reporule.repo.poll._save_poll_cursor"),
+    }
+    return mocks
+
+
+def test_poll_command_no_cursor(mock_functions, tmp_path):
+    """The first poll should only record the cursor."""
+    cursor_file = tmp_path / "cursor.json"
+    result = runner.invoke(app, ["poll", "starfleet", "--cursor", str(cursor_file)])
+    assert result.exit_code == 0
+
+    mock_functions["apply_branch_ruleset"].assert_not_called()
+    mock_functions["save_poll_cursor"].assert_called_once_with(
+        cursor_file, {"source": "events", "etag": 'W/"abc"', "event_id": "43"}
+    )
+
+
+@pytest.mark.parametrize("org_or_user", [None, "user"])
+def test_poll_command_not_org(mock_functions, tmp_path, org_or_user):
+    """Polling a user account or a misspelled org should be rejected before the events feed is requested."""
+    mock_functions["verify_org_or_user"].return_value = org_or_user
+    result = runner.invoke(app, ["poll", "starfleet", "--cursor", str(tmp_path / "cursor.json")])
+    assert result.exit_code == 2
+    assert "Invalid value" in result.output
+    mock_functions["get_org_events"].assert_not_called()
+
+
+def test_poll_command_no_cursor_audit_log(mocker, tmp_path):
+    """The first audit log poll should make a single request, however long the audit log is."""
+    response = mocker.MagicMock(status_code=200, ok=True)
+    response.json.return_value = [{"@timestamp": 1700000000000, "action": "repo.create"}]
+    response.links = {"next": {"url": "https://api.github.com/orgs/starfleet/audit-log?page=2"}}
+    session = mocker.MagicMock()
+    session.get.return_value = response
+    mocker.patch("reporule.repo.poll._get_session", return_value=session)
+    mocker.patch("reporule.repo.poll._verify_org_or_user", return_value="org")
+    save_poll_cursor = mocker.patch("reporule.repo.poll._save_poll_cursor")
+    cursor_file = tmp_path / "cursor.json"
+
+    result = runner.invoke(app, ["poll", "starfleet", "--audit-log", "--cursor", str(cursor_file)])
+    assert result.exit_code == 0
+
+    session.get.assert_called_once()
+    assert session.get.call_args.kwargs["params"]["per_page"] == 1
+    save_poll_cursor.assert_called_once_with(cursor_file, {"source": "audit-log", "timestamp": 1700000000000})
+
+
+def test_poll_command(mock_functions, tmp_path):
+    """Rulesets should only be applied to repos added since the last poll."""
+    cursor_file = tmp_path / "cursor.json"
+    cursor_file.write_text('{"source": "events", "etag": "W/\\"xyz\\"", "event_id": "42"}')
+
+    result = runner.invoke(app, ["poll", "starfleet", "--cursor", str(cursor_file)])
+    assert result.exit_code == 0
+
+    mock_functions["get_org_events"].assert_called_once()
+    assert mock_functions["get_org_events"].call_args.args[1:3] == ("42", 'W/"xyz"')
+    mock_functions["get_repos_by_name"].assert_called_once()
+    assert mock_functions["get_repos_by_name"].call_args.args[0] == {"starfleet/cerritos"}
+    call_args = mock_functions["apply_branch_ruleset"].call_args.args
+    assert call_args[0] == ["starfleet/cerritos"]
+    mock_functions["save_poll_cursor"].assert_called_once_with(
+        cursor_file, {"source": "events", "etag": 'W/"abc"', "event_id": "43"}
+    )
+
+
+def test_poll_command_dryrun(mock_functions, tmp_path):
+    """A dry run should not move the cursor."""
+    cursor_file = tmp_path / "cursor.json"
+    cursor_file.write_text('{"source": "events", "etag": null, "event_id": "42"}')
+
+    result = runner.invoke(app, ["poll", "starfleet", "--cursor", str(cursor_file), "--dryrun"])
+    assert result.exit_code == 0
+    assert "starfleet/cerritos" in result.output
+
+    mock_functions["apply_branch_ruleset"].assert_not_called()
+    mock_functions["save_poll_cursor"].assert_not_called()
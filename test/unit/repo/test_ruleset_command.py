@@ -1,8 +1,13 @@
 """Test reporule cli."""
 
+import json
+
 import pytest
+import requests
 from typer.testing import CliRunner
 
+from reporule.coordination import FileCoordinationBackend
+from reporule.core import PipelineResult
 from reporule.main import app
 
 runner = CliRunner()
@@ -17,8 +22,11 @@ def mock_functions(mocker):
             "reporule.repo.ruleset._load_branch_ruleset", return_value={"name": "vulcan_ruleset"}
         ),
         "get_repo": mocker.patch("reporule.repo.ruleset._get_repo", return_value=[]),
-        "get_ruleset_repo_status": mocker.patch("reporule.repo.ruleset.get_ruleset_repo_status"),
-        "apply_branch_ruleset": mocker.patch("reporule.repo.ruleset.apply_branch_ruleset"),
+        "get_rate_limit": mocker.patch("reporule.repo.ruleset._get_rate_limit", return_value=None),
+        "get_rulesets_repo_status": mocker.patch("reporule.repo.ruleset.get_rulesets_repo_status"),
+        "apply_branch_rulesets": mocker.patch(
+            "reporule.repo.ruleset.apply_branch_rulesets", return_value={"vulcan_ruleset": 0}
+        ),
     }
     return mocks
 
@@ -29,7 +37,7 @@ def repo_status():
 
     This fixture returns a dictionary that mocks the return
     value of core.get_ruleset_repo_status. "eligible_repos" is the
-    only key used by ruleset.py when calling the apply_branch_ruleset,
+    only key used by ruleset.py when calling the apply_branch_rulesets,
     so the individual tests will set this value. The other keys are
     here for completeness but aren't used.
     """
@@ -52,7 +60,7 @@ def repo_status():
 def test_ruleset_commands_all(mock_functions, repo_list, repo_status, cli_args, eligible_repo_set, ruleset_file_name):
     """Test the ruleset CLI command when used with --all option."""
     repo_status["eligible_repos"] = eligible_repo_set
-    mock_functions["get_ruleset_repo_status"].return_value = repo_status
+    mock_functions["get_rulesets_repo_status"].return_value = {"vulcan_ruleset": repo_status}
     mock_functions["get_repo"].return_value = repo_list
 
     result = runner.invoke(app, cli_args)
@@ -64,25 +72,32 @@ def test_ruleset_commands_all(mock_functions, repo_list, repo_status, cli_args,
     mock_functions["load_branch_ruleset"].assert_called_once_with(expected_ruleset_name)
 
     mock_functions["verify_org_or_user"].assert_called_once_with("starfleet")
-    mock_functions["get_repo"].assert_called_once_with("starfleet")
-    mock_functions["get_ruleset_repo_status"].assert_called_once_with(
-        "starfleet", mock_functions["get_repo"].return_value, mock_functions["load_branch_ruleset"].return_value
+    mock_functions["get_repo"].assert_called_once()
+    assert mock_functions["get_repo"].call_args.args == ("starfleet",)
+    mock_functions["get_rulesets_repo_status"].assert_called_once()
+    assert mock_functions["get_rulesets_repo_status"].call_args.args[:3] == (
+        "starfleet",
+        mock_functions["get_repo"].return_value,
+        [mock_functions["load_branch_ruleset"].return_value],
     )
-    mock_functions["apply_branch_ruleset"].assert_called_once
+    mock_functions["apply_branch_rulesets"].assert_called_once()
 
-    # first parameter passed to apply_branch_ruleset should match repo_set["eligible_repos"]
+    # repos passed to apply_branch_rulesets should match repo_set["eligible_repos"]
     expected_ruleset_repos = repo_status["eligible_repos"]
-    call_args, call_kwargs = mock_functions["apply_branch_ruleset"].call_args_list[0]
-    repo_list = call_args[0]
+    call_args, call_kwargs = mock_functions["apply_branch_rulesets"].call_args_list[0]
+    [(ruleset_dict, repo_list)] = call_args[0]
 
+    assert ruleset_dict == mock_functions["load_branch_ruleset"].return_value
     assert set(repo_list) == set(expected_ruleset_repos)
 
 
 def test_ruleset_commands_repo(mock_functions, repo_list, repo_status):
     """Test the ruleset CLI command when used with --repo option."""
     repo_status["eligible_repos"] = {"starfleet/cerritos"}
-    mock_functions["get_ruleset_repo_status"].return_value = repo_status
-    mock_functions["get_repo"].return_value = {"name": "cerritos", "full_name": "starfleet/cerritos", "archived": False}
+    mock_functions["get_rulesets_repo_status"].return_value = {"vulcan_ruleset": repo_status}
+    mock_functions["get_repo"].return_value = [
+        {"name": "cerritos", "full_name": "starfleet/cerritos", "archived": False}
+    ]
 
     result = runner.invoke(
         app,
@@ -90,24 +105,47 @@ def test_ruleset_commands_repo(mock_functions, repo_list, repo_status):
     )
     assert result.exit_code == 0
 
-    mock_functions["verify_org_or_user"].assert_called_once_with("starfleet")
-    mock_functions["get_repo"].assert_called_once_with("starfleet", "cerritos")
-    mock_functions["apply_branch_ruleset"].assert_called_once
+    # fetching the repo shows whether its owner exists, so the owner isn't looked up
+    mock_functions["verify_org_or_user"].assert_not_called()
+    mock_functions["get_repo"].assert_called_once()
+    assert mock_functions["get_repo"].call_args.args == ("starfleet", "cerritos")
+    # a single repo can't exhaust the rate limit, so it isn't checked
+    mock_functions["get_rate_limit"].assert_not_called()
+    mock_functions["apply_branch_rulesets"].assert_called_once()
 
-    # first parameter passed to apply_branch_ruleset should match repo_set["eligible_repos"]
+    # repos passed to apply_branch_rulesets should match repo_set["eligible_repos"]
     expected_ruleset_repos = repo_status["eligible_repos"]
-    call_args, call_kwargs = mock_functions["apply_branch_ruleset"].call_args_list[0]
-    repo_list = call_args[0]
+    call_args, call_kwargs = mock_functions["apply_branch_rulesets"].call_args_list[0]
+    [(_, repo_list)] = call_args[0]
 
     assert set(repo_list) == set(expected_ruleset_repos)
 
 
+def test_ruleset_commands_repos_file(mocker, tmp_path, mock_functions, repo_list, repo_status):
+    """Only the repos in the --repos-file list should be fetched, instead of the whole org."""
+    get_repos_by_name = mocker.patch("reporule.repo.ruleset._get_repos_by_name", return_value=repo_list[:2])
+    repo_status["eligible_repos"] = {"starfleet/enterprise", "starfleet/cerritos"}
+    mock_functions["get_rulesets_repo_status"].return_value = {"vulcan_ruleset": repo_status}
+    repos_file = tmp_path / "repos.txt"
+    repos_file.write_text("enterprise\nstarfleet/cerritos\n")
+
+    result = runner.invoke(app, ["ruleset", "starfleet", "--repos-file", str(repos_file)])
+    assert result.exit_code == 0
+
+    mock_functions["get_repo"].assert_not_called()
+    assert get_repos_by_name.call_args.args[0] == {"starfleet/enterprise", "starfleet/cerritos"}
+    assert mock_functions["get_rulesets_repo_status"].call_args.args[1] == repo_list[:2]
+    [(_, applied_repos)] = mock_functions["apply_branch_rulesets"].call_args.args[0]
+    assert set(applied_repos) == {"starfleet/enterprise", "starfleet/cerritos"}
+
+
 def test_ruleset_commands_no_eligible_repos(mock_functions, repo_status):
     """Test the ruleset CLI command when no repos are eligible for ruleset update."""
     repo_status["exceptions"] = {"starfleet/excelsior"}
     repo_status["archived"] = {"starfleet/voyager"}
     repo_status["existing_ruleset"] = {"starfleet/enterprise"}
-    mock_functions["get_ruleset_repo_status"].return_value = repo_status
+    repo_status["eligible_repos"] = set()
+    mock_functions["get_rulesets_repo_status"].return_value = {"vulcan_ruleset": repo_status}
 
     result = runner.invoke(
         app,
@@ -121,13 +159,15 @@ def test_ruleset_commands_no_eligible_repos(mock_functions, repo_status):
     assert "starfleet/voyager" in result.output
     assert "starfleet/enterprise" in result.output
 
-    mock_functions["apply_branch_ruleset"].assert_not_called
+    mock_functions["apply_branch_rulesets"].assert_called_once()
+    [(_, repo_list)] = mock_functions["apply_branch_rulesets"].call_args.args[0]
+    assert repo_list == []
 
 
 def test_ruleset_commands_dryrun(mock_functions, repo_status):
     """Test the ruleset CLI command --dryrun option."""
     repo_status["eligible_repos"] = {"starfleet/enterprise", "starfleet/cerritos"}
-    mock_functions["get_ruleset_repo_status"].return_value = repo_status
+    mock_functions["get_rulesets_repo_status"].return_value = {"vulcan_ruleset": repo_status}
 
     result = runner.invoke(
         app,
@@ -136,13 +176,198 @@ def test_ruleset_commands_dryrun(mock_functions, repo_status):
     assert result.exit_code == 0
     assert "DRY RUN" in result.output.upper()
 
-    mock_functions["apply_branch_ruleset"].assert_not_called
+    mock_functions["apply_branch_rulesets"].assert_not_called()
+
+
+def test_ruleset_commands_multiple_rulesets(mocker, mock_functions, repo_list, repo_status):
+    """Multiple rulesets should share one repo listing and be applied in one pass."""
+    rulesets = {"vulcan_ruleset": {"name": "vulcan_ruleset"}, "klingon_ruleset": {"name": "klingon_ruleset"}}
+    mock_functions["load_branch_ruleset"].side_effect = lambda name: rulesets[name]
+    mock_functions["get_repo"].return_value = repo_list
+    mock_functions["get_rulesets_repo_status"].return_value = {
+        "vulcan_ruleset": repo_status | {"eligible_repos": {"starfleet/enterprise"}},
+        "klingon_ruleset": repo_status | {"eligible_repos": {"starfleet/cerritos"}},
+    }
+    mock_functions["apply_branch_rulesets"].return_value = {"vulcan_ruleset": 1, "klingon_ruleset": 1}
+
+    result = runner.invoke(
+        app, ["ruleset", "starfleet", "--all", "--ruleset", "vulcan_ruleset", "--ruleset", "klingon_ruleset"]
+    )
+    assert result.exit_code == 0
+
+    mock_functions["get_repo"].assert_called_once()
+    mock_functions["get_rulesets_repo_status"].assert_called_once()
+    assert mock_functions["get_rulesets_repo_status"].call_args.args[2] == list(rulesets.values())
+    mock_functions["apply_branch_rulesets"].assert_called_once()
+    assert mock_functions["apply_branch_rulesets"].call_args.args[0] == [
+        (rulesets["vulcan_ruleset"], ["starfleet/enterprise"]),
+        (rulesets["klingon_ruleset"], ["starfleet/cerritos"]),
+    ]
+
+
+def test_ruleset_commands_max_requests(mocker, mock_functions, repo_list, repo_status, tmp_path):
+    """With too few requests for the whole run, repos with no rulesets go first and the rest are reported."""
+    mock_functions["get_repo"].return_value = repo_list
+    mock_functions["get_rate_limit"].return_value = {"limit": 5000, "remaining": 4000, "used": 1000, "reset": 0}
+    mocker.patch("reporule.core._get_repo_exceptions", return_value=set())
+    repo_status["eligible_repos"] = {"starfleet/enterprise", "starfleet/cerritos"}
+    repo_status["existing_ruleset"] = {"starfleet/voyager", "starfleet/excelsior"}
+    repo_status["no_rulesets"] = {"starfleet/cerritos"}
+    mock_functions["get_rulesets_repo_status"].return_value = {"vulcan_ruleset": repo_status}
+    output_file = tmp_path / "output.json"
+
+    # 2 requests to list the repos, 4 to check them, leaves 1 to apply rulesets
+    result = runner.invoke(
+        app, ["ruleset", "starfleet", "--all", "--max-requests", "7", "--output-json", str(output_file)]
+    )
+    assert result.exit_code == 0
+
+    # each scanned repo needs up to 2 requests: one to check it and one to apply the ruleset
+    assert mock_functions["get_rulesets_repo_status"].call_args.kwargs["max_scans"] == 2
+    assert mock_functions["apply_branch_rulesets"].call_args.args[0] == [
+        (mock_functions["load_branch_ruleset"].return_value, ["starfleet/cerritos"])
+    ]
+    assert "Left for a later run" in result.output
+    assert json.loads(output_file.read_text())["rulesets"]["vulcan_ruleset"]["deferred"] == ["starfleet/enterprise"]
+
+
+def test_ruleset_commands_max_requests_token_pool(mocker, mock_functions, repo_list, repo_status):
+    """With a token pool, the request budget is the measured rate limit of every credential."""
+    mocker.patch("reporule.TOKENS", ["token-a", "token-b"])
+    mock_functions["get_repo"].return_value = repo_list
+    mock_functions["get_rate_limit"].side_effect = [
+        {"limit": 5000, "remaining": 1, "used": 4999, "reset": 0},
+        {"limit": 15000, "remaining": 6, "used": 14994, "reset": 0},
+    ]
+    mocker.patch("reporule.core._get_repo_exceptions", return_value=set())
+    repo_status["eligible_repos"] = {"starfleet/enterprise", "starfleet/cerritos"}
+    mock_functions["get_rulesets_repo_status"].return_value = {"vulcan_ruleset": repo_status}
+
+    result = runner.invoke(app, ["ruleset", "starfleet", "--all"])
+    assert result.exit_code == 0
+    assert "7 requests remaining across 2 credentials" in result.output
+    assert [c.kwargs["credential"] for c in mock_functions["get_rate_limit"].call_args_list] == [0, 1]
+    # 7 requests, at up to 2 per scanned repo
+    assert mock_functions["get_rulesets_repo_status"].call_args.kwargs["max_scans"] == 3
+
+
+def test_ruleset_commands_time_budget(mock_functions, repo_list, repo_status):
+    """The time budget should cut off scanning repos as well as writing rulesets."""
+    mock_functions["get_repo"].return_value = repo_list
+    repo_status["eligible_repos"] = {"starfleet/enterprise"}
+    mock_functions["get_rulesets_repo_status"].return_value = {"vulcan_ruleset": repo_status}
+
+    result = runner.invoke(app, ["ruleset", "starfleet", "--all", "--time-budget", "600"])
+    assert result.exit_code == 0
+    scan_deadline = mock_functions["get_rulesets_repo_status"].call_args.kwargs["deadline"]
+    assert scan_deadline is not None
+    assert mock_functions["apply_branch_rulesets"].call_args.kwargs["deadline"] == scan_deadline
+
+
+def test_ruleset_commands_coordinate_skip(monkeypatch, tmp_path, mock_functions, repo_list, repo_status):
+    """Repos claimed by another active run should be skipped."""
+    monkeypatch.chdir(tmp_path)
+    mock_functions["get_repo"].return_value = repo_list
+    repo_status["eligible_repos"] = {"starfleet/enterprise", "starfleet/cerritos"}
+    mock_functions["get_rulesets_repo_status"].return_value = {"vulcan_ruleset": repo_status}
+
+    other_run = FileCoordinationBackend()
+    other_run.acquire("starfleet", "other-run", wait=False)
+    other_run.claim("starfleet", "other-run", ["starfleet/enterprise#vulcan_ruleset"])
+
+    result = runner.invoke(app, ["ruleset", "starfleet", "--all", "--coordinate", "skip"])
+    assert result.exit_code == 0
+    assert "claimed by another run" in result.output
+    assert mock_functions["apply_branch_rulesets"].call_args.args[0] == [
+        (mock_functions["load_branch_ruleset"].return_value, ["starfleet/cerritos"])
+    ]
+    # the other run is still changing the repos it claimed, so later runs can't reuse this run's results
+    assert other_run.load_results("starfleet") is None
+
+
+def test_ruleset_commands_coordinate_wait(monkeypatch, tmp_path, mock_functions, repo_list, repo_status):
+    """A run that waits should reuse a recent run's repo list and the rulesets of repos it didn't change."""
+    monkeypatch.chdir(tmp_path)
+    mock_functions["get_repo"].return_value = repo_list
+    repo_status["eligible_repos"] = {"starfleet/cerritos"}
+    repo_status["existing_ruleset"] = {"starfleet/enterprise"}
+    mock_functions["get_rulesets_repo_status"].return_value = {"vulcan_ruleset": repo_status}
+
+    result = runner.invoke(app, ["ruleset", "starfleet", "--all", "--coordinate", "wait"])
+    assert result.exit_code == 0
+    assert mock_functions["get_rulesets_repo_status"].call_args.kwargs["known_rulesets"] is None
+
+    result = runner.invoke(app, ["ruleset", "starfleet", "--all", "--coordinate", "wait"])
+    assert result.exit_code == 0
+    assert "Reusing the repository list" in result.output
+    # the repo list was fetched once, by the first run
+    mock_functions["get_repo"].assert_called_once()
+    # cerritos had the ruleset applied, so its rulesets have to be fetched again
+    assert mock_functions["get_rulesets_repo_status"].call_args.kwargs["known_rulesets"] == {
+        "starfleet/enterprise": ["vulcan_ruleset"]
+    }
+
+
+def test_ruleset_commands_pipeline(mocker, mock_functions, repo_list, repo_status):
+    """With --pipeline, the repo pages should be streamed into the pipelined apply."""
+    repo_status["eligible_repos"] = {"starfleet/cerritos"}
+    iter_repo_pages = mocker.patch("reporule.repo.ruleset._iter_repo_pages", return_value=iter([repo_list]))
+    pipelined = mocker.patch(
+        "reporule.repo.ruleset.apply_branch_rulesets_pipelined",
+        return_value=PipelineResult(
+            status={"vulcan_ruleset": repo_status},
+            ruleset_repos=[({"name": "vulcan_ruleset"}, ["starfleet/cerritos"])],
+            applied={"vulcan_ruleset": 1},
+            deferred={"vulcan_ruleset": []},
+            stopped_on_error=None,
+        ),
+    )
+
+    result = runner.invoke(app, ["ruleset", "starfleet", "--all", "--pipeline"])
+    assert result.exit_code == 0
+    assert "Applied vulcan_ruleset to 1 repositories." in result.output
+
+    iter_repo_pages.assert_called_once()
+    assert pipelined.call_args.args[1] is iter_repo_pages.return_value
+    mock_functions["get_repo"].assert_not_called()
+    mock_functions["apply_branch_rulesets"].assert_not_called()
+
+
+def test_ruleset_commands_pipeline_errors(mocker, mock_functions, repo_status, tmp_path):
+    """Failed scans and a failed repo list should be reported after the writes that were made."""
+    repo_status["eligible_repos"] = {"starfleet/cerritos"}
+    repo_status["failed"] = {"starfleet/voyager"}
+    mocker.patch("reporule.repo.ruleset._iter_repo_pages", return_value=iter([]))
+    mocker.patch(
+        "reporule.repo.ruleset.apply_branch_rulesets_pipelined",
+        return_value=PipelineResult(
+            status={"vulcan_ruleset": repo_status},
+            ruleset_repos=[({"name": "vulcan_ruleset"}, ["starfleet/cerritos"])],
+            applied={"vulcan_ruleset": 1},
+            deferred={"vulcan_ruleset": []},
+            stopped_on_error=None,
+            list_error="connection reset",
+        ),
+    )
+    output_file = tmp_path / "output.json"
+
+    result = runner.invoke(app, ["ruleset", "starfleet", "--all", "--pipeline", "--output-json", str(output_file)])
+    assert result.exit_code == 1
+    assert "Applied vulcan_ruleset to 1 repositories." in result.output
+    assert "Unable to check the existing rulesets" in result.output
+    assert "Stopped listing repositories after an error: connection reset" in result.output
+    output = json.loads(output_file.read_text())
+    assert output["failed"] == ["starfleet/voyager"]
+    assert output["list_error"] == "connection reset"
 
 
 @pytest.mark.parametrize(
     "args",
     [
         (["ruleset", "starfleet", "--repo", "cerritos", "--all"]),
+        (["ruleset", "starfleet", "--repos-file", "repos.txt", "--all"]),
+        (["ruleset", "starfleet", "--repo", "cerritos", "--pipeline"]),
+        (["ruleset", "starfleet", "--all", "--pipeline", "--max-requests", "100"]),
         (
             [
                 "ruleset",
@@ -160,8 +385,107 @@ def test_ruleset_command_bad_params(mocker, args):
     assert result.exit_code != 0
 
 
+def test_ruleset_command_repo_not_found(mocker, mock_functions):
+    """A --repo that doesn't exist should fail with a clear error."""
+    response = mocker.MagicMock(status_code=404)
+    mock_functions["get_repo"].side_effect = requests.HTTPError("404 Not Found", response=response)
+    result = runner.invoke(app, ["ruleset", "starfleet", "--repo", "shuttlecraft"])
+    assert result.exit_code != 0
+    assert "starfleet/shuttlecraft not found" in result.output
+
+
+@pytest.mark.parametrize("args", [["--repo", "cerritos"], ["--repos-file", "repos.txt"]])
+def test_ruleset_command_shard_requires_all(monkeypatch, tmp_path, mock_functions, args):
+    """--shard should be rejected unless it's splitting up --all, rather than being ignored."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "repos.txt").write_text("cerritos\n")
+    result = runner.invoke(app, ["ruleset", "starfleet", "--shard", "1/2"] + args)
+    assert result.exit_code != 0
+    assert "--shard requires --all" in result.output
+    mock_functions["apply_branch_rulesets"].assert_not_called()
+
+
 def test_ruleset_command_invalid_org_or_user(mocker):
     """Ruleset command should fail if org/user doesn't exist on GitHub."""
     mocker.patch("reporule.repo.ruleset._verify_org_or_user", return_value=None)
     result = runner.invoke(app, ["ruleset", "github_user_or_org_that_doesnt_exist", "--all"])
     assert result.exit_code != 0
+
+
+@pytest.fixture
+def mock_remove_update_functions(mocker, repo_list):
+    """Mocks for the ruleset remove and update commands' supporting functions."""
+    mocks = {
+        "verify_org_or_user": mocker.patch("reporule.repo.ruleset._verify_org_or_user", return_value="org"),
+        "get_repo": mocker.patch("reporule.repo.ruleset._get_repo", return_value=repo_list),
+        "get_repo_exceptions": mocker.patch(
+            "reporule.repo.ruleset._get_repo_exceptions", return_value={"starfleet/excelsior"}
+        ),
+        "get_ruleset_ids": mocker.patch(
+            "reporule.repo.ruleset.get_ruleset_ids", return_value={"starfleet/enterprise": 123}
+        ),
+        "remove_branch_ruleset": mocker.patch("reporule.repo.ruleset.remove_branch_ruleset", return_value=1),
+        "update_branch_ruleset": mocker.patch("reporule.repo.ruleset.update_branch_ruleset", return_value=1),
+    }
+    return mocks
+
+
+def test_ruleset_remove_command(mock_remove_update_functions):
+    """Test the ruleset remove command."""
+    result = runner.invoke(app, ["ruleset", "remove", "starfleet", "--all", "--name", "vulcan_ruleset"])
+    assert result.exit_code == 0
+
+    # archived repos and repos on the exception list should not be searched for the ruleset
+    call_args = mock_remove_update_functions["get_ruleset_ids"].call_args.args
+    assert call_args[0] == ["starfleet/cerritos", "starfleet/enterprise", "starfleet/voyager"]
+    assert call_args[1] == "vulcan_ruleset"
+    call_args = mock_remove_update_functions["remove_branch_ruleset"].call_args.args
+    assert call_args[0] == {"starfleet/enterprise": 123}
+
+
+def test_ruleset_update_command_dryrun(mock_remove_update_functions):
+    """Test the ruleset update command --dryrun option."""
+    result = runner.invoke(app, ["ruleset", "update", "starfleet", "--all", "--dryrun", "--name", "old_ruleset"])
+    assert result.exit_code == 0
+    assert "DRY RUN" in result.output.upper()
+    assert "starfleet/enterprise" in result.output
+
+    assert mock_remove_update_functions["get_ruleset_ids"].call_args.args[1] == "old_ruleset"
+    mock_remove_update_functions["update_branch_ruleset"].assert_not_called()
+
+
+def test_ruleset_simulate_command(mock_remove_update_functions, mocker, tmp_path):
+    """Test the ruleset simulate command."""
+    results = {
+        "starfleet/enterprise": {"branches": 3, "matched": {"default-branch-protections": 1}},
+        "starfleet/cerritos": {"branches": 1, "matched": {"default-branch-protections": 1}},
+    }
+    simulate = mocker.patch("reporule.repo.ruleset.simulate_branch_rulesets", return_value=results)
+    output = tmp_path / "simulate.json"
+    cache = tmp_path / "branch_cache.json.gz"
+
+    result = runner.invoke(
+        app, ["ruleset", "simulate", "starfleet", "--all", "--cache", str(cache), "--output-json", str(output)]
+    )
+    assert result.exit_code == 0
+    assert "default-branch-protections: 2 branches in 2 of 2 repositories" in result.output
+    # archived repos and repos on the exception list aren't simulated
+    assert sorted(r["full_name"] for r in simulate.call_args.args[0]) == [
+        "starfleet/cerritos",
+        "starfleet/enterprise",
+        "starfleet/voyager",
+    ]
+    assert "starfleet/voyager" in result.output.split("Unable to get the branches")[1]
+    assert json.loads(output.read_text())["repos"] == results
+    assert cache.exists()
+
+
+def test_ruleset_simulate_command_bad_params(mock_remove_update_functions, mocker):
+    """The simulate command needs --all or --repo, and only simulates branch rulesets."""
+    result = runner.invoke(app, ["ruleset", "simulate", "starfleet"])
+    assert result.exit_code == 2
+
+    mocker.patch("reporule.repo.ruleset._load_branch_ruleset", return_value={"name": "tags", "target": "tag"})
+    result = runner.invoke(app, ["ruleset", "simulate", "starfleet", "--all", "--ruleset", "tag_protections"])
+    assert result.exit_code == 2
+    assert "Only branch rulesets" in result.output
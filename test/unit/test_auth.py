@@ -0,0 +1,144 @@
+"""Unit tests for auth.py"""
+
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+import requests
+
+from reporule.auth import AppInstallationToken, StaticToken, TokenPool, _get_app_credentials
+from reporule.retry import CONNECT_TIMEOUT, READ_TIMEOUT
+from reporule.util import _get_session
+
+
+def _response(
+    request: requests.PreparedRequest, status_code: int, remaining: int, reset: float = 0
+) -> requests.Response:
+    """Return a GitHub API response with rate limit headers."""
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers["x-ratelimit-remaining"] = str(remaining)
+    response.headers["x-ratelimit-reset"] = str(int(reset))
+    response._content = b"{}"
+    response.request = request
+    return response
+
+
+@pytest.fixture
+def pool():
+    return TokenPool([StaticToken("token-a"), StaticToken("token-b")])
+
+
+def _prepare(pool: TokenPool) -> requests.PreparedRequest:
+    request = requests.Request("GET", "https://api.github.com/orgs/starfleet").prepare()
+    return pool(request)
+
+
+def test_token_pool_routes_to_largest_budget(pool):
+    """Requests should go to the token with the most remaining budget."""
+    request = _prepare(pool)
+    assert request.headers["Authorization"] == "Bearer token-a"
+    pool._handle_response(_response(request, 200, remaining=10))
+
+    request = _prepare(pool)
+    assert request.headers["Authorization"] == "Bearer token-b"
+    pool._handle_response(_response(request, 200, remaining=4000))
+
+    assert _prepare(pool).headers["Authorization"] == "Bearer token-b"
+
+
+def test_token_pool_rotates_rate_limited_token(mocker, pool):
+    """A rate-limited request should be re-sent with another token, and the limited token taken out of rotation."""
+    request = _prepare(pool)
+    limited = _response(request, 403, remaining=0, reset=time.time() + 600)
+    limited.connection = mocker.MagicMock()
+    limited.connection.send.side_effect = lambda prepared, **kwargs: _response(prepared, 200, remaining=4000)
+
+    response = pool._handle_response(limited)
+
+    assert response.status_code == 200
+    assert response.request.headers["Authorization"] == "Bearer token-b"
+    assert response.history == [limited]
+    # token-a stays out of rotation until its reset time
+    for _ in range(3):
+        assert _prepare(pool).headers["Authorization"] == "Bearer token-b"
+
+
+@pytest.fixture
+def token_endpoint():
+    """A local stub of GitHub's installation token endpoint."""
+    requests_received = []
+
+    class TokenHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            requests_received.append((self.path, self.headers["Authorization"]))
+            expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+            body = json.dumps({"token": f"ghs_{len(requests_received)}", "expires_at": expires_at.isoformat()})
+            self.send_response(201)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(body.encode())
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), TokenHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", requests_received
+    server.shutdown()
+
+
+@pytest.mark.enable_socket
+def test_app_installation_token(token_endpoint):
+    """Installation tokens should be requested with the app's JWT and cached until they near expiry."""
+    api_url, requests_received = token_endpoint
+    credential = AppInstallationToken("42", "not-a-real-key", "1701", api_url=api_url, jwt_encoder=lambda: "app-jwt")
+
+    assert credential.get_token() == "ghs_1"
+    assert credential.get_token() == "ghs_1"
+    assert requests_received == [("/app/installations/1701/access_tokens", "Bearer app-jwt")]
+
+
+def test_app_installation_token_refresh(mocker):
+    """Tokens close to expiry should be refreshed before use."""
+    session = mocker.MagicMock(spec=requests.Session)
+    expires_soon = (datetime.now(timezone.utc) + timedelta(seconds=30)).isoformat()
+    expires_later = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+    session.post.return_value.json.side_effect = [
+        {"token": "ghs_old", "expires_at": expires_soon},
+        {"token": "ghs_new", "expires_at": expires_later},
+    ]
+    credential = AppInstallationToken("42", "not-a-real-key", "1701", jwt_encoder=lambda: "app-jwt", session=session)
+
+    assert credential.get_token() == "ghs_old"
+    assert credential.get_token() == "ghs_new"
+    assert session.post.call_count == 2
+    # a hung token request shouldn't block every request waiting for a token
+    assert session.post.call_args.kwargs["timeout"] == (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+
+def test_app_credentials_created_once(monkeypatch):
+    """Every session should share the same App credentials, so installation tokens are reused."""
+    monkeypatch.setenv("GITHUB_APP_ID", "42")
+    monkeypatch.setenv("GITHUB_APP_INSTALLATION_ID", "1701,1864")
+    monkeypatch.setenv("GITHUB_APP_PRIVATE_KEY", "not-a-real-key")
+
+    credentials = _get_app_credentials()
+    assert [c.installation_id for c in credentials] == ["1701", "1864"]
+    assert _get_app_credentials() == credentials
+    assert _get_session("a-token").auth.credentials[1:] == credentials
+
+    # a different configuration gets its own credentials
+    monkeypatch.setenv("GITHUB_APP_INSTALLATION_ID", "1701")
+    assert len(_get_app_credentials()) == 1
+
+
+def test_session_without_tokens(monkeypatch):
+    """A session can be created without any credentials, for unauthenticated requests."""
+    monkeypatch.delenv("GITHUB_APP_ID", raising=False)
+    session = _get_session([])
+    assert "Authorization" not in session.headers
@@ -0,0 +1,93 @@
+"""Unit tests for cassette.py"""
+
+import gzip
+import json
+
+import pytest
+import requests
+from typer.testing import CliRunner
+
+from reporule import cassette
+from reporule.executor import RateLimiter
+from reporule.main import app
+from reporule.util import _get_repo_rulesets, _get_session
+
+
+@pytest.fixture
+def recorded_cassette(mocker, tmp_path):
+    """Record two responses from a mocked GitHub API."""
+    path = tmp_path / "cassette.json.gz"
+    responses = iter([(200, b'[{"name": "first"}]'), (200, b'[{"name": "second"}]')])
+
+    def _send(request, *args, **kwargs):
+        status, body = next(responses)
+        response = requests.Response()
+        response.status_code = status
+        response._content = body
+        response.headers["content-type"] = "application/json; charset=utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    mocker.patch("reporule.retry.GitHubAdapter.send", side_effect=_send)
+    cassette.start(path, "record")
+    session = _get_session("a-token")
+    _get_repo_rulesets("starfleet/voyager", session=session)
+    _get_repo_rulesets("starfleet/voyager", session=session)
+    cassette.stop()
+    mocker.stopall()
+    return path
+
+
+def test_replay(recorded_cassette):
+    """Replayed requests should get the recorded responses, in the order they were recorded."""
+    cassette.start(recorded_cassette, "replay")
+    try:
+        session = _get_session("a-different-token")
+        assert _get_repo_rulesets("starfleet/voyager", session=session) == [{"name": "first"}]
+        assert _get_repo_rulesets("starfleet/voyager", session=session) == [{"name": "second"}]
+        # once the recorded responses are used up, the last one is repeated
+        assert _get_repo_rulesets("starfleet/voyager", session=session) == [{"name": "second"}]
+    finally:
+        cassette.stop()
+
+
+def test_replay_miss(recorded_cassette):
+    """Requests that weren't recorded should fail instead of using the network."""
+    cassette.start(recorded_cassette, "replay")
+    try:
+        session = _get_session("a-token")
+        with pytest.raises(cassette.CassetteMissError):
+            _get_repo_rulesets("starfleet/enterprise", session=session)
+    finally:
+        cassette.stop()
+
+
+def test_cassette_does_not_store_credentials(recorded_cassette):
+    """The cassette file should not contain the token used to record it."""
+    with gzip.open(recorded_cassette, "rt") as file:
+        assert "a-token" not in file.read()
+
+
+def test_replay_without_app_credentials(monkeypatch, recorded_cassette):
+    """Replays shouldn't exchange GitHub App credentials for installation tokens, which needs the network."""
+    monkeypatch.setenv("GITHUB_APP_ID", "42")
+    monkeypatch.setenv("GITHUB_APP_INSTALLATION_ID", "1701")
+    monkeypatch.setenv("GITHUB_APP_PRIVATE_KEY", "not-a-real-key")
+    cassette.start(recorded_cassette, "replay")
+    try:
+        session = _get_session("a-token")
+        assert session.auth is None
+        assert _get_repo_rulesets("starfleet/voyager", session=session) == [{"name": "first"}]
+    finally:
+        cassette.stop()
+
+
+def test_replay_restores_rate_limiting(recorded_cassette, tmp_path):
+    """Write rate limiting is turned off during a replay, and back on afterwards."""
+    shard = tmp_path / "shard.json"
+    shard.write_text(json.dumps({"command": "list", "org": "starfleet", "shard": "1/1", "repos": []}))
+
+    result = CliRunner().invoke(app, ["--replay", str(recorded_cassette), "merge", str(shard)])
+    assert result.exit_code == 0
+    assert RateLimiter.enabled
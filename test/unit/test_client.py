@@ -0,0 +1,114 @@
+"""Unit tests for client.py"""
+
+import threading
+
+import requests
+
+import reporule
+from reporule import executor, util
+from reporule.client import Client
+
+
+def test_client_exported():
+    """The client should be available from the reporule package."""
+    assert reporule.Client is Client
+
+
+def test_list_repos(mocker, repo_list):
+    """Each org should be listed once, no matter how many times it's requested."""
+    get_repo = mocker.patch("reporule.client._get_repo", return_value=repo_list)
+
+    with Client("a-token") as client:
+        first = client.list_repos(["starfleet", "borg"])
+        second = client.list_repos(["starfleet"])
+        assert first["starfleet"].result() == repo_list
+        assert second["starfleet"] is first["starfleet"]
+        assert first["borg"].result() == repo_list
+
+    assert sorted(call.args[0] for call in get_repo.call_args_list) == ["borg", "starfleet"]
+
+
+def test_get_rulesets_and_apply(mocker, ruleset_list):
+    """Applying a ruleset to a repo should clear that repo's cached rulesets."""
+    get_repo_rulesets = mocker.patch("reporule.client._get_repo_rulesets", return_value=ruleset_list)
+    response = requests.Response()
+    response.status_code = 201
+    create = mocker.patch("reporule.client._create_branch_ruleset", return_value=response)
+
+    with Client("a-token") as client:
+        rulesets = client.get_rulesets(["starfleet/enterprise", "starfleet/cerritos"])
+        assert {repo: f.result() for repo, f in rulesets.items()} == {
+            "starfleet/enterprise": ruleset_list,
+            "starfleet/cerritos": ruleset_list,
+        }
+
+        applied = client.apply_rulesets([({"name": "vulcan_ruleset"}, ["starfleet/enterprise"])])
+        assert applied[("starfleet/enterprise", "vulcan_ruleset")].result().status_code == 201
+        client.get_rulesets(["starfleet/enterprise", "starfleet/cerritos"])["starfleet/enterprise"].result()
+
+    create.assert_called_once()
+    # enterprise was fetched again after the ruleset was applied; cerritos came from the cache
+    assert [call.args[0] for call in get_repo_rulesets.call_args_list].count("starfleet/enterprise") == 2
+    assert [call.args[0] for call in get_repo_rulesets.call_args_list].count("starfleet/cerritos") == 1
+
+
+def test_get_ruleset_status(mocker, repo_list, ruleset_list):
+    """Ruleset status shouldn't tie up a worker while the repos are listed, or rescan cached rulesets."""
+    mocker.patch("reporule.core._get_repo_exceptions", return_value=set())
+    mocker.patch("reporule.client._get_repo", return_value=repo_list)
+    get_repo_rulesets = mocker.patch("reporule.client._get_repo_rulesets", return_value=ruleset_list)
+
+    # with a single worker, the status starts once the repo list is done, instead of waiting on it in the pool
+    with Client("a-token", max_workers=1) as client:
+        client.get_rulesets(["starfleet/enterprise"])["starfleet/enterprise"].result()
+        status = client.get_ruleset_status("starfleet", [{"name": "vulcan_ruleset"}]).result(timeout=5)
+        fetched = [call.args[0] for call in get_repo_rulesets.call_args_list]
+        # the rulesets fetched for the status are cached too
+        client.get_rulesets(fetched)
+        client.get_ruleset_status("starfleet", [{"name": "vulcan_ruleset"}]).result(timeout=5)
+
+    assert "starfleet/enterprise" in status["vulcan_ruleset"]["existing_ruleset"]
+    assert fetched.count("starfleet/enterprise") == 1
+    assert len(fetched) > 1
+    assert get_repo_rulesets.call_count == len(fetched)
+
+
+def test_get_ruleset_status_cancelled(mocker, repo_list, ruleset_list):
+    """A new call shouldn't un-cancel a call still in flight, but should start fresh once none are."""
+    mocker.patch("reporule.core._get_repo_exceptions", return_value=set())
+    listed = threading.Event()
+    mocker.patch("reporule.client._get_repo", side_effect=lambda *args: listed.wait(5) and repo_list)
+    mocker.patch("reporule.client._get_repo_rulesets", return_value=ruleset_list)
+
+    with Client("a-token") as client:
+        first = client.get_ruleset_status("starfleet", [{"name": "vulcan_ruleset"}])
+        client.cancel()
+        second = client.get_ruleset_status("starfleet", [{"name": "vulcan_ruleset"}])
+        assert client._cancelled.is_set()
+
+        listed.set()
+        first.result(timeout=5)
+        second.result(timeout=5)
+        status = client.get_ruleset_status("starfleet", [{"name": "vulcan_ruleset"}]).result(timeout=5)
+
+    assert status["vulcan_ruleset"]["existing_ruleset"]
+
+
+def test_get_ruleset_status_isolated(mocker, repo_list, ruleset_list):
+    """A client shouldn't un-cancel the run, or clear the run's caches."""
+    mocker.patch("reporule.core._get_repo_exceptions", return_value=set())
+    mocker.patch("reporule.client._get_repo", return_value=repo_list)
+    mocker.patch("reporule.client._get_repo_rulesets", return_value=ruleset_list)
+    util._RUN_CACHE["exceptions.yml"] = {}
+
+    executor.cancel()
+    try:
+        with Client("a-token") as client:
+            status = client.get_ruleset_status("starfleet", [{"name": "vulcan_ruleset"}]).result(timeout=5)
+        assert executor.cancelled()
+    finally:
+        executor.reset_cancellation()
+
+    # the run's cancellation didn't stop the client's scans
+    assert status["vulcan_ruleset"]["existing_ruleset"]
+    assert "exceptions.yml" in util._RUN_CACHE
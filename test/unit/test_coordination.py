@@ -0,0 +1,101 @@
+"""Unit tests for coordination.py"""
+
+import json
+import os
+
+import pytest
+
+from reporule.coordination import CoordinationBackend, FileCoordinationBackend
+
+
+def test_lock(tmp_path):
+    """Only one run should hold an org's lock at a time."""
+    backend = FileCoordinationBackend(tmp_path)
+    assert backend.acquire("starfleet", "run-1", wait=False)
+    assert not backend.acquire("starfleet", "run-2", wait=False)
+    assert not backend.acquire("starfleet", "run-2", wait=True, timeout=0)
+    # other orgs have their own lock
+    assert backend.acquire("borg", "run-2", wait=False)
+
+    # releasing another run's lock does nothing
+    backend.release("starfleet", "run-2")
+    assert not backend.acquire("starfleet", "run-3", wait=False)
+    backend.release("starfleet", "run-1")
+    assert backend.acquire("starfleet", "run-3", wait=False)
+
+
+def test_abandoned_lock(tmp_path):
+    """A lock left by a process that no longer exists should be replaced."""
+    backend = FileCoordinationBackend(tmp_path)
+    assert backend.acquire("starfleet", "run-1", wait=False)
+    lock_file = tmp_path / "starfleet.lock"
+    owner = json.loads(lock_file.read_text())
+    owner["pid"] = 2**22 + 1  # above the largest pid Linux hands out
+    owner["created_at"] = 0
+    lock_file.write_text(json.dumps(owner))
+
+    assert backend.acquire("starfleet", "run-2", wait=False)
+
+
+def test_claim(tmp_path):
+    """Items claimed by an active run should not be claimed by another until released."""
+    backend = FileCoordinationBackend(tmp_path)
+    assert backend.claim("starfleet", "run-1", ["enterprise#vulcan", "cerritos#vulcan"]) == {
+        "enterprise#vulcan",
+        "cerritos#vulcan",
+    }
+    assert backend.claim("starfleet", "run-2", ["cerritos#vulcan", "voyager#vulcan"]) == {"voyager#vulcan"}
+    # a run can claim its own items again
+    assert backend.claim("starfleet", "run-1", ["cerritos#vulcan"]) == {"cerritos#vulcan"}
+
+    backend.release("starfleet", "run-1")
+    assert backend.claim("starfleet", "run-2", ["cerritos#vulcan"]) == {"cerritos#vulcan"}
+
+
+def test_results(tmp_path):
+    """Saved results should be returned to later runs."""
+    backend = FileCoordinationBackend(tmp_path)
+    assert backend.load_results("starfleet") is None
+    backend.save_results("starfleet", {"rulesets": ["vulcan"]})
+    assert backend.load_results("starfleet") == {"rulesets": ["vulcan"]}
+
+
+def test_incomplete_backend():
+    """A backend that doesn't implement every method should fail when it's created."""
+
+    class LockOnlyBackend(CoordinationBackend):
+        def acquire(self, org, run_id, wait, timeout=0):
+            return True
+
+        def release(self, org, run_id):
+            pass
+
+    with pytest.raises(TypeError):
+        LockOnlyBackend()  # type: ignore
+
+
+def test_stale_claims_lock(mocker, tmp_path):
+    """A claims lock left by a crashed run should be removed once it's stale, instead of blocking forever."""
+    backend = FileCoordinationBackend(tmp_path)
+    claims_lock = tmp_path / "starfleet.claims.lock"
+    # a run that crashed after creating the lock, but before writing its owner
+    claims_lock.touch()
+
+    mocker.patch("reporule.coordination.MUTEX_TIMEOUT", 0)
+    with pytest.raises(TimeoutError, match="delete the file"):
+        backend.claim("starfleet", "run-1", ["enterprise#vulcan"])
+
+    os.utime(claims_lock, (0, 0))
+    assert backend.claim("starfleet", "run-1", ["enterprise#vulcan"]) == {"enterprise#vulcan"}
+    assert not claims_lock.exists()
+
+
+def test_unwritten_lock(tmp_path):
+    """An org lock file with no owner should only be replaced once it's stale."""
+    backend = FileCoordinationBackend(tmp_path)
+    lock_file = tmp_path / "starfleet.lock"
+    lock_file.touch()
+    assert not backend.acquire("starfleet", "run-1", wait=False)
+
+    os.utime(lock_file, (0, 0))
+    assert backend.acquire("starfleet", "run-1", wait=False)
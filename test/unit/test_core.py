@@ -3,7 +3,27 @@
 import pytest
 import requests
 
-from reporule.core import apply_branch_ruleset, get_ruleset_repo_status, list_repos
+from reporule.core import (
+    SystematicWriteError,
+    apply_branch_ruleset,
+    apply_branch_rulesets,
+    apply_branch_rulesets_pipelined,
+    build_audit_snapshot,
+    diff_audit_snapshots,
+    estimate_ruleset_requests,
+    get_repo_delta,
+    get_repo_details,
+    get_ruleset_ids,
+    get_ruleset_repo_status,
+    get_rulesets_repo_status,
+    list_repos,
+    merge_shard_results,
+    remove_branch_ruleset,
+    schedule_ruleset_writes,
+    simulate_branch_rulesets,
+    update_branch_ruleset,
+)
+from reporule.executor import RateLimiter
 from reporule.util import _load_branch_ruleset
 
 
@@ -27,6 +47,51 @@ def test_list_repos(repo_list):
     assert table.row_count == len(repo_list)
 
 
+def test_get_repo_details(mocker, mock_session, repo_list):
+    """Repo details should be fetched conditionally, reusing cached values that haven't changed."""
+    for repo in repo_list:
+        repo["default_branch"] = "main"
+    cache = {
+        "starfleet/enterprise": {
+            "rulesets": {
+                "url": "https://api.github.com/repos/starfleet/enterprise/rulesets?per_page=100",
+                "etag": "e1",
+                "value": "a",
+            }
+        }
+    }
+
+    def _rulesets_if_changed(repo, etag, session):
+        if etag == "e1":
+            return None, "e1"
+        return [{"name": "b"}, {"name": "a"}], "e2"
+
+    def _json_if_changed(url, etag, session):
+        return ([{"type": "deletion"}, {"type": "pull_request"}] if "enterprise" in url else []), "e3"
+
+    get_rulesets = mocker.patch("reporule.core._get_repo_rulesets_if_changed", side_effect=_rulesets_if_changed)
+    get_json = mocker.patch("reporule.core._get_json_if_changed", side_effect=_json_if_changed)
+    repo_list[1]["default_branch"] = "feature/warp#9"
+
+    details = get_repo_details(repo_list, ["rulesets", "default-branch", "visibility"], cache, mock_session)
+
+    # visibility comes from the repo listing
+    assert get_rulesets.call_count == len(repo_list)
+    assert get_json.call_count == len(repo_list)
+    assert details["starfleet/enterprise"] == {
+        "rulesets": "a",
+        "default-branch": "main (2 rules)",
+        "visibility": "public",
+    }
+    assert details["starfleet/cerritos"]["rulesets"] == "a, b"
+    assert details["starfleet/cerritos"]["default-branch"] == "feature/warp#9 (no rulesets)"
+    assert cache["starfleet/cerritos"]["default-branch"]["url"].endswith("/rules/branches/feature%2Fwarp%239")
+    assert cache["starfleet/cerritos"]["rulesets"]["etag"] == "e2"
+
+    table = list_repos("starfleet", repo_list, details)
+    assert len(table.columns) == 8
+
+
 def test_apply_branch_ruleset(default_branch_ruleset, mock_session):
     """Test apply_branch_ruleset function."""
     repo_list = ["starfleet/enterprise", "starfleet/cerritos", "starfleet/voyager"]
@@ -34,6 +99,99 @@ def test_apply_branch_ruleset(default_branch_ruleset, mock_session):
     assert rulesets_applied == 3
 
 
+def test_apply_branch_rulesets_fail_fast(mocker, monkeypatch, default_branch_ruleset, mock_session):
+    """Writes should stop when the first ones all fail with the same error."""
+    monkeypatch.setattr(RateLimiter, "enabled", False)
+    response = mocker.MagicMock(spec=requests.Response, ok=False, status_code=422)
+    response.json.return_value = {"message": "Validation Failed", "errors": ["Invalid rule 'merge_queue'"]}
+    create = mocker.patch("reporule.core._create_branch_ruleset", return_value=response)
+    repo_list = [f"starfleet/shuttle-{i}" for i in range(50)]
+
+    with pytest.raises(SystematicWriteError) as e:
+        apply_branch_rulesets([(default_branch_ruleset, repo_list)], mock_session)
+
+    assert e.value.signature == "422 Validation Failed; Invalid rule 'merge_queue'"
+    assert e.value.applied == {default_branch_ruleset["name"]: 0}
+    assert create.call_count < len(repo_list)
+
+
+def test_apply_branch_rulesets_non_json_error(mocker, monkeypatch, default_branch_ruleset, mock_session):
+    """A failed write whose body isn't JSON should be logged without stopping the count of other writes."""
+    monkeypatch.setattr(RateLimiter, "enabled", False)
+    ok = mocker.MagicMock(spec=requests.Response, ok=True, status_code=201)
+    bad_gateway = mocker.MagicMock(spec=requests.Response, ok=False, status_code=502, reason="Bad Gateway")
+    bad_gateway.json.side_effect = requests.JSONDecodeError("Expecting value", "<html>", 0)
+    bad_gateway.text = "<html>502 Bad Gateway</html>"
+    mocker.patch(
+        "reporule.core._create_branch_ruleset",
+        side_effect=lambda repo, ruleset, session: bad_gateway if repo == "starfleet/cerritos" else ok,
+    )
+    repo_list = ["starfleet/enterprise", "starfleet/cerritos", "starfleet/voyager"]
+
+    applied = apply_branch_rulesets([(default_branch_ruleset, repo_list)], mock_session)
+
+    assert applied == {default_branch_ruleset["name"]: 2}
+
+
+def test_apply_branch_rulesets_pipelined(mocker, monkeypatch, repo_list):
+    """Repos should be scanned and rulesets applied as the repo list's pages arrive."""
+    monkeypatch.setattr(RateLimiter, "enabled", False)
+    mocker.patch("reporule.core._get_repo_exceptions", return_value={"starfleet/cerritos"})
+    existing = {"starfleet/enterprise": ["vulcan_ruleset"]}
+    mocker.patch("reporule.core._get_branch_rulesets", side_effect=lambda repo, session: existing.get(repo, []))
+    response = mocker.MagicMock(spec=requests.Response, ok=True, status_code=201)
+    create = mocker.patch("reporule.core._create_branch_ruleset", return_value=response)
+    rulesets = [{"name": "vulcan_ruleset"}, {"name": "klingon_ruleset"}]
+
+    result = apply_branch_rulesets_pipelined("starfleet", [repo_list[:2], repo_list[2:]], rulesets)
+
+    # 5 repos, minus 1 archived and 1 exception
+    status = result.status
+    assert status["vulcan_ruleset"]["eligible_repos"] == {"starfleet/voyager", "starfleet/excelsior"}
+    assert status["vulcan_ruleset"]["existing_ruleset"] == {"starfleet/enterprise"}
+    assert status["klingon_ruleset"]["no_rulesets"] == {"starfleet/voyager", "starfleet/excelsior"}
+    assert status["klingon_ruleset"]["archived"] == {"starfleet/discovery"}
+    assert create.call_count == 5
+    assert result.applied == {"vulcan_ruleset": 2, "klingon_ruleset": 3}
+    assert result.deferred == {"vulcan_ruleset": [], "klingon_ruleset": []}
+    assert result.stopped_on_error is None
+
+    # a dry run finds the same repos without applying anything
+    result = apply_branch_rulesets_pipelined("starfleet", [repo_list], rulesets, dryrun=True)
+    assert create.call_count == 5
+    assert dict((r["name"], repos) for r, repos in result.ruleset_repos) == {
+        "vulcan_ruleset": ["starfleet/excelsior", "starfleet/voyager"],
+        "klingon_ruleset": ["starfleet/enterprise", "starfleet/excelsior", "starfleet/voyager"],
+    }
+
+
+def test_apply_branch_rulesets_pipelined_errors(mocker, monkeypatch, repo_list):
+    """Failed scans should be reported separately, and a failed repo list shouldn't lose the writes already made."""
+    monkeypatch.setattr(RateLimiter, "enabled", False)
+    mocker.patch("reporule.core._get_repo_exceptions", return_value=set())
+
+    def _branch_rulesets(repo, session):
+        if repo == "starfleet/cerritos":
+            raise requests.HTTPError("500 Server Error")
+        return []
+
+    mocker.patch("reporule.core._get_branch_rulesets", side_effect=_branch_rulesets)
+    response = mocker.MagicMock(spec=requests.Response, ok=True, status_code=201)
+    create = mocker.patch("reporule.core._create_branch_ruleset", return_value=response)
+
+    def _pages():
+        yield repo_list[:2]
+        raise requests.ConnectionError("connection reset")
+
+    result = apply_branch_rulesets_pipelined("starfleet", _pages(), [{"name": "vulcan_ruleset"}])
+
+    assert result.list_error == "connection reset"
+    assert result.status["vulcan_ruleset"]["failed"] == {"starfleet/cerritos"}
+    assert result.status["vulcan_ruleset"]["unscanned"] == set()
+    assert result.applied == {"vulcan_ruleset": 1}
+    create.assert_called_once()
+
+
 def test_get_ruleset_repo_status(mocker, repo_list):
     """Test get_ruleset_repo_status function when no existing rulesets and no exceptions."""
     mocker.patch("reporule.core._get_repo_exceptions", return_value=set())
@@ -71,3 +229,337 @@ def test_get_ruleset_repo_status_existing_rulesets(mocker, repo_list):
 
     eligible_repos = repo_status["eligible_repos"]
     assert len(eligible_repos) == 0
+
+
+def test_get_rulesets_repo_status(mocker, repo_list):
+    """Each repo's existing rulesets should be fetched once, no matter how many rulesets are checked."""
+    mocker.patch("reporule.core._get_repo_exceptions", return_value={"starfleet/cerritos", "starfleet/defiant"})
+    existing = {"starfleet/enterprise": ["vulcan_ruleset"], "starfleet/voyager": ["klingon_ruleset"]}
+    get_branch_rulesets = mocker.patch(
+        "reporule.core._get_branch_rulesets", side_effect=lambda repo, session: existing.get(repo, [])
+    )
+
+    rulesets = [{"name": "vulcan_ruleset"}, {"name": "klingon_ruleset"}]
+    status = get_rulesets_repo_status("starfleet", repo_list, rulesets)
+
+    # 5 repos, minus 1 archived and 1 exception
+    assert get_branch_rulesets.call_count == 3
+    assert status["vulcan_ruleset"]["eligible_repos"] == {"starfleet/voyager", "starfleet/excelsior"}
+    assert status["klingon_ruleset"]["eligible_repos"] == {"starfleet/enterprise", "starfleet/excelsior"}
+    # exceptions that aren't in the repo list (for example, in another shard) aren't reported
+    assert status["klingon_ruleset"]["exceptions"] == {"starfleet/cerritos"}
+
+
+def test_get_rulesets_repo_status_max_scans(mocker, repo_list):
+    """When scans are limited, the newest repos should be scanned and the rest reported as unscanned."""
+    mocker.patch("reporule.core._get_repo_exceptions", return_value=set())
+    get_branch_rulesets = mocker.patch("reporule.core._get_branch_rulesets", return_value=[])
+
+    status = get_rulesets_repo_status("starfleet", repo_list, [{"name": "vulcan_ruleset"}], max_scans=2)
+
+    newest = sorted((r for r in repo_list if not r["archived"]), key=lambda r: r["created_at"], reverse=True)
+    assert get_branch_rulesets.call_count == 2
+    assert status["vulcan_ruleset"]["eligible_repos"] == {r["full_name"] for r in newest[:2]}
+    assert status["vulcan_ruleset"]["no_rulesets"] == {r["full_name"] for r in newest[:2]}
+    assert status["vulcan_ruleset"]["unscanned"] == {r["full_name"] for r in newest[2:]}
+
+
+def test_get_rulesets_repo_status_timed_out(mocker, repo_list):
+    """Repos whose scans time out (for example, when cut short by the run deadline) should be reported as unscanned."""
+    mocker.patch("reporule.core._get_repo_exceptions", return_value=set())
+
+    def _branch_rulesets(repo, session):
+        if repo == "starfleet/voyager":
+            raise requests.Timeout("read timed out")
+        return []
+
+    mocker.patch("reporule.core._get_branch_rulesets", side_effect=_branch_rulesets)
+
+    status = get_rulesets_repo_status("starfleet", repo_list, [{"name": "vulcan_ruleset"}])
+    assert status["vulcan_ruleset"]["unscanned"] == {"starfleet/voyager"}
+    assert "starfleet/voyager" not in status["vulcan_ruleset"]["eligible_repos"]
+
+
+def test_get_rulesets_repo_status_inherited_ruleset(mocker, repo_list):
+    """A repo that inherits a ruleset with the same name from the org already has the ruleset."""
+    mocker.patch("reporule.core._get_repo_exceptions", return_value=set())
+    response = mocker.MagicMock(spec=requests.Response, status_code=200, links={})
+    response.json.return_value = [{"id": 1, "name": "vulcan_ruleset", "source_type": "Organization"}]
+    session = mocker.MagicMock(spec=requests.Session)
+    session.get.return_value = response
+
+    status = get_rulesets_repo_status("starfleet", repo_list, [{"name": "vulcan_ruleset"}], session)
+    active_repos = {r["full_name"] for r in repo_list if not r["archived"]}
+    assert status["vulcan_ruleset"]["eligible_repos"] == set()
+    assert status["vulcan_ruleset"]["existing_ruleset"] == active_repos
+    assert "includes_parents" not in session.get.call_args.kwargs["params"]
+
+
+def test_get_rulesets_repo_status_deadline(mocker, repo_list):
+    """Repos whose scans haven't started by the deadline should be reported as unscanned."""
+    mocker.patch("reporule.core._get_repo_exceptions", return_value=set())
+    get_branch_rulesets = mocker.patch("reporule.core._get_branch_rulesets", return_value=[])
+
+    status = get_rulesets_repo_status("starfleet", repo_list, [{"name": "vulcan_ruleset"}], deadline=0)
+    get_branch_rulesets.assert_not_called()
+    assert status["vulcan_ruleset"]["unscanned"] == {r["full_name"] for r in repo_list if not r["archived"]}
+    assert status["vulcan_ruleset"]["eligible_repos"] == set()
+
+
+def test_get_rulesets_repo_status_no_admin(mocker, repo_list):
+    """Repos the token can't administer should be reported separately, without fetching their rulesets."""
+    mocker.patch("reporule.core._get_repo_exceptions", return_value=set())
+    get_branch_rulesets = mocker.patch("reporule.core._get_branch_rulesets", return_value=[])
+    repo_list[0]["permissions"] = {"admin": False, "push": True, "pull": True}
+    repo_list[1]["permissions"] = {"admin": True, "push": True, "pull": True}
+
+    status = get_rulesets_repo_status("starfleet", repo_list, [{"name": "vulcan_ruleset"}])
+
+    # 5 repos, minus 1 archived and 1 without admin access
+    assert status["vulcan_ruleset"]["no_admin"] == {"starfleet/enterprise"}
+    assert "starfleet/enterprise" not in status["vulcan_ruleset"]["eligible_repos"]
+    assert get_branch_rulesets.call_count == 3
+    assert estimate_ruleset_requests("starfleet", repo_list, 1)["scan"] == 3
+
+
+def test_estimate_ruleset_requests(mocker, repo_list):
+    """Archived repos and exceptions aren't scanned, and each scanned repo could need every ruleset."""
+    mocker.patch("reporule.core._get_repo_exceptions", return_value={"starfleet/cerritos"})
+    estimate = estimate_ruleset_requests("starfleet", repo_list, 2)
+    assert estimate == {"list": 2, "scan": 3, "apply": 6}
+
+
+def test_schedule_ruleset_writes():
+    """Repos with no rulesets should be scheduled first, then repos missing the most rulesets."""
+    rulesets = [{"name": "vulcan_ruleset"}, {"name": "klingon_ruleset"}]
+    ruleset_status = {
+        "vulcan_ruleset": {
+            "eligible_repos": {"starfleet/enterprise", "starfleet/voyager", "starfleet/cerritos"},
+            "no_rulesets": {"starfleet/cerritos"},
+        },
+        "klingon_ruleset": {
+            "eligible_repos": {"starfleet/voyager", "starfleet/cerritos"},
+            "no_rulesets": {"starfleet/cerritos"},
+        },
+    }
+
+    ruleset_repos, deferred = schedule_ruleset_writes(ruleset_status, rulesets, limit=3)
+    assert ruleset_repos == [
+        (rulesets[0], ["starfleet/cerritos", "starfleet/voyager"]),
+        (rulesets[1], ["starfleet/cerritos"]),
+    ]
+    assert deferred == {"vulcan_ruleset": ["starfleet/enterprise"], "klingon_ruleset": ["starfleet/voyager"]}
+
+    # without a limit, everything is scheduled
+    ruleset_repos, deferred = schedule_ruleset_writes(ruleset_status, rulesets)
+    assert sum(len(repos) for _, repos in ruleset_repos) == 5
+    assert deferred == {"vulcan_ruleset": [], "klingon_ruleset": []}
+
+
+@pytest.mark.parametrize(
+    "source,events",
+    [
+        (
+            "events",
+            [
+                {
+                    "type": "CreateEvent",
+                    "repo": {"name": "starfleet/enterprise"},
+                    "payload": {"ref_type": "repository"},
+                },
+                {"type": "CreateEvent", "repo": {"name": "starfleet/cerritos"}, "payload": {"ref_type": "branch"}},
+                {"type": "PublicEvent", "repo": {"name": "starfleet/voyager"}},
+                {"type": "PushEvent", "repo": {"name": "starfleet/excelsior"}},
+            ],
+        ),
+        (
+            "audit-log",
+            [
+                {"action": "repo.create", "repo": "starfleet/enterprise"},
+                {"action": "repo.archived", "repo": "starfleet/cerritos"},
+                {"action": "repo.unarchived", "repo": "starfleet/voyager"},
+                {"action": "repo.transfer", "repo": "borg/cube"},
+            ],
+        ),
+    ],
+)
+def test_get_repo_delta(source, events):
+    """Only events that add a repo to the org should be part of the delta."""
+    repo_delta = get_repo_delta("starfleet", events, source)
+    assert repo_delta == {"starfleet/enterprise", "starfleet/voyager"}
+
+
+def test_get_ruleset_ids(mocker, mock_session, ruleset_list):
+    """Only repos that have a ruleset with the requested name should be returned."""
+    repo_rulesets = {"starfleet/enterprise": ruleset_list, "starfleet/cerritos": ruleset_list[1:]}
+    get_rulesets = mocker.patch(
+        "reporule.core._get_repo_rulesets", side_effect=lambda repo, session, includes_parents: repo_rulesets[repo]
+    )
+
+    ruleset_ids = get_ruleset_ids(list(repo_rulesets), "default-branch-protections", mock_session)
+    assert ruleset_ids == {"starfleet/enterprise": 123}
+    # inherited rulesets can't be removed or updated through the repo
+    assert all(c.kwargs["includes_parents"] is False for c in get_rulesets.call_args_list)
+
+
+def test_remove_branch_ruleset(mock_session):
+    """Test remove_branch_ruleset function."""
+    ruleset_ids = {"starfleet/enterprise": 123, "starfleet/cerritos": 456}
+    rulesets_removed = remove_branch_ruleset(ruleset_ids, mock_session)
+    assert rulesets_removed == 2
+
+    called_urls = {c.args[0] for c in mock_session.delete.call_args_list}
+    assert called_urls == {
+        "https://api.github.com/repos/starfleet/enterprise/rulesets/123",
+        "https://api.github.com/repos/starfleet/cerritos/rulesets/456",
+    }
+
+
+def test_update_branch_ruleset(default_branch_ruleset, mock_session):
+    """Test update_branch_ruleset function."""
+    rulesets_updated = update_branch_ruleset({"starfleet/enterprise": 123}, default_branch_ruleset, mock_session)
+    assert rulesets_updated == 1
+    mock_session.put.assert_called_once_with(
+        "https://api.github.com/repos/starfleet/enterprise/rulesets/123", json=default_branch_ruleset
+    )
+
+
+def test_merge_shard_results():
+    """Shard results should be summed, and missing shards reported."""
+    results = [
+        {
+            "command": "ruleset",
+            "org": "starfleet",
+            "shard": f"{i}/3",
+            "rulesets": {"vulcan_ruleset": {"eligible": ["a", "b"], "skipped": ["c"], "applied": 2}},
+        }
+        for i in [1, 3]
+    ]
+    summary = merge_shard_results(results)
+
+    assert summary["missing_shards"] == ["2/3"]
+    assert summary["rulesets"] == {"vulcan_ruleset": {"eligible": 4, "skipped": 2, "applied": 4}}
+    assert summary["total_applied"] == 4
+
+
+@pytest.mark.parametrize(
+    "second_result",
+    [
+        {"command": "list", "org": "borg", "shard": "2/2", "repos": []},
+        {"command": "list", "org": "starfleet", "shard": "1/2", "repos": []},
+        {"command": "list", "org": "starfleet", "shard": "2/2", "repos": [], "dryrun": True},
+    ],
+)
+def test_merge_shard_results_mismatch(second_result):
+    """Results from different orgs, repeated shards, or a mix of dry runs and real runs can't be merged."""
+    results = [{"command": "list", "org": "starfleet", "shard": "1/2", "repos": [], "dryrun": False}, second_result]
+    with pytest.raises(ValueError):
+        merge_shard_results(results)
+
+
+def test_build_audit_snapshot(mocker, mock_session, repo_list):
+    """Repos with unchanged rulesets should keep the rulesets from the previous snapshot."""
+    mocker.patch("reporule.core._get_repo", return_value=repo_list)
+    enterprise_url = "https://api.github.com/repos/starfleet/enterprise/rulesets?per_page=100"
+    previous = {
+        "orgs": {
+            "starfleet": {
+                "starfleet/enterprise": {"archived": False, "rulesets": ["a"], "etag": "e1", "url": enterprise_url},
+                # an ETag saved for another URL (before the request parameters changed) isn't sent
+                "starfleet/cerritos": {"archived": False, "rulesets": ["a"], "etag": "e1"},
+            }
+        }
+    }
+
+    def _rulesets_if_changed(repo, etag, session):
+        if etag == "e1":
+            return None, "e1"
+        return [{"name": "b"}], "e2"
+
+    get_rulesets = mocker.patch("reporule.core._get_repo_rulesets_if_changed", side_effect=_rulesets_if_changed)
+
+    snapshot = build_audit_snapshot(["starfleet"], previous, mock_session)
+    repos = snapshot["orgs"]["starfleet"]
+
+    # the archived repo isn't checked
+    assert get_rulesets.call_count == 4
+    assert repos["starfleet/enterprise"] == {"archived": False, "rulesets": ["a"], "etag": "e1", "url": enterprise_url}
+    assert repos["starfleet/cerritos"]["rulesets"] == ["b"]
+    assert repos["starfleet/voyager"]["rulesets"] == ["b"]
+    assert repos["starfleet/voyager"]["etag"] == "e2"
+    assert repos["starfleet/discovery"]["archived"] is True
+
+
+def test_build_audit_snapshot_inherited_ruleset(mocker, repo_list):
+    """A ruleset inherited from the org should count as compliant, as it does for ruleset apply."""
+    mocker.patch("reporule.core._get_repo", return_value=repo_list)
+    mocker.patch("reporule.core._get_repo_exceptions", return_value=set())
+    response = mocker.MagicMock(spec=requests.Response, status_code=200, headers={"ETag": "e1"}, links={})
+    response.json.return_value = [{"id": 1, "name": "vulcan_ruleset", "source_type": "Organization"}]
+    session = mocker.MagicMock(spec=requests.Session)
+    session.get.return_value = response
+
+    snapshot = build_audit_snapshot(["starfleet"], {}, session)
+    assert "includes_parents" not in session.get.call_args.kwargs["params"]
+    delta = diff_audit_snapshots({}, snapshot, ["vulcan_ruleset"])
+    assert delta["non_compliant"] == {"vulcan_ruleset": set()}
+
+
+def test_diff_audit_snapshots(mocker):
+    """The diff should report new and archived repos, and repos that lost or gained a ruleset."""
+    mocker.patch("reporule.core._get_repo_exceptions", return_value={"starfleet/excelsior"})
+    previous = {
+        "orgs": {
+            "starfleet": {
+                "starfleet/enterprise": {"archived": False, "rulesets": ["a"]},
+                "starfleet/cerritos": {"archived": False, "rulesets": []},
+                "starfleet/discovery": {"archived": False, "rulesets": ["a"]},
+                "starfleet/excelsior": {"archived": False, "rulesets": ["a"]},
+            }
+        }
+    }
+    current = {
+        "orgs": {
+            "starfleet": {
+                "starfleet/enterprise": {"archived": False, "rulesets": []},
+                "starfleet/cerritos": {"archived": False, "rulesets": ["a"]},
+                "starfleet/discovery": {"archived": True, "rulesets": ["a"]},
+                "starfleet/excelsior": {"archived": False, "rulesets": []},
+                "starfleet/voyager": {"archived": False, "rulesets": []},
+            }
+        }
+    }
+    delta = diff_audit_snapshots(previous, current, ["a"])
+
+    assert delta["new_repos"] == {"starfleet/voyager"}
+    assert delta["archived_repos"] == {"starfleet/discovery"}
+    assert delta["removed_repos"] == set()
+    assert delta["non_compliant"] == {"a": {"starfleet/enterprise", "starfleet/voyager"}}
+    assert delta["covered"] == {"a": {"starfleet/cerritos"}}
+
+
+def test_simulate_branch_rulesets(mocker, mock_session, repo_list):
+    """Branch pages should be fetched once per repo, and reused from the cache by later simulations."""
+    for repo in repo_list:
+        repo["default_branch"] = "main"
+    pages = {1: (["main", "release/1.0"], 3), 2: (["release/2.0", "feature-x"], 3), 3: (["release/3.0"], 3)}
+    get_page = mocker.patch("reporule.core._get_branch_page", side_effect=lambda repo, page, session: pages[page])
+    rulesets = [
+        {"name": "default", "conditions": {"ref_name": {"include": ["~DEFAULT_BRANCH"], "exclude": []}}},
+        {"name": "release", "conditions": {"ref_name": {"include": ["release/*"], "exclude": ["release/1.0"]}}},
+    ]
+    cache: dict = {}
+
+    results = simulate_branch_rulesets(repo_list, rulesets, cache, mock_session)
+    assert get_page.call_count == 3 * len(repo_list)
+    assert results["starfleet/voyager"] == {"branches": 5, "matched": {"default": 1, "release": 2}}
+    assert cache["starfleet/voyager"]["branches"] == ["main", "release/1.0", "release/2.0", "feature-x", "release/3.0"]
+
+    # an edited ruleset is simulated against the cached branches
+    rulesets[1]["conditions"]["ref_name"]["exclude"] = []
+    results = simulate_branch_rulesets(repo_list, rulesets, cache, mock_session)
+    assert get_page.call_count == 3 * len(repo_list)
+    assert results["starfleet/voyager"]["matched"]["release"] == 3
+
+    simulate_branch_rulesets(repo_list, rulesets, cache, mock_session, refresh=True)
+    assert get_page.call_count == 6 * len(repo_list)
@@ -0,0 +1,114 @@
+"""Unit tests for executor.py"""
+
+import time
+
+from reporule import executor
+from reporule.executor import FailFast, RateLimiter, run_concurrently, run_pipeline
+
+
+def test_run_concurrently():
+    """Every item should map to the function's return value or the exception it raised."""
+
+    def _square(x):
+        if x == 3:
+            raise ValueError("no threes")
+        return x * x
+
+    results = run_concurrently(_square, [1, 2, 3, 4], max_workers=2)
+    assert {k: v for k, v in results.items() if k != 3} == {1: 1, 2: 4, 4: 16}
+    assert isinstance(results[3], ValueError)
+
+
+def test_rate_limiter():
+    """Requests that share a rate limiter should be spaced out."""
+    rate_limiter = RateLimiter(requests_per_second=20)
+    start = time.monotonic()
+    run_concurrently(lambda x: x, range(5), max_workers=5, rate_limiter=rate_limiter)
+    # the first request starts immediately, the other four wait 1/20 second each
+    assert time.monotonic() - start >= 0.2
+
+
+def test_run_concurrently_deadline():
+    """Items that haven't started by the deadline should be left out of the results."""
+    rate_limiter = RateLimiter(requests_per_second=20)
+    results = run_concurrently(
+        lambda x: x, range(10), max_workers=1, rate_limiter=rate_limiter, deadline=time.monotonic() + 0.12
+    )
+    assert 0 < len(results) < 10
+    assert all(results[item] == item for item in results)
+
+
+def test_run_concurrently_run_deadline():
+    """No calls should start after the run deadline."""
+    executor.set_run_deadline(0)
+    try:
+        assert run_concurrently(lambda x: x, range(5)) == {}
+    finally:
+        executor.set_run_deadline(None)
+
+
+def test_run_concurrently_interrupted():
+    """An interrupt should cancel the run, returning the results of the calls that finished."""
+
+    def _call(x):
+        if x == 0:
+            raise KeyboardInterrupt
+        time.sleep(0.05)
+        return x
+
+    try:
+        results = run_concurrently(_call, range(10), max_workers=2)
+        assert executor.cancelled()
+        assert 0 not in results
+        assert len(results) < 9
+        assert all(results[item] == item for item in results)
+        # later calls don't start either
+        assert run_concurrently(lambda x: x, range(5)) == {}
+    finally:
+        executor.start_run()
+    # the next run isn't affected by the cancellation
+    assert run_concurrently(lambda x: x, range(5)) == {x: x for x in range(5)}
+
+
+def test_fail_fast():
+    """FailFast should trip on repeated identical failures, but not once a call has succeeded."""
+    fail_fast = FailFast(threshold=3)
+    for signature in ["422 Validation Failed", "403 Forbidden", "422 Validation Failed"]:
+        fail_fast.record(signature)
+    assert not fail_fast.tripped()
+    fail_fast.record("422 Validation Failed")
+    assert fail_fast.tripped()
+    assert fail_fast.signature == "422 Validation Failed"
+
+    fail_fast = FailFast(threshold=3)
+    fail_fast.record(None)
+    for _ in range(5):
+        fail_fast.record("403 Forbidden")
+    assert not fail_fast.tripped()
+
+
+def test_run_pipeline():
+    """Items should flow through every stage, with later stages starting before the source is exhausted."""
+    events = []
+
+    def _source():
+        for page in range(3):
+            events.append(f"page {page}")
+            # a slow paginated listing
+            time.sleep(0.05)
+            yield from (page * 10 + i for i in range(2))
+
+    def _scan(x):
+        if x == 11:
+            raise ValueError("unreadable")
+        return [x] if x % 2 == 0 else []
+
+    def _apply(x):
+        events.append(f"applied {x}")
+        return []
+
+    run_pipeline(_source(), [(_scan, 2, None), (_apply, 1, None)], queue_size=1)
+
+    assert sorted(e for e in events if e.startswith("applied")) == ["applied 0", "applied 10", "applied 20"]
+    # the first write happened while the later pages were still being listed
+    assert events.index("applied 0") < events.index("page 2")
@@ -0,0 +1,100 @@
+"""Unit tests for logging.py"""
+
+import io
+import json
+import threading
+
+import pytest
+import structlog
+
+from reporule import logging as reporule_logging
+from reporule.logging import DebugEventRateLimiter, LazyField, QueueLogger, resolve_lazy_fields, setup_logging
+
+
+def test_resolve_lazy_fields():
+    """Lazy fields should be replaced by the value of their function."""
+    event_dict = resolve_lazy_fields(None, "debug", {"event": "test", "payload": LazyField(lambda: {"id": 1})})
+    assert event_dict == {"event": "test", "payload": {"id": 1}}
+
+
+def test_lazy_fields_not_computed_below_log_level():
+    """A lazy field's function should not be called if the event is filtered out."""
+    calls = []
+    logger = structlog.wrap_logger(
+        structlog.ReturnLogger(),
+        processors=[resolve_lazy_fields, structlog.processors.JSONRenderer()],
+        wrapper_class=structlog.make_filtering_bound_logger("INFO"),
+    )
+    logger.debug("test", payload=LazyField(lambda: calls.append(1)))
+    assert calls == []
+    logger.info("test", payload=LazyField(lambda: calls.append(1)))
+    assert calls == [1]
+
+
+def test_debug_event_rate_limiter():
+    """Debug events beyond the limit should be dropped, and the number dropped reported on the next one."""
+    rate_limiter = DebugEventRateLimiter(events_per_second=2)
+    logged = 0
+    for _ in range(5):
+        try:
+            rate_limiter(None, "debug", {"event": "per repo"})
+            logged += 1
+        except structlog.DropEvent:
+            pass
+    assert logged == 2
+
+    # other levels aren't limited
+    assert rate_limiter(None, "info", {"event": "per repo"}) == {"event": "per repo"}
+
+    # the next window reports the dropped events
+    rate_limiter._windows["per repo"] = (-1, 2, 3)
+    assert rate_limiter(None, "debug", {"event": "per repo"}) == {"event": "per repo", "suppressed": 3}
+
+
+@pytest.mark.parametrize("count", [1, 100])
+def test_queue_logger(count):
+    """Events should be written as JSON lines by the background thread."""
+    file = io.StringIO()
+    queue_logger = QueueLogger(file)
+    for i in range(count):
+        queue_logger.info(event="test", i=i)
+    queue_logger.close()
+
+    lines = file.getvalue().splitlines()
+    assert [json.loads(line)["i"] for line in lines] == list(range(count))
+
+
+def test_queue_logger_order():
+    """Events should be rendered when they're logged, and main thread events written after the queued ones."""
+    file = io.StringIO()
+    queue_logger = QueueLogger(file)
+    repos = ["enterprise"]
+
+    def _log_from_worker():
+        queue_logger.info(event="worker", repos=repos)
+
+    worker = threading.Thread(target=_log_from_worker)
+    worker.start()
+    worker.join()
+    repos.append("cerritos")
+    queue_logger.info(event="main")
+    # the main thread's event was written right away
+    lines = [json.loads(line) for line in file.getvalue().splitlines()]
+    queue_logger.close()
+
+    assert [line["event"] for line in lines] == ["worker", "main"]
+    assert lines[0]["repos"] == ["enterprise"]
+
+
+def test_setup_logging_invalid_debug_events_per_second(monkeypatch):
+    """An invalid debug event limit should fall back to the default instead of failing."""
+    monkeypatch.setenv("LOG_DEBUG_EVENTS_PER_SECOND", "lots")
+    monkeypatch.setattr(reporule_logging, "_QUEUE_LOGGER", None)
+    try:
+        setup_logging()
+        processors = structlog.get_config()["processors"]
+        assert processors[0].events_per_second == reporule_logging.DEBUG_EVENTS_PER_SECOND
+    finally:
+        if reporule_logging._QUEUE_LOGGER is not None:
+            reporule_logging._QUEUE_LOGGER.close()
+        structlog.reset_defaults()
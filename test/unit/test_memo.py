@@ -0,0 +1,117 @@
+"""Unit tests for memo.py"""
+
+import threading
+import time
+
+import pytest
+import requests
+
+from reporule import memo
+from reporule.util import _get_rate_limit, _get_repo_rulesets, _get_session, _verify_org_or_user
+
+
+@pytest.fixture
+def github_send(mocker):
+    """Mock GitHub API responses, counting the requests that reach the network."""
+
+    def _send(request, *args, **kwargs):
+        # give concurrent identical requests time to pile up
+        time.sleep(0.05)
+        response = requests.Response()
+        response.status_code = 201 if request.method == "POST" else 200
+        response._content = b'{"resources": {"core": {"remaining": 1}}}' if "rate_limit" in request.url else b"[]"
+        response.headers["content-type"] = "application/json; charset=utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    return mocker.patch("reporule.retry.GitHubAdapter.send", side_effect=_send)
+
+
+@pytest.fixture
+def response_cache():
+    memo.start()
+    yield memo.CACHE
+    memo.stop()
+
+
+def test_memoized_responses(github_send, response_cache):
+    """Repeated GETs should be answered from the cache, except for the live rate limit."""
+    session = _get_session("a-token")
+    for _ in range(3):
+        assert _get_repo_rulesets("starfleet/voyager", session=session) == []
+        _get_rate_limit(session)
+
+    assert github_send.call_count == 4
+    assert response_cache.stats() == {"hits": 2, "coalesced": 0, "misses": 1}
+
+
+def test_org_lookup_memoized(github_send, response_cache):
+    """An org looked up by several steps of a run should only be requested once."""
+    for _ in range(3):
+        assert _verify_org_or_user("starfleet", _get_session("a-token")) == "org"
+
+    assert github_send.call_count == 1
+
+
+def test_write_invalidates_responses(github_send, response_cache):
+    """A write to a repo should discard its cached responses, but not those of other repos."""
+    session = _get_session("a-token")
+    _get_repo_rulesets("starfleet/voyager", session=session)
+    _get_repo_rulesets("starfleet/enterprise", session=session)
+    session.post("https://api.github.com/repos/starfleet/voyager/rulesets", json={"name": "vulcan_ruleset"})
+    _get_repo_rulesets("starfleet/voyager", session=session)
+    _get_repo_rulesets("starfleet/enterprise", session=session)
+
+    assert github_send.call_count == 4
+    assert response_cache.stats() == {"hits": 1, "coalesced": 0, "misses": 3}
+
+
+def test_concurrent_requests_coalesced(github_send):
+    """Identical GETs in flight at the same time should share one request, even without memoization."""
+    session = _get_session("a-token")
+    threads = [threading.Thread(target=_get_repo_rulesets, args=("starfleet/voyager", session)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert github_send.call_count == 1
+    cache = session.get_adapter("https://api.github.com").cache
+    assert cache.stats() == {"hits": 0, "coalesced": 4, "misses": 1}
+    # without memoization, a later request is sent again
+    _get_repo_rulesets("starfleet/voyager", session)
+    assert github_send.call_count == 2
+
+
+def test_rate_limited_request_with_token_pool(mocker, response_cache):
+    """A rate-limited GET should be re-sent with another token, and cache hits shouldn't reset its budget."""
+
+    def _send(adapter, request, *args, **kwargs):
+        limited = request.headers["Authorization"] == "Bearer token-a"
+        response = requests.Response()
+        response.status_code = 403 if limited else 200
+        response.headers["x-ratelimit-remaining"] = "0" if limited else "4000"
+        response.headers["x-ratelimit-reset"] = str(int(time.time()) + 600)
+        response._content = b"[]"
+        response.url = request.url
+        response.request = request
+        response.connection = adapter
+        return response
+
+    send = mocker.patch("reporule.retry.GitHubAdapter.send", autospec=True, side_effect=_send)
+    session = _get_session(["token-a", "token-b"])
+
+    assert _get_repo_rulesets("starfleet/voyager", session=session) == []
+    assert send.call_count == 2
+    assert session.auth.budget()[1][1] == 4000
+
+    # the re-sent request isn't cached, so the next request (now made with token-b) is sent
+    _get_repo_rulesets("starfleet/voyager", session=session)
+    assert send.call_count == 3
+
+    # the cached response's rate limit header is out of date, so it isn't recorded
+    assert _get_repo_rulesets("starfleet/voyager", session=session) == []
+    assert send.call_count == 3
+    assert response_cache.stats()["hits"] == 1
+    assert session.auth.budget()[1][1] < 4000
@@ -0,0 +1,49 @@
+"""Unit tests for profiling.py"""
+
+import json
+import pstats
+import time
+
+from reporule import profiling
+from reporule.executor import run_concurrently
+
+
+@profiling.profiled
+def _scan(repos):
+    return run_concurrently(lambda repo: time.sleep(0.02) or repo.upper(), repos, max_workers=2)
+
+
+@profiling.profiled
+def _outer():
+    return _scan(["a"])
+
+
+def test_profiled_without_profiling():
+    """Profiled functions should behave normally when profiling is off."""
+    assert _scan(["a", "b"]) == {"a": "A", "b": "B"}
+
+
+def test_profiled(tmp_path):
+    """Each profiled call should write CPU, stack sample, and memory profiles, plus a summary."""
+    profiling.start(tmp_path)
+    try:
+        assert _scan(["a", "b", "c"]) == {"a": "A", "b": "B", "c": "C"}
+        _scan(["d"])
+        # nested phases are part of the outer phase
+        _outer()
+    finally:
+        profiling.stop()
+
+    assert profiling.PROFILE_DIR is None
+    for name in ["_scan", "_scan.2", "_outer"]:
+        assert pstats.Stats(str(tmp_path / f"{name}.prof")).total_calls > 0
+        assert (tmp_path / f"{name}.memory.txt").read_text().startswith("peak:")
+        assert (tmp_path / f"{name}.folded").exists()
+    assert not (tmp_path / "_scan.3.prof").exists()
+
+    # the stack samples include the worker threads
+    assert "<lambda> (test_profiling.py" in (tmp_path / "_scan.folded").read_text()
+
+    summary = json.loads((tmp_path / "summary.json").read_text())
+    assert [call["file_prefix"] for call in summary["_scan"]] == ["_scan", "_scan.2"]
+    assert summary["_outer"][0]["wall_seconds"] > 0
@@ -0,0 +1,54 @@
+"""Unit tests for progress.py"""
+
+import requests
+
+from reporule import progress
+from reporule.executor import run_concurrently
+
+
+def test_progress_tracker_snapshot():
+    """A snapshot should report each phase's progress, rate, and ETA."""
+    tracker = progress.ProgressTracker(live=False)
+    tracker.start_phase("scanning", total=10)
+    tracker.advance("scanning", 4)
+    tracker.start_phase("listing")
+    tracker.advance("listing", 100)
+    tracker.finish_phase("listing")
+
+    snapshot = tracker.snapshot()
+    scanning, listing = snapshot["phases"]
+    assert scanning["phase"] == "scanning"
+    assert (scanning["completed"], scanning["total"], scanning["done"]) == (4, 10, False)
+    assert scanning["rate"] > 0
+    assert scanning["eta"] is not None
+    assert (listing["completed"], listing["total"], listing["done"], listing["eta"]) == (100, None, True, None)
+
+
+def test_track():
+    """Functions called while tracking should advance the phases, count retries, and record the rate limit."""
+    response = requests.Response()
+    response.headers["x-ratelimit-remaining"] = "4321"
+
+    with progress.track(live=False) as tracker:
+        progress.start_phase("applying", total=3)
+        run_concurrently(lambda x: x, range(3), phase="applying")
+        progress.record_retry()
+        progress.record_response(response)
+        snapshot = tracker.snapshot()
+
+    assert progress.TRACKER is None
+    assert snapshot["phases"][0]["completed"] == 3
+    assert snapshot["phases"][0]["done"] is True
+    assert snapshot["in_flight"] == 0
+    assert snapshot["retries"] == 1
+    assert snapshot["rate_limit_remaining"] == 4321
+
+
+def test_progress_functions_without_tracker():
+    """Progress functions should do nothing when no command is tracking progress."""
+    progress.start_phase("scanning", total=1)
+    progress.advance("scanning")
+    progress.record_retry()
+    with progress.in_flight():
+        pass
+    assert progress.TRACKER is None
@@ -0,0 +1,38 @@
+"""Unit tests for refnames.py"""
+
+import pytest
+
+from reporule.refnames import RefNameMatcher
+
+BRANCHES = ["main", "develop", "release/1.0", "release/2.0/hotfix", "feature-x", "feature/y", "v1", "v22"]
+
+
+@pytest.mark.parametrize(
+    "ref_name, expected",
+    [
+        ({"include": ["~DEFAULT_BRANCH"], "exclude": []}, ["main"]),
+        # * doesn't match /
+        ({"include": ["~ALL"], "exclude": ["refs/heads/feature*"]}, [b for b in BRANCHES if b != "feature-x"]),
+        ({"include": ["refs/heads/release/*"]}, ["release/1.0"]),
+        ({"include": ["release/**"]}, ["release/1.0", "release/2.0/hotfix"]),
+        # **/ matches zero or more directories
+        ({"include": ["release/**/*"]}, ["release/1.0", "release/2.0/hotfix"]),
+        ({"include": ["**/*"]}, BRANCHES),
+        ({"include": ["**/hotfix"]}, ["release/2.0/hotfix"]),
+        ({"include": ["v?", "develop"]}, ["develop", "v1"]),
+        ({"include": ["feature[-/]*"], "exclude": ["**[!x]"]}, ["feature-x"]),
+        ({"include": []}, []),
+    ],
+)
+def test_ref_name_matcher(ref_name, expected):
+    """Branches should be matched like GitHub matches a ruleset's ref_name conditions."""
+    matcher = RefNameMatcher(ref_name)
+    assert [b for b in BRANCHES if matcher.matches(b, "main")] == expected
+    assert matcher.count(BRANCHES, "main") == len(expected)
+
+
+def test_ref_name_matcher_default_branch():
+    """~DEFAULT_BRANCH should match each repository's own default branch."""
+    matcher = RefNameMatcher({"include": ["~DEFAULT_BRANCH", "release/*"], "exclude": ["~DEFAULT_BRANCH"]})
+    assert matcher.count(BRANCHES, "main") == 1
+    assert matcher.count(BRANCHES, "release/1.0") == 0
@@ -0,0 +1,165 @@
+"""Unit tests for retry.py"""
+
+import time
+
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError
+
+from reporule import executor
+from reporule.retry import (
+    CONNECT_TIMEOUT,
+    READ_TIMEOUT,
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceededError,
+    GitHubAdapter,
+    GitHubRetry,
+    _decorrelated_jitter,
+    _get_rate_limit_wait,
+    post_with_verification,
+)
+
+
+@pytest.fixture
+def no_sleep(mocker):
+    """Don't wait between retries."""
+    return mocker.patch("reporule.retry.time.sleep")
+
+
+def test__decorrelated_jitter():
+    """Backoff waits should be random, but stay between the base and the cap."""
+    waits = [_decorrelated_jitter(4, 1, 10) for _ in range(100)]
+    assert all(1 <= w <= 10 for w in waits)
+    assert len(set(waits)) > 1
+
+
+@pytest.mark.parametrize(
+    "headers,expected_wait",
+    [
+        ({"Retry-After": "7"}, 7),
+        ({"x-ratelimit-remaining": "0", "x-ratelimit-reset": str(int(time.time()) + 30)}, 30),
+        ({"x-ratelimit-remaining": "42", "x-ratelimit-reset": str(int(time.time()) + 30)}, None),
+        ({}, None),
+    ],
+)
+def test__get_rate_limit_wait(headers, expected_wait):
+    """Waits should come from Retry-After, or from the rate limit reset time."""
+    wait = _get_rate_limit_wait(headers)
+    if expected_wait is None:
+        assert wait is None
+    else:
+        # allow for the time between building the test parameters and running the test
+        assert wait == pytest.approx(expected_wait, abs=10)
+
+
+def test_github_retry_honors_retry_after_on_403():
+    """GitHub signals secondary rate limits with a 403 and a Retry-After header."""
+    retry = GitHubRetry(total=5, allowed_methods=frozenset(["GET"]), status_forcelist=[500])
+    assert retry.is_retry("GET", 403, has_retry_after=True)
+    assert not retry.is_retry("GET", 403, has_retry_after=False)
+    assert not retry.is_retry("POST", 500)
+
+
+def test_circuit_breaker():
+    """The breaker should open when too many requests fail, and close after a successful trial request."""
+    breaker = CircuitBreaker(window=10, failure_threshold=0.5, min_requests=4, cooldown=0)
+    for success in [True, False, False, False]:
+        breaker.before_request()
+        breaker.record(success)
+    assert breaker.is_open
+
+    # with no cooldown, one trial request is allowed through
+    breaker.before_request()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    breaker.record(True)
+    assert not breaker.is_open
+
+
+def test_github_adapter_retries_exhausted(mocker):
+    """Running out of retries on 5xx responses should count as a failure, including for a trial request."""
+    send = mocker.patch(
+        "requests.adapters.HTTPAdapter.send", side_effect=requests.exceptions.RetryError("too many 502 error responses")
+    )
+    adapter = GitHubAdapter(circuit_breaker=CircuitBreaker(window=10, min_requests=4, cooldown=0))
+    request = requests.Request("GET", "https://api.github.com/orgs/starfleet").prepare()
+
+    for _ in range(4):
+        with pytest.raises(requests.exceptions.RetryError):
+            adapter.send(request)
+    assert adapter.circuit_breaker.is_open
+
+    # the failed trial request reopens the breaker, and the next trial is allowed through
+    with pytest.raises(requests.exceptions.RetryError):
+        adapter.send(request)
+    send.side_effect = KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        adapter.send(request)
+    response = requests.Response()
+    response.status_code = 200
+    send.side_effect = None
+    send.return_value = response
+    adapter.send(request)
+    assert not adapter.circuit_breaker.is_open
+
+
+def test_github_adapter_timeouts(mocker):
+    """Requests without a timeout should get the default timeouts, and none should be sent after the deadline."""
+    response = requests.Response()
+    response.status_code = 200
+    send = mocker.patch("requests.adapters.HTTPAdapter.send", return_value=response)
+    adapter = GitHubAdapter()
+    request = requests.Request("GET", "https://api.github.com/orgs/starfleet").prepare()
+
+    adapter.send(request, timeout=None)
+    assert send.call_args.kwargs["timeout"] == (CONNECT_TIMEOUT, READ_TIMEOUT)
+    adapter.send(request, timeout=5)
+    assert send.call_args.kwargs["timeout"] == 5
+
+    executor.set_run_deadline(0)
+    try:
+        with pytest.raises(DeadlineExceededError):
+            adapter.send(request, timeout=None)
+    finally:
+        executor.set_run_deadline(None)
+    assert send.call_count == 2
+
+
+def test_github_retry_deadline_url():
+    """A retry after the run deadline should fail with the URL urllib3 passes positionally."""
+    executor.set_run_deadline(0)
+    try:
+        with pytest.raises(MaxRetryError) as e:
+            GitHubRetry(total=5).increment("GET", "/orgs/starfleet", error=ConnectionError())
+    finally:
+        executor.set_run_deadline(None)
+    assert e.value.url == "/orgs/starfleet"
+    assert isinstance(e.value.reason, DeadlineExceededError)
+
+
+def test_post_with_verification_no_duplicate(mocker, no_sleep):
+    """A POST that failed with a server error should not be retried if the resource exists."""
+    response = mocker.MagicMock(spec=requests.Response, ok=False, status_code=502, headers={})
+    session = mocker.MagicMock(spec=requests.Session)
+    session.post.return_value = response
+    exists = mocker.MagicMock(return_value=True)
+
+    result = post_with_verification(session, "https://api.github.com/repos/starfleet/enterprise/rulesets", {}, exists)
+    assert result.ok
+    assert session.post.call_count == 1
+    exists.assert_called_once()
+
+
+def test_post_with_verification_rate_limited(mocker, no_sleep):
+    """A rate-limited POST should be retried after the requested wait, without a verification GET."""
+    limited = mocker.MagicMock(spec=requests.Response, ok=False, status_code=403, headers={"Retry-After": "3"})
+    created = mocker.MagicMock(spec=requests.Response, ok=True, status_code=201, headers={})
+    session = mocker.MagicMock(spec=requests.Session)
+    session.post.side_effect = [limited, created]
+    exists = mocker.MagicMock(return_value=False)
+
+    result = post_with_verification(session, "https://api.github.com/repos/starfleet/enterprise/rulesets", {}, exists)
+    assert result is created
+    no_sleep.assert_called_once_with(3.0)
+    exists.assert_not_called()
@@ -1,11 +1,30 @@
 """Unit tests for util.py."""
 
+import json
 from pathlib import Path
 
 import pytest
 import requests
 
-from reporule.util import _get_branch_rulesets, _get_repo, _get_repo_exceptions
+from reporule.auth import StaticToken, TokenPool
+from reporule.util import (
+    _clear_run_caches,
+    _get_branch_page,
+    _get_branch_rulesets,
+    _get_org_events,
+    _get_rate_limit,
+    _get_repo,
+    _get_repo_exceptions,
+    _get_repo_rulesets,
+    _get_repo_rulesets_if_changed,
+    _get_repos_by_name,
+    _load_branch_ruleset_dir,
+    _load_gzip_json,
+    _load_repo_names,
+    _parse_shard,
+    _save_gzip_json,
+    _shard_repos,
+)
 
 
 @pytest.fixture
@@ -33,6 +52,7 @@ def test__get_branch_rulesets(mocker, mock_session, ruleset_list):
     # mock a requests.Session and response
     session, response = mock_session
     mocker.patch.object(response, "json", return_value=ruleset_list)
+    response.links = {}
     mocker.patch.object(session, "get", return_value=response)
 
     # function should return a list of ruleset names
@@ -41,16 +61,94 @@ def test__get_branch_rulesets(mocker, mock_session, ruleset_list):
     assert set(expected_rulesets) == set(returned_rulesets)
 
 
+def test__get_repo_rulesets(mocker, ruleset_list):
+    """_get_repo_rulesets should follow pagination and, if asked, leave out rulesets inherited from the org."""
+    org_ruleset = {"id": 1, "name": "org_ruleset", "target": "branch", "source_type": "Organization"}
+    pages = []
+    for i, page in enumerate([ruleset_list[:2], [org_ruleset, *ruleset_list[2:]]]):
+        response = mocker.MagicMock(spec=requests.Response)
+        response.json.return_value = page
+        response.links = {"next": {"url": "https://api.github.com/repositories/123/rulesets?page=2"}} if i == 0 else {}
+        pages.append(response)
+    session = mocker.MagicMock(spec=requests.Session)
+    session.get.side_effect = pages
+
+    assert _get_repo_rulesets("starfleet/enterprise", session=session, includes_parents=False) == ruleset_list
+    assert session.get.call_args_list[0].kwargs["params"]["includes_parents"] == "false"
+    assert session.get.call_args_list[1].args[0] == "https://api.github.com/repositories/123/rulesets?page=2"
+
+    # by default, inherited rulesets are included
+    session.get.reset_mock()
+    session.get.side_effect = pages
+    assert _get_repo_rulesets("starfleet/enterprise", session=session) == [
+        *ruleset_list[:2],
+        org_ruleset,
+        *ruleset_list[2:],
+    ]
+    assert session.get.call_args_list[0].kwargs["params"] == {"per_page": 100}
+
+
+def test__get_repo_rulesets_if_changed(mocker, ruleset_list):
+    """Changed rulesets should be fetched from every page, and can leave out inherited rulesets."""
+    first_page = mocker.MagicMock(spec=requests.Response, status_code=200, headers={"ETag": "e2"})
+    first_page.json.return_value = [{"name": "inherited", "source_type": "Organization"}] + ruleset_list[:1]
+    first_page.links = {"next": {"url": "https://api.github.com/repos/starfleet/voyager/rulesets?page=2"}}
+    second_page = mocker.MagicMock(spec=requests.Response, status_code=200, headers={})
+    second_page.json.return_value = ruleset_list[1:]
+    second_page.links = {}
+    session = mocker.MagicMock(spec=requests.Session)
+    session.get.side_effect = [first_page, second_page]
+
+    rulesets, etag = _get_repo_rulesets_if_changed("starfleet/voyager", "e1", session, includes_parents=False)
+    assert rulesets == ruleset_list
+    assert etag == "e2"
+    assert session.get.call_args_list[0].kwargs["headers"] == {"If-None-Match": "e1"}
+    assert session.get.call_args_list[0].kwargs["params"] == {"includes_parents": "false", "per_page": 100}
+
+    unchanged = mocker.MagicMock(spec=requests.Response, status_code=304)
+    session.get.side_effect = [unchanged]
+    assert _get_repo_rulesets_if_changed("starfleet/voyager", "e2", session) == (None, "e2")
+
+
+def test__get_rate_limit_credential(mock_session):
+    """Measuring one credential of a token pool should send its token and record its budget in the pool."""
+    session, response = mock_session
+    session.auth = TokenPool([StaticToken("token-a"), StaticToken("token-b")])
+    response.json.return_value = {"resources": {"core": {"limit": 15000, "remaining": 12000, "reset": 1700000000}}}
+    session.get.return_value = response
+
+    assert _get_rate_limit(session, credential=1)["remaining"] == 12000
+    request = session.get.call_args.kwargs["auth"](requests.Request("GET", "https://api.github.com").prepare())
+    assert request.headers["Authorization"] == "Bearer token-b"
+    assert session.auth.budget()[1][1:] == (12000, 1700000000)
+
+
+def test__get_branch_page(mock_session):
+    """_get_branch_page should return the page's branch names and the number of the last page."""
+    session, response = mock_session
+    response.json.return_value = [{"name": "main"}, {"name": "release/1.0"}]
+    response.links = {"last": {"url": "https://api.github.com/repositories/123/branches?per_page=100&page=7"}}
+    session.get.return_value = response
+
+    assert _get_branch_page("starfleet/voyager", 1, session) == (["main", "release/1.0"], 7)
+    assert session.get.call_args.kwargs["params"] == {"per_page": 100, "page": 1}
+
+    # the last page has no "last" link
+    response.links = {}
+    assert _get_branch_page("starfleet/voyager", 7, session)[1] == 7
+
+
 @pytest.mark.parametrize("org_user_value", ["org", "user"])
 def test__get_repo(mocker, mock_session, org_user_value, repo_list):
     """Test that _get_repo calls the correct GitHub API endpoint when getting repo list."""
     mocker.patch("reporule.util._verify_org_or_user", return_value=org_user_value)
     # mock a requests.Session and response
     session, response = mock_session
-    mocker.patch.object(response, "json", return_value=repo_list[0])
+    mocker.patch.object(response, "json", return_value=repo_list)
+    response.links = {}
     mocker.patch.object(session, "get", return_value=response)
 
-    _get_repo("starfleet", session=session)
+    assert _get_repo("starfleet", session=session) == repo_list
 
     # mocked response doesn't paginate, so we expect only one call to the GitHub API
     calls = session.get.call_args_list
@@ -66,7 +164,7 @@ def test__get_repo(mocker, mock_session, org_user_value, repo_list):
 @pytest.mark.parametrize("org_user_value", ["org", "user"])
 def test__get_repo_single_repo(mocker, mock_session, org_user_value, repo_list):
     """Test that _get_repo calls the correct GitHub API endpoint when getting single repo."""
-    mocker.patch("reporule.util._verify_org_or_user", return_value=org_user_value)
+    verify_org_or_user = mocker.patch("reporule.util._verify_org_or_user", return_value=org_user_value)
     # mock a requests.Session and response
     session, response = mock_session
     mocker.patch.object(response, "json", return_value=repo_list[0])
@@ -80,6 +178,50 @@ def test__get_repo_single_repo(mocker, mock_session, org_user_value, repo_list):
 
     call_args = session.get.call_args_list[0].args
     assert "https://api.github.com/repos/starfleet/enterprise" in call_args
+    # the repos route is the same for orgs and users, so the org isn't looked up
+    verify_org_or_user.assert_not_called()
+
+
+def test__get_repos_by_name(mocker, mock_session, repo_list):
+    """Listed repos should be fetched individually, leaving out the ones that don't exist."""
+    session, _ = mock_session
+    repos_by_url = {f"https://api.github.com/repos/{r['full_name']}": r for r in repo_list}
+
+    def _get(url):
+        response = mocker.MagicMock(spec=requests.Response)
+        response.status_code = 200 if url in repos_by_url else 404
+        response.json.return_value = repos_by_url.get(url)
+        return response
+
+    session.get.side_effect = _get
+    repos = _get_repos_by_name({"starfleet/voyager", "starfleet/enterprise", "starfleet/defiant"}, session)
+
+    assert [r["full_name"] for r in repos] == ["starfleet/enterprise", "starfleet/voyager"]
+    assert session.get.call_count == 3
+
+
+def test__save_gzip_json(tmp_path):
+    """Saved data should load back, a missing file should load as empty, and a corrupt file should fail to load."""
+    file_name = tmp_path / "state" / "cache.json.gz"
+    assert _load_gzip_json(file_name) == {}
+
+    _save_gzip_json(file_name, {"starfleet/voyager": ["main"]})
+    assert _load_gzip_json(file_name) == {"starfleet/voyager": ["main"]}
+
+    file_name.write_text("{")
+    with pytest.raises(ValueError, match="Unable to parse"):
+        _load_gzip_json(file_name)
+
+
+def test__load_repo_names(tmp_path):
+    """Repo names can be given with or without the org, with comments and blank lines ignored."""
+    repos_file = tmp_path / "repos.txt"
+    repos_file.write_text("# ships\nenterprise\n\nstarfleet/voyager  # Delta Quadrant\n")
+    assert _load_repo_names(repos_file, "starfleet") == {"starfleet/enterprise", "starfleet/voyager"}
+
+    repos_file.write_text("klingon/bortas\n")
+    with pytest.raises(ValueError, match="not a repository of starfleet"):
+        _load_repo_names(repos_file, "starfleet")
 
 
 def test__get_repo_exceptions_default(test_file_path):
@@ -94,3 +236,87 @@ def test__get_repo_exceptions_pass_file(test_file_path):
 
     exceptions = _get_repo_exceptions("starfleet", exceptions_file)
     assert exceptions == {"starfleet/excelsior", "starfleet/voyager"}
+
+
+def test__get_repo_exceptions_cached(tmp_path):
+    """The exceptions file is read once per run, and read again after the run's caches are cleared."""
+    exceptions_file = tmp_path / "exceptions.yml"
+    exceptions_file.write_text("organizations:\n  - name: starfleet\n    repos: [voyager]\n")
+    assert _get_repo_exceptions("starfleet", exceptions_file) == {"starfleet/voyager"}
+
+    exceptions_file.write_text("organizations:\n  - name: starfleet\n    repos: [defiant]\n")
+    assert _get_repo_exceptions("starfleet", exceptions_file) == {"starfleet/voyager"}
+
+    _clear_run_caches()
+    assert _get_repo_exceptions("starfleet", exceptions_file) == {"starfleet/defiant"}
+
+
+def test__get_org_events_not_modified(mocker, mock_session):
+    """An unchanged events feed should return no events and keep the previous ETag."""
+    session, response = mock_session
+    response.status_code = 304
+    mocker.patch.object(session, "get", return_value=response)
+
+    events, etag = _get_org_events("starfleet", since_id="42", etag='W/"abc"', session=session)
+    assert events == []
+    assert etag == 'W/"abc"'
+    assert session.get.call_args.kwargs["headers"] == {"If-None-Match": 'W/"abc"'}
+
+
+def test__get_org_events_since_id(mocker, mock_session):
+    """Only events newer than the cursor should be returned."""
+    session, response = mock_session
+    response.headers = {"ETag": 'W/"def"'}
+    response.links = {"next": {"url": "https://api.github.com/orgs/starfleet/events?page=2"}}
+    mocker.patch.object(response, "json", return_value=[{"id": "44"}, {"id": "43"}, {"id": "42"}, {"id": "41"}])
+    mocker.patch.object(session, "get", return_value=response)
+
+    events, etag = _get_org_events("starfleet", since_id="42", session=session)
+    assert [e["id"] for e in events] == ["44", "43"]
+    assert etag == 'W/"def"'
+    # the cursor was found on the first page, so there's no need to get the next one
+    assert session.get.call_count == 1
+
+
+def test__shard_repos(repo_list):
+    """Shards should be disjoint, cover every repo, and be the same on every run."""
+    shards = [_shard_repos(repo_list, i, 3) for i in range(1, 4)]
+    shard_names = [{r["full_name"] for r in shard} for shard in shards]
+
+    assert sum(len(names) for names in shard_names) == len(repo_list)
+    assert set.union(*shard_names) == {r["full_name"] for r in repo_list}
+    assert shards[1] == _shard_repos(list(reversed(repo_list)), 2, 3)[::-1]
+
+
+@pytest.mark.parametrize("shard", ["0/4", "5/4", "1/0", "one/4", "1-4"])
+def test__parse_shard_invalid(shard):
+    """Invalid shard specifications should raise an error."""
+    with pytest.raises(ValueError):
+        _parse_shard(shard)
+
+
+def test__load_branch_ruleset_dir_invalid(tmp_path):
+    """Rulesets GitHub would reject should fail to load, listing every problem."""
+    ruleset = {
+        "name": "vulcan_ruleset",
+        "enforcement": "on",
+        "conditions": {"ref_name": {"include": "~DEFAULT_BRANCH"}},
+        "rules": [{"type": "deletion"}, {"type": "mind_meld"}],
+    }
+    (tmp_path / "vulcan_ruleset.json").write_text(json.dumps(ruleset))
+
+    with pytest.raises(ValueError) as e:
+        _load_branch_ruleset_dir(tmp_path)
+    assert "'enforcement' must be one of" in str(e.value)
+    assert "ref_name 'include' must be a list of strings" in str(e.value)
+    assert "rules[1] has an unknown type 'mind_meld'" in str(e.value)
+    assert "rules[0]" not in str(e.value)
+
+    ruleset["conditions"] = {"ref_name": ["~DEFAULT_BRANCH"]}
+    (tmp_path / "vulcan_ruleset.json").write_text(json.dumps(ruleset))
+    with pytest.raises(ValueError, match="'conditions.ref_name' must be an object"):
+        _load_branch_ruleset_dir(tmp_path)
+
+    (tmp_path / "vulcan_ruleset.json").write_text("{")
+    with pytest.raises(ValueError, match="not valid JSON"):
+        _load_branch_ruleset_dir(tmp_path)